@@ -0,0 +1,18 @@
+#
+# Helper functions shared by the benchmarks.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import numpy as np
+
+import gde.core as core
+
+
+def create(n):
+    """ Returns a document with ``n`` random points in a single data set. """
+    rng = np.random.default_rng(1)
+    doc = core.GdeDocument()
+    dset = doc.get_active_data_set()
+    dset.silent_add_points(rng.uniform(0, 1, n), rng.uniform(0, 1, n))
+    return doc
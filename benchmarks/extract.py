@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#
+# Benchmarks opening a gde file and extracting its data to csv, for files with
+# 10k and 100k data points stored as xml or in a binary points file.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import gde.core as core
+
+from _util import create
+
+
+# Numbers of points
+SIZES = [10000, 100000]
+
+
+def main():
+    print('Time to open a gde file and extract its data, and peak memory'
+          ' allocated while opening and extracting')
+    print('  {:>8} {:>7} {:>10} {:>13} {:>12} {:>12}'.format(
+        'points', 'binary', 'open (ms)', 'extract (ms)', 'peak open',
+        'peak extract'))
+    tmp = tempfile.mkdtemp()
+    try:
+        for n in SIZES:
+            for binary in (False, True):
+                path = os.path.join(tmp, 'bench-' + str(n) + '.gde')
+                create(n).write(path, binary=binary)
+
+                # Not using tracemalloc for the timings, as it slows down
+                # every allocation
+                t0 = time.perf_counter()
+                doc = core.GdeDocument(path)
+                t1 = time.perf_counter()
+                doc.extract_data(os.path.join(tmp, 'out.csv'))
+                t2 = time.perf_counter()
+                del(doc)
+
+                tracemalloc.start()
+                doc = core.GdeDocument(path)
+                p1 = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.reset_peak()
+                doc.extract_data(os.path.join(tmp, 'out.csv'))
+                p2 = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+                del(doc)
+
+                print('  {:>8} {:>7} {:>10.1f} {:>13.1f} {:>9.1f} MB'
+                      ' {:>9.1f} MB'.format(
+                          n, str(binary), (t1 - t0) * 1e3, (t2 - t1) * 1e3,
+                          p1, p2))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
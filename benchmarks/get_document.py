@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+#
+# Benchmarks DocumentNode.get_document() on points at depth 4.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import sys
+import timeit
+
+import gde.core as core
+
+
+# Number of points, number of calls to time per point
+N = 50000
+REPEATS = 5
+
+
+class BenchDocument(core.Document):
+    """ Document without default content. """
+    def _read_file(self, filename=None):
+        pass
+
+
+def walk(node):
+    """ Finds a node's document by walking the tree (the old method). """
+    while node is not None:
+        if isinstance(node, core.Document):
+            return node
+        node = node.get_parent_node()
+    raise Exception('No Document set in hierarchy for ' + str(node))
+
+
+def main():
+    # Document > group > data sets > data set > points
+    doc = BenchDocument()
+    parent = doc.silent_add_child('group', 'group')
+    parent = parent.silent_add_child(core.T_DATA_SETS, 'Data')
+    parent = parent.silent_add_child(core.T_DATA_SET, 'Data set 1')
+    points = [
+        parent.silent_add_child(core.T_DATA_POINT, 'point_' + str(i))
+        for i in range(N)]
+    assert all(p.get_document() is doc for p in points)
+
+    def cached():
+        for p in points:
+            p.get_document()
+
+    def walked():
+        for p in points:
+            walk(p)
+
+    print('get_document() on ' + str(N) + ' points at depth 4')
+    for name, func in (('cached', cached), ('tree walk', walked)):
+        t = min(timeit.repeat(func, number=1, repeat=REPEATS))
+        print('  {:<10} {:8.3f} ms total, {:8.1f} ns per call'.format(
+            name, t * 1e3, t * 1e9 / N))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+#
+# Benchmarks painting the background image, for images of 3000x2250 and
+# 4000x3000 pixels, compared with scaling the full image on every paint, and
+# for a 12000x9000 pixel image shown using tiles.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+# Run without a display if none is available
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from gde.qt import QtCore, QtGui, QtWidgets  # noqa
+import gde.core as core  # noqa
+import gde.gui as gui  # noqa
+
+
+# Image sizes, size of rendered image (pixels), number of renders to time
+SIZES = [(3000, 2250), (4000, 3000)]
+TILED = (12000, 9000)
+PIXELS = 800
+REPEATS = 5
+
+
+def create(path, w, h):
+    """ Writes a ``w`` by ``h`` pixel image with a gradient to ``path``. """
+    image = QtGui.QImage(w, h, QtGui.QImage.Format.Format_RGB32)
+    painter = QtGui.QPainter(image)
+    gradient = QtGui.QLinearGradient(0, 0, w, h)
+    gradient.setColorAt(0, QtGui.QColor(255, 0, 0))
+    gradient.setColorAt(1, QtGui.QColor(0, 0, 255))
+    painter.fillRect(0, 0, w, h, gradient)
+    painter.end()
+    image.save(path)
+
+
+def load(scene, doc):
+    """ Shows ``doc`` in ``scene``, and waits until its image is loaded. """
+    scene.set_document(doc)
+    while scene._image.is_loading():
+        QtWidgets.QApplication.processEvents(
+            QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 10)
+
+
+def render(scene, source=None):
+    """ Renders the scene (or the ``source`` part of it) into an image. """
+    image = QtGui.QImage(PIXELS, PIXELS, QtGui.QImage.Format.Format_RGB32)
+    painter = QtGui.QPainter(image)
+    if source is None:
+        scene.render(painter)
+    else:
+        scene.render(painter, QtCore.QRectF(), source)
+    painter.end()
+
+
+def render_image(image, rect):
+    """ Renders ``image`` into ``rect`` the old way: scaling on every call. """
+    target = QtGui.QImage(PIXELS, PIXELS, QtGui.QImage.Format.Format_RGB32)
+    painter = QtGui.QPainter(target)
+    painter.scale(PIXELS / rect.width(), PIXELS / rect.height())
+    painter.setOpacity(0.5)
+    painter.drawImage(rect, image)
+    painter.end()
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)  # noqa
+    print('Scene render time (' + str(PIXELS) + 'x' + str(PIXELS) + ' pixels)'
+          + ' with a background image, fastest of ' + str(REPEATS))
+    print('  {:>12} {:>12} {:>12} {:>12}'.format(
+        'image', 'first (ms)', 'cached (ms)', 'uncached (ms)'))
+    tmp = tempfile.mkdtemp()
+    try:
+        for w, h in SIZES:
+            path = os.path.join(tmp, 'image.jpg')
+            create(path, w, h)
+            doc = core.GdeDocument()
+            doc.get('Image').get_variable('path').silent_set_value(path)
+            scene = gui.GdeScene(None)
+            load(scene, doc)
+
+            t0 = time.perf_counter()
+            render(scene)
+            t1 = (time.perf_counter() - t0) * 1e3
+            t2 = min(timeit.repeat(
+                lambda: render(scene), number=1, repeat=REPEATS)) * 1e3
+
+            # Reference: scale and draw the full image every time
+            image = QtGui.QImage(path)
+            rect = scene.sceneRect()
+            t3 = min(timeit.repeat(
+                lambda: render_image(image, rect), number=1,
+                repeat=REPEATS)) * 1e3
+
+            print('  {:>12} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+                str(w) + 'x' + str(h), t1, t2, t3))
+            scene.clear()
+            doc.delete()
+
+        # Tiled image, with tiles stored in the temporary directory
+        gui.TILES_DIR = os.path.join(tmp, 'tiles')
+        w, h = TILED
+        path = os.path.join(tmp, 'image.jpg')
+        create(path, w, h)
+        print()
+        print('Tiled image (' + str(w) + 'x' + str(h) + ' pixels): creating'
+              + ' the tiles, opening, rendering the scene and a 5% wide part')
+        print('  {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+            'create (s)', 'open (ms)', 'render (ms)', 'zoomed (ms)',
+            'tiles (MB)'))
+        doc = core.GdeDocument()
+        doc.get('Image').get_variable('path').silent_set_value(path)
+        scene = gui.GdeScene(None)
+        t0 = time.perf_counter()
+        load(scene, doc)
+        t1 = time.perf_counter() - t0
+        scene.clear()
+        t0 = time.perf_counter()
+        load(scene, doc)
+        t2 = (time.perf_counter() - t0) * 1e3
+        t3 = min(timeit.repeat(
+            lambda: render(scene), number=1, repeat=REPEATS)) * 1e3
+        source = QtCore.QRectF(4750, 4750, 500, 500)
+        t4 = min(timeit.repeat(
+            lambda: render(scene, source), number=1, repeat=REPEATS)) * 1e3
+        tiles = scene._image._pyramid._tiles.values()
+        mb = sum(4 * t.width() * t.height() for t in tiles) / 1e6
+        print('  {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+            t1, t2, t3, t4, mb))
+        scene.clear()
+        doc.delete()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+# Benchmarks start-up time of GDE's command line tools and modules, using the
+# ``-X importtime`` option, and checks that they don't import more than they
+# need (e.g. PyQt6 for tools that don't use the GUI).
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import os
+import subprocess
+import sys
+
+
+# Modules that should only be imported by commands that need them
+HEAVY = ('PyQt6', 'numpy', 'gde.core', 'gde.gui', 'gde.qt')
+
+# Commands to time, and the heavy modules they are allowed to load
+COMMANDS = (
+    (['-c', 'import gde'], ()),
+    (['-m', 'gde', 'version'], ()),
+    (['-c', 'import gde.core'], ('numpy', 'gde.core')),
+    (['-c', 'import gde.gui'], HEAVY),
+)
+
+# Number of times to run each command (the fastest run is reported)
+REPEATS = 5
+
+
+def importtime(args):
+    """
+    Runs python with the given arguments and ``-X importtime``, and returns
+    a tuple ``(total, modules)`` where ``total`` is the total import time in
+    microseconds and ``modules`` is a set of all imported module names.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = root + os.pathsep + env.get('PYTHONPATH', '')
+    p = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + args,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        env=env, universal_newlines=True)
+    total = 0
+    modules = set()
+    for line in p.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[12:].split('|')
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue    # Header
+        name = parts[2].rstrip()
+        modules.add(name.strip())
+        # Nested imports are indented, and included in their parent's time
+        if len(name) - len(name.lstrip()) == 1:
+            total += cumulative
+    return total, modules
+
+
+def main():
+    print('Import time of GDE commands (fastest of ' + str(REPEATS) + ')')
+    print()
+    failed = False
+    for args, allowed in COMMANDS:
+        runs = [importtime(args) for i in range(REPEATS)]
+        total = min(t for t, modules in runs)
+        loaded = [
+            name for name in HEAVY if any(name in x for t, x in runs)]
+        print(' '.join(['python'] + args).ljust(30)
+              + (' %8.1f ms' % (total * 1e-3)))
+        if loaded:
+            print('    loads: ' + ', '.join(loaded))
+        unwanted = [name for name in loaded if name not in allowed]
+        if unwanted:
+            print('    ERROR: should not load ' + ', '.join(unwanted))
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# Benchmarks loading gde files with 1k, 10k and 100k data points, stored as
+# xml or in a binary points file.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import xml.etree.ElementTree as et
+
+import gde.core as core
+
+from _util import create
+
+
+# Numbers of points, number of loads to time per file
+SIZES = [1000, 10000, 100000]
+REPEATS = 3
+
+
+def main():
+    print('GdeDocument load time (fastest of ' + str(REPEATS) + '), and peak'
+          ' memory allocated while loading')
+    print('  {:>8} {:>7} {:>10} {:>10} {:>12} {:>12}'.format(
+        'points', 'binary', 'file (MB)', 'load (ms)', 'ms / 1k pts',
+        'peak (MB)'))
+    tmp = tempfile.mkdtemp()
+    try:
+        for n in SIZES:
+            for binary in (False, True):
+                path = os.path.join(tmp, 'bench-' + str(n) + '.gde')
+                create(n).write(path, binary=binary)
+                size = os.path.getsize(path)
+                if binary:
+                    size += os.path.getsize(path + '.npy')
+                size /= 1e6
+
+                def load():
+                    return core.GdeDocument(path)
+
+                t = min(timeit.repeat(load, number=1, repeat=REPEATS)) * 1e3
+                tracemalloc.start()
+                doc = load()
+                peak = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+                assert len(doc.get_active_data_set()) == n
+
+                print('  {:>8} {:>7} {:>10.1f} {:>10.1f} {:>12.2f} {:>12.1f}'
+                      .format(n, str(binary), size, t, t / n * 1e3, peak))
+
+        # Reference: parsing the largest xml file into a complete element tree
+        create(n).write(path, binary=False)
+        t = min(timeit.repeat(
+            lambda: et.parse(path), number=1, repeat=REPEATS)) * 1e3
+        tracemalloc.start()
+        tree = et.parse(path)
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        del(tree)
+        print()
+        print('For reference, et.parse() on ' + str(n) + ' points: '
+              + '{:.1f} ms, {:.1f} MB peak'.format(t, peak))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#
+# Benchmarks pspline() fitting, comparing the current b-spline basis with the
+# truncated power basis built using np.frompyfunc, as used in GDE 1.0.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import math
+import sys
+import timeit
+
+import numpy as np
+
+import gde.core as core
+
+
+# Numbers of points to fit, number of segments and degree (pspline defaults)
+SIZES = [100, 1000, 10000, 100000]
+NSEG = 10
+DEG = 3
+REPEATS = 3
+
+
+def old_pspline(x, y, x2, s=1, nseg=10, deg=3, pdeg=2):
+    """ The original pspline() implementation, for comparison. """
+    def bbase(x, xl, xr, nseg, deg):
+        dx = (xr - xl) / float(nseg)
+        knots = xl + np.arange(-deg, 1 + nseg + deg) * dx
+
+        def tpower(x, t):
+            return (x > t) * (x - t) ** deg
+        tp = np.frompyfunc(tpower, 2, 1)
+        P = np.array(tp.outer(x, knots), dtype=x.dtype)
+        D = np.diff(np.eye(P.shape[1]), deg + 1, axis=0)
+        D /= math.gamma(deg + 1) * dx ** deg
+        return np.dot(P, np.transpose(D)) * -1**(deg + 1)
+
+    xl = min(np.min(x), np.min(x2))
+    xr = max(np.max(x), np.max(x2))
+    B = bbase(x, xl, xr, nseg, deg)
+    D = np.diff(np.eye(B.shape[1]), pdeg, axis=0)
+    P = np.dot(np.transpose(D), D)
+    a = np.linalg.solve(
+        np.dot(np.transpose(B), B) + s * P, np.dot(np.transpose(B), y))
+    return np.dot(bbase(x2, xl, xr, nseg, deg), a)
+
+
+def main():
+    print('pspline() fit time, nseg=' + str(NSEG) + ', deg=' + str(DEG))
+    print('  {:>8} {:>12} {:>12} {:>8} {:>10}'.format(
+        'points', 'old (ms)', 'new (ms)', 'speedup', 'max diff'))
+    rng = np.random.default_rng(1)
+    for n in SIZES:
+        x = np.sort(rng.uniform(0, 1, n))
+        y = np.sin(6 * x) + rng.normal(0, 0.1, n)
+        x2 = np.linspace(0, 1, 100)
+
+        def old():
+            return old_pspline(x, y, x2, 0.1, NSEG, DEG, 3)
+
+        def new():
+            return core.pspline(x, y, x2, 0.1, NSEG, DEG, 3)
+
+        diff = np.max(np.abs(old() - new()))
+        t_old = min(timeit.repeat(old, number=1, repeat=REPEATS))
+        t_new = min(timeit.repeat(new, number=1, repeat=REPEATS))
+        print('  {:>8} {:>12.2f} {:>12.2f} {:>8.1f} {:>10.2g}'.format(
+            n, t_old * 1e3, t_new * 1e3, t_old / t_new, diff))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+#
+# Benchmarks pspline() with one segment per data point (the GUI default), where
+# the size of the linear system grows with the number of points. Also checks
+# that data with a single repeated x value gives a constant fit.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import sys
+import timeit
+
+import numpy as np
+
+import gde.core as core
+
+from pspline_basis import old_pspline
+
+
+# Numbers of points (and segments), largest size to run the old code for
+SIZES = [500, 1000, 2000, 10000, 100000]
+OLD_MAX = 2000
+DEG = 3
+REPEATS = 3
+
+
+def main():
+    print('pspline() fit time, nseg=points, deg=' + str(DEG))
+    print('  {:>8} {:>12} {:>12} {:>10}'.format(
+        'points', 'old (ms)', 'new (ms)', 'max diff'))
+    rng = np.random.default_rng(1)
+    for n in SIZES:
+        x = np.sort(rng.uniform(0, 1, n))
+        y = np.sin(6 * x) + rng.normal(0, 0.1, n)
+        x2 = np.linspace(0, 1, 100)
+
+        def old():
+            return old_pspline(x, y, x2, 0.1, n, DEG, 3)
+
+        def new():
+            return core.pspline(x, y, x2, 0.1, n, DEG, 3)
+
+        t_new = min(timeit.repeat(new, number=1, repeat=REPEATS))
+        if n <= OLD_MAX:
+            diff = '{:>10.2g}'.format(np.max(np.abs(old() - new())))
+            t_old = '{:>12.2f}'.format(
+                1e3 * min(timeit.repeat(old, number=1, repeat=1)))
+        else:
+            diff = '{:>10}'.format('-')
+            t_old = '{:>12}'.format('-')
+        print('  {:>8} '.format(n) + t_old + ' {:>12.2f} '.format(t_new * 1e3)
+              + diff)
+
+    # All points at the same x (e.g. points along a vertical line)
+    x = np.full(10, 0.5)
+    y = np.arange(10.0)
+    try:
+        fit = core.pspline(x, y, np.linspace(0.5, 0.5, 5), 0.1, 10, DEG, 3)
+    except Exception as e:
+        fit = e
+    print()
+    if isinstance(fit, Exception) or not np.allclose(fit, np.mean(y)):
+        print('ERROR: Repeated x value: expected constant fit, got '
+              + repr(fit))
+        return 1
+    print('Repeated x value: constant fit')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# Benchmarks the graphical scene for documents with 1k, 10k and 100k data
+# points: creating the scene items, rendering the whole scene (at full size,
+# and zoomed out so that points are drawn as dots), and finding the point under
+# the mouse.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import os
+import sys
+import time
+import timeit
+
+import numpy as np
+
+# Run without a display if none is available
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from gde.qt import QtGui, QtWidgets  # noqa
+import gde.core as core  # noqa
+import gde.gui as gui  # noqa
+
+from _util import create  # noqa
+
+
+# Numbers of points, size of rendered images (pixels), number of hover calls
+SIZES = [1000, 10000, 100000]
+PIXELS = 800
+SMALL = 200
+HOVERS = 1000
+
+
+def render(scene, pixels=PIXELS):
+    """ Renders the whole scene into a square image. """
+    image = QtGui.QImage(pixels, pixels, QtGui.QImage.Format.Format_RGB32)
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
+    scene.render(painter)
+    painter.end()
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)  # noqa
+    print('Scene creation, rendering (' + str(PIXELS) + 'x' + str(PIXELS)
+          + ' pixels, then ' + str(SMALL) + 'x' + str(SMALL) + '), and finding'
+          + ' the point under the mouse')
+    print('  {:>8} {:>8} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+        'points', 'items', 'create (ms)', 'render (ms)', 'again (ms)',
+        'small (ms)', 'hover (us)'))
+    rng = np.random.default_rng(2)
+    for n in SIZES:
+        doc = create(n)
+        scene = gui.GdeScene(None)
+        t0 = time.perf_counter()
+        scene.set_document(doc)
+        t1 = time.perf_counter()
+        render(scene)
+        t2 = time.perf_counter()
+        render(scene)
+        t3 = time.perf_counter()
+        render(scene, SMALL)
+        t4 = time.perf_counter()
+
+        item = scene._sets[doc.get_active_data_set()]
+        xy = iter(rng.uniform(0, scene.W, (HOVERS + 1, 2)).tolist())
+        t = timeit.timeit(lambda: item.hover(*next(xy)), number=HOVERS)
+
+        print('  {:>8} {:>8} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f}'
+              .format(n, len(scene.items()), (t1 - t0) * 1e3, (t2 - t1) * 1e3,
+                      (t3 - t2) * 1e3, (t4 - t3) * 1e3, t / HOVERS * 1e6))
+        scene.clear()
+        doc.delete()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
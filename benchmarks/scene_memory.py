@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+#
+# Opens, edits and closes 100 documents in a single graphical scene, and checks
+# that all scene items are released and that memory use doesn't grow by more
+# than a small fraction of what a single leaked item would keep alive. Also
+# times looking up the scene item for a node.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import gc
+import os
+import sys
+import timeit
+import tracemalloc
+import weakref
+
+import numpy as np
+
+# Run without a display if none is available
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from gde.qt import QtWidgets  # noqa
+import gde.core as core  # noqa
+import gde.gui as gui  # noqa
+
+
+# Number of documents per round, number of rounds, points per document
+DOCUMENTS = 20
+ROUNDS = 5
+POINTS = 1000
+
+# Maximum memory growth per document, as a fraction of the memory kept alive
+# by a single leaked item (measured by deliberately keeping one per document,
+# and including the document it belongs to)
+GROWTH = 0.01
+
+# Number of item lookups to time
+LOOKUPS = 100000
+
+
+def cycle(app, scene, rng, refs, leak=None):
+    """
+    Opens a document in ``scene``, makes some edits, and closes it, storing
+    weak references to the document and all scene items in ``refs``.
+
+    If a list ``leak`` is given, the item for the selected point is added to
+    it, to measure how much memory a leaked item keeps alive.
+    """
+    doc = core.GdeDocument()
+    dset = doc.get_active_data_set()
+    x, y = rng.uniform(0, 1, (2, POINTS))
+    dset.silent_add_points(x, y)
+    scene.set_document(doc)
+
+    # Select a point, move another, and hover over a third
+    dset.child(0).select()
+    dset.child(1).set_value(x=0.5, y=0.5)
+    point = dset.child(2)
+    scene.get_item_for_node(dset).hover(*scene.norm2scene(
+        point.get_value('x'), point.get_value('y')))
+
+    # Add a data set, remove it, and undo and redo its removal
+    dset = doc.add_data_set()
+    dset.add_child(core.T_DATA_POINT, 'point_0', (
+        (core.V_NORM, 'x', 0.1), (core.V_NORM, 'y', 0.1)))
+    dset.remove()
+    doc.undo()
+    doc.redo()
+    app.processEvents()
+
+    if leak is not None:
+        point = doc.get('Data').child(0).child(0)
+        leak.append(scene.get_item_for_node(point))
+    refs.append(weakref.ref(doc))
+    refs.extend(weakref.ref(item) for item in scene.items())
+    scene.clear()
+    doc.delete()
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)
+    scene = gui.GdeScene(None)
+    rng = np.random.default_rng(1)
+    print('Opening, editing and closing ' + str(DOCUMENTS) + ' documents with '
+          + str(POINTS) + ' points, ' + str(ROUNDS) + ' times')
+    print('  {:>8} {:>12} {:>12} {:>12}'.format(
+        'round', 'released', 'indexed', 'memory (kB)'))
+
+    # Warm up (e.g. to import modules and fill caches)
+    tracemalloc.start()
+    refs = []
+    for j in range(DOCUMENTS):
+        cycle(app, scene, rng, refs)
+
+    failed = False
+    gc.collect()
+    m0 = tracemalloc.get_traced_memory()[0]
+    for i in range(ROUNDS):
+        refs = []
+        for j in range(DOCUMENTS):
+            cycle(app, scene, rng, refs)
+        gc.collect()
+        alive = sum(1 for ref in refs if ref() is not None)
+        memory = tracemalloc.get_traced_memory()[0] - m0
+        print('  {:>8} {:>12} {:>12} {:>12.1f}'.format(
+            i + 1, str(len(refs) - alive) + '/' + str(len(refs)),
+            len(scene._items), memory * 1e-3))
+        if alive or scene._items:
+            failed = True
+    growth = memory / (DOCUMENTS * ROUNDS)
+
+    # Memory kept alive by leaking one item per document
+    m1 = tracemalloc.get_traced_memory()[0]
+    leak = []
+    for j in range(DOCUMENTS):
+        cycle(app, scene, rng, [], leak)
+    gc.collect()
+    footprint = (tracemalloc.get_traced_memory()[0] - m1) / DOCUMENTS
+    del(leak)
+    tracemalloc.stop()
+
+    print()
+    print('Memory growth per document: {:.2f} kB'.format(growth * 1e-3))
+    print('Memory kept by one leaked item: {:.2f} kB'.format(footprint * 1e-3))
+    if failed:
+        print('ERROR: scene items or documents were not released')
+    if growth > GROWTH * footprint:
+        print('ERROR: memory use grew by more than ' + str(GROWTH) + ' times'
+              ' the size of a leaked item per document')
+        failed = True
+
+    # Time item lookups
+    doc = core.GdeDocument()
+    scene.set_document(doc)
+    node = doc.get('Axes').get('y').get('ref2')
+    t = timeit.timeit(lambda: scene.get_item_for_node(node), number=LOOKUPS)
+    print()
+    print('GdeScene.get_item_for_node(): {:.2f} us'.format(t / LOOKUPS * 1e6))
+    scene.clear()
+    doc.delete()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+#
+# Benchmarks writing gde files with 1k, 10k and 100k data points, as indented
+# xml, compact xml, or with a binary points file.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import gde.core as core
+
+from _util import create
+
+
+# Numbers of points, number of writes to time per document
+SIZES = [1000, 10000, 100000]
+REPEATS = 3
+
+# Layouts to test, as arguments to GdeDocument.write()
+LAYOUTS = (
+    ('xml', {}),
+    ('compact', {'compact': True}),
+    ('binary', {'binary': True}),
+)
+
+
+def main():
+    print('GdeDocument write time (fastest of ' + str(REPEATS) + '), and peak'
+          ' memory allocated while writing')
+    print('  {:>8} {:>8} {:>10} {:>10} {:>12} {:>12}'.format(
+        'points', 'layout', 'file (MB)', 'write (ms)', 'ms / 1k pts',
+        'peak (MB)'))
+    tmp = tempfile.mkdtemp()
+    try:
+        for n in SIZES:
+            doc = create(n)
+            for layout, kwargs in LAYOUTS:
+                path = os.path.join(tmp, 'bench-' + str(n) + '.gde')
+
+                def write():
+                    doc.write(path, **kwargs)
+
+                t = min(timeit.repeat(write, number=1, repeat=REPEATS)) * 1e3
+                tracemalloc.start()
+                write()
+                peak = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+                size = os.path.getsize(path)
+                if layout == 'binary':
+                    size += os.path.getsize(path + '.npy')
+                size /= 1e6
+                assert len(core.GdeDocument(path).get_active_data_set()) == n
+
+                print('  {:>8} {:>8} {:>10.1f} {:>10.1f} {:>12.2f} {:>12.1f}'
+                      .format(n, layout, size, t, t / n * 1e3, peak))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -39,7 +39,7 @@ from ._gde_version import (  # noqa
 
 def version():
     """Returns this copy of GDE's version number."""
-    return gde.__version__
+    return __version__
 
 
 #
@@ -198,6 +198,21 @@ def rmtree(path):
 #
 # Imports
 #
-from . import qt    # noqa
-from . import gui     # noqa
+# The core and GUI modules load NumPy and PyQt6, which takes a significant
+# amount of time, so they are only imported when first used (e.g. with
+# ``import gde.gui`` or by accessing ``gde.gui``). This keeps command line
+# tools that don't need them, like ``gde version``, fast.
+#
+_LAZY_MODULES = ('core', 'gui', 'qt')
+
+
+def __getattr__(name):
+    """
+    Imports the core and GUI modules on first access.
+    """
+    if name in _LAZY_MODULES:
+        import importlib
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError(
+        'module ' + repr(__name__) + ' has no attribute ' + repr(name))
 
@@ -32,6 +32,7 @@ def main():
     )
 
     # Add subparsers
+    add_extract_parser(subparsers)  # Extract data without the gui
     add_gui_parser(subparsers)      # Launch the graph data extractor
     add_icon_parser(subparsers)     # Install icons
     add_reset_parser(subparsers)    # Remove config dir
@@ -56,6 +57,152 @@ def main():
     func(**args)
 
 
+#
+# Extract
+#
+
+def extract(files, output=None, jobs=None):
+    """
+    Extracts data from one or more gde files, without starting the graphical
+    user interface.
+    """
+    import collections
+    import concurrent.futures
+    import glob
+    import os
+
+    # Find files: arguments can be files, glob patterns, or directories
+    paths = []
+    for pattern in files:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(glob.glob(os.path.join(pattern, '*.gde'))))
+        elif os.path.exists(pattern):
+            paths.append(pattern)
+        else:
+            found = sorted(glob.glob(pattern))
+            if not found:
+                print('Error: no files found for ' + pattern)
+                sys.exit(1)
+            paths.extend(found)
+
+    # Remove duplicates, keeping the order
+    unique = collections.OrderedDict()
+    for path in paths:
+        unique.setdefault(os.path.abspath(path), path)
+    paths = list(unique.values())
+    if not paths:
+        print('No gde files found.')
+        sys.exit(1)
+
+    # Check output directory
+    if output is not None:
+        if not os.path.isdir(output):
+            print('Error: output directory not found: ' + output)
+            sys.exit(1)
+
+        # Check that no two files would be extracted to the same csv file
+        names = collections.OrderedDict()
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            names.setdefault(os.path.normcase(name), []).append(path)
+        clashes = [x for x in names.values() if len(x) > 1]
+        if clashes:
+            print('Error: files with the same name would be extracted to the'
+                  ' same csv file in ' + output + ':')
+            for clash in clashes:
+                print('  ' + ', '.join(clash))
+            sys.exit(1)
+
+    # Extract, using a process pool if more than one job is allowed
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(paths)))
+    if jobs == 1:
+        results = (extract_file(path, output) for path in paths)
+        results = zip(paths, results)
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+        results = zip(
+            paths, pool.map(extract_file, paths, [output] * len(paths)))
+
+    failed = 0
+    for path, error in results:
+        if error is None:
+            print('Extracted ' + path)
+        else:
+            failed += 1
+            print('Error extracting ' + path + ': ' + error)
+    if jobs > 1:
+        pool.shutdown()
+
+    print('Extracted ' + str(len(paths) - failed) + ' of ' + str(len(paths))
+          + ' files.')
+    if failed:
+        sys.exit(1)
+
+
+def extract_file(path, output=None):
+    """
+    Extracts the data from the gde file at ``path`` to a csv file with the
+    same base name, stored in the directory ``output`` or next to the gde
+    file.
+
+    Returns ``None`` if successful, or an error message if not.
+    """
+    import os
+    import gde.core
+
+    base = os.path.splitext(path)[0]
+    if output is not None:
+        base = os.path.join(output, os.path.basename(base))
+    try:
+        document = gde.core.GdeDocument(path)
+        document.extract_data(base + '.csv')
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def add_extract_parser(subparsers):
+    """
+    Adds a subcommand parser for the ``extract`` command.
+    """
+    parser = subparsers.add_parser(
+        'extract',
+        description='Extracts data from one or more gde files to csv files,'
+                    ' without starting the graphical user interface. Each'
+                    ' file is written to a csv file with the same base name,'
+                    ' or to one file per data set if it has several.',
+        help='Extracts data from gde files to csv files.',
+    )
+    parser.add_argument(
+        'files',
+        nargs='+',
+        metavar='file',
+        help='The gde files to extract, given as file names, glob patterns,'
+             ' or directories to search for gde files.',
+    )
+    parser.add_argument(
+        '--output',
+        '-o',
+        default=None,
+        metavar='directory',
+        help='A directory to write the csv files to (default: next to each'
+             ' gde file). Gde files with the same name can not be extracted'
+             ' to the same directory.',
+    )
+    parser.add_argument(
+        '--jobs',
+        '-j',
+        type=int,
+        default=None,
+        metavar='n',
+        help='The number of files to process in parallel (default: the'
+             ' number of CPUs).',
+    )
+    parser.set_defaults(func=extract)
+
+
 #
 # GDE
 #
@@ -64,7 +211,8 @@ def gui(filename):
     """
     Runs the graph data extractor.
     """
-    import gde
+    import gde.gui
+    import gde.qt
     gde.qt.run(gde.gui.GraphDataExtractor, filename)
 
 
@@ -0,0 +1,3684 @@
+#
+# Documents, coordinate conversion and spline fitting for GDE.
+#
+# This module does not depend on Qt, so that documents can be loaded, edited
+# and extracted without a graphical user interface. The GUI in ``gde.gui`` is
+# built on top of it.
+#
+# This file is part of GDE.
+# See https://github.com/MichaelClerx/gde for sharing, and licensing details.
+#
+# -----------------------------------------------------------------------------
+#
+# GDE Document structure.
+#
+# All data is stored in a Document object which is a hierarchy of DocumentNode
+# objects. Each document node has a name unique within its parent. DocumentNode
+# objects can contain data in the form of DocumentVariable objects. Each
+# DocumentVariable has a name that is unique within its parent, although node
+# and variable names may overlap.
+#
+# The methods to edit and append documents use DocumentActions and can send out
+# signals to allow undo/redo and listeners. In the cases where this is not
+# desired, the silent_ methods can be used.
+#
+
+import collections
+import contextlib
+import hashlib
+import inspect
+import os
+import re
+import tempfile
+import traceback
+import weakref
+
+import xml.etree.cElementTree as et
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# Strings in Python 2 and 3
+try:
+    basestring
+except NameError:   # pragma: no python 2 cover
+    basestring = str
+
+
+# Latest supported Gde document version
+DOCUMENT_VERSION = 3
+
+# Tags / Node-types (ntypes)
+T_IMAGE = 'image'
+T_AXES = 'axes'
+T_AXIS = 'axis'
+T_AXIS_REFERENCE_POINT = 'refpoint'
+T_DATA_SETS = 'datasets'
+T_DATA_SET = 'dataset'
+T_DATA_POINT = 'datapoint'
+T_VARIABLE = 'variable'
+
+# Variable types
+V_STR = 'str'       # A string
+V_INT = 'int'       # An integer
+V_BOOL = 'bool'     # A boolean
+V_FLOAT = 'float'   # A float
+V_NORM = 'norm'     # A float in the range [0,1]
+V_PATH = 'path'     # A path name
+
+# Default limits on the undo history: the maximum number of steps that can be
+# undone, and the maximum estimated memory used by the history (in bytes)
+HISTORY_COUNT = 1000
+HISTORY_NBYTES = 64 * 1024 * 1024
+
+# Estimated memory used by nodes, variables and actions (in bytes), used to
+# keep track of the memory used by the undo history
+NODE_NBYTES = 600
+VARIABLE_NBYTES = 250
+ACTION_NBYTES = 500
+
+
+#
+# Signals
+#
+# Documents notify listeners of changes using signals, which work like a
+# simplified version of Qt's signals and slots.
+#
+class Signal(object):
+    """
+    A signal that can be emitted to notify any connected listeners (slots).
+
+    Signals are declared as class attributes, for example::
+
+        class Node(object):
+            # Attributes: node, variable
+            changed = Signal(object, object)
+
+    and used through instances, as ``node.changed.connect(slot)``,
+    ``node.changed.disconnect(slot)`` and ``node.changed.emit(node, var)``.
+    The arguments to ``Signal`` document the types of the emitted values, but
+    are not checked.
+
+    As with Qt signals, a slot can accept fewer arguments than are emitted, in
+    which case the trailing arguments are dropped. Slots that are bound
+    methods are stored as weak references, so connecting an object's method
+    to a signal does not keep that object alive.
+    """
+
+    def __init__(self, *types):
+        self._types = types
+        self._name = None
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return obj.__dict__[self._name]
+        except KeyError:
+            bound = obj.__dict__[self._name] = BoundSignal()
+            return bound
+
+    def __set_name__(self, owner, name):
+        self._name = '_signal_' + name
+
+    @staticmethod
+    def disconnect_all(obj):
+        """
+        Disconnects all slots from every signal of the object ``obj``.
+        """
+        for value in list(obj.__dict__.values()):
+            if isinstance(value, BoundSignal):
+                value.disconnect()
+
+
+class BoundSignal(object):
+    """
+    A :class:`Signal` bound to a single object.
+    """
+    __slots__ = ('_slots', )
+
+    # Number of positional arguments accepted by functions used as slots
+    _counts = weakref.WeakKeyDictionary()
+
+    def __init__(self):
+        # Connected slots, as lists [reference, argument count]
+        self._slots = []
+
+    @staticmethod
+    def _count(slot):
+        """
+        Returns the number of positional arguments accepted by ``slot``, or
+        ``None`` if it accepts any number (or if this can't be determined).
+        """
+        func = getattr(slot, '__func__', slot)
+        try:
+            n = BoundSignal._counts[func]
+        except (KeyError, TypeError):
+            try:
+                params = inspect.signature(func).parameters.values()
+            except (TypeError, ValueError):
+                return None
+            n = 0
+            for p in params:
+                if p.kind == p.VAR_POSITIONAL:
+                    n = None
+                    break
+                if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
+                    n += 1
+            try:
+                BoundSignal._counts[func] = n
+            except TypeError:
+                pass    # Can't be weakly referenced
+        if n is not None and func is not slot:
+            n -= 1  # Bound method: self is passed automatically
+        return n
+
+    def connect(self, slot):
+        """
+        Connects a callable ``slot`` to this signal.
+        """
+        if not callable(slot):
+            raise TypeError('Slot must be callable.')
+        ref = None
+        if hasattr(slot, '__self__') and hasattr(slot, '__func__'):
+            try:
+                ref = weakref.WeakMethod(slot)
+            except TypeError:
+                pass
+        if ref is None:
+            def ref(slot=slot):
+                return slot
+        self._slots.append([ref, self._count(slot)])
+
+    def disconnect(self, slot=None):
+        """
+        Disconnects the given ``slot``, or all slots if no slot is given.
+
+        Raises a ``TypeError`` if the slot is not connected.
+        """
+        if slot is None:
+            for entry in self._slots:
+                entry[0] = None
+            self._slots = []
+            return
+        for k, entry in enumerate(self._slots):
+            if entry[0]() == slot:
+                entry[0] = None
+                del(self._slots[k])
+                return
+        raise TypeError('Slot is not connected to this signal.')
+
+    def emit(self, *args):
+        """
+        Calls every connected slot with the given arguments.
+        """
+        dead = False
+        for entry in tuple(self._slots):
+            ref, n = entry
+            if ref is None:
+                continue    # Disconnected while emitting
+            slot = ref()
+            if slot is None:
+                dead = True
+            elif n is None:
+                slot(*args)
+            else:
+                slot(*args[:n])
+        if dead:
+            self._slots = [x for x in self._slots if x[0]() is not None]
+
+
+#
+# Document classes
+#
+class NodeList(object):
+    """
+    Ordered container for the child nodes of a :class:`DocumentNode`.
+
+    Children can be retrieved by name, using ``nodes[name]``, or by position,
+    using ``nodes.at(k)``. The position of a child can be found with
+    ``nodes.index(name)``. All three operations take constant time, regardless
+    of the number of children.
+
+    Appending or removing the last node is cheap, inserting or removing a node
+    anywhere else updates the positions of all nodes that follow it.
+    """
+
+    def __init__(self):
+        # Nodes, in order
+        self._nodes = []
+        # Map from node names to positions
+        self._positions = {}
+
+    def at(self, k):
+        """
+        Returns the node at position ``k``.
+        """
+        return self._nodes[k]
+
+    def __contains__(self, name):
+        """
+        Returns True if this list contains a node with the given name.
+        """
+        return name in self._positions
+
+    def __getitem__(self, name):
+        """
+        Returns the node with the given name.
+        """
+        return self._nodes[self._positions[name]]
+
+    def index(self, name):
+        """
+        Returns the position of the node with the given name.
+        """
+        return self._positions[name]
+
+    def insert(self, node, k=None):
+        """
+        Inserts a node at position ``k``, or appends it if ``k`` is ``None``.
+
+        Returns the position the node was inserted at.
+        """
+        name = node.get_name()
+        if name in self._positions:
+            raise KeyError('Duplicate node name: "' + name + '".')
+        n = len(self._nodes)
+        if k is None or k >= n:
+            self._nodes.append(node)
+            self._positions[name] = n
+            return n
+        k = max(0, k)
+        self._nodes.insert(k, node)
+        self._update_positions(k)
+        return k
+
+    def __iter__(self):
+        """
+        Returns an iterator over the nodes in this list.
+        """
+        return iter(self._nodes)
+
+    def __len__(self):
+        """
+        Returns the number of nodes in this list.
+        """
+        return len(self._nodes)
+
+    def remove(self, name):
+        """
+        Removes the node with the given name, and returns its former position.
+        """
+        k = self._positions.pop(name)
+        del(self._nodes[k])
+        self._update_positions(k)
+        return k
+
+    def _update_positions(self, start):
+        """
+        Updates the stored positions of all nodes from ``start`` onwards.
+        """
+        nodes = self._nodes
+        positions = self._positions
+        for k in range(start, len(nodes)):
+            positions[nodes[k].get_name()] = k
+
+
+class DocumentNode(object):
+    """
+    The ``DocumentNode`` class is used to build a tree structure where each
+    node can contain one or more ``DataValue`` objects.
+
+    A ``parent`` must be specified: For document roots this should be
+    ``None``, for all other nodes it should be the parent node.
+
+    Each node has an ``ntype``, which describes the type of node it is. This is
+    a string property that can be set freely.
+
+    Data stored in the node can be obtained using ``get_value()``
+    """
+    # Signals
+    # Called when this node was deselected in one of the views
+    # Attributes: self
+    node_deselected = Signal(object)
+    # Called when this node was selected in one of the views
+    # Attributes: self
+    node_selected = Signal(object)
+    # Called when this node was removed
+    # Attributes: self
+    node_removed = Signal(object)
+    # Called when a child was added to this node
+    # Attributes: self, child
+    child_added = Signal(object, object)
+    # Called when a child was removed from this node
+    # Attributes: self, child
+    child_removed = Signal(object, object)
+    # Called when a variable was added to this node
+    # Attributes: self, DocumentVariable
+    variable_added = Signal(object, object)
+    # Called when a variable was removed from this nod
+    # Attributes: self, DocumentVariable
+    variable_removed = Signal(object, object)
+    # Called when a variable in this node was changed
+    # Attributes: self, DocumentVariable
+    variable_changed = Signal(object, object)
+
+    def __init__(self, parent, ntype, name):
+        self._parent = parent if isinstance(parent, DocumentNode) else None
+        self._ntype = ntype
+        self._name = name
+        # The document this node belongs to (set when attached to a document)
+        self._document = None
+        if self._parent is not None:
+            self._document = self._parent._document
+        # This node's data
+        self._data = collections.OrderedDict()
+        # This node's children
+        self._kids = NodeList()
+        # Selection
+        self._selected = False
+
+    def add_child(self, ntype, name, variables=None):
+        """
+        Appends a child to this node.
+
+        Variables can be added by setting ``variables`` to a list of tuples
+        ``(type, name, value)``.
+
+        """
+        if variables is None:
+            variables = ()
+        action = DA_AddNode(self, ntype, name, variables)
+        return self.get_document()._perform(action)
+
+    def add_variable(self, vtype, name, value=None):
+        """
+        Adds a DocumentVariable to this node.
+        """
+        action = DA_AddVariable(self, vtype, name, value)
+        return self.get_document()._perform(action)
+
+    def __bool__(self):     # pragma: no python 2 cover
+        """
+        Python 3 equivalent of :meth:`__nonzero__()`.
+        """
+        return True
+
+    def can_drag(self):
+        """
+        Returns True if this item is draggable / droppable.
+        """
+        return self.get_document().can_drag(self)
+
+    def child(self, k):
+        """
+        Returns the ``k-th`` child node.
+
+        **Required to work with DocumentModel.**
+        """
+        return self._kids.at(k)
+
+    def clear_selection(self):
+        """
+        Clears the selection (if any) of this node and any children nodes.
+        """
+        self.deselect()
+        for kid in self._kids:
+            kid.clear_selection()
+
+    def deselect(self):
+        """
+        Deselect this node in any listening views.
+        """
+        if self._selected:
+            self._selected = False
+            self.node_deselected.emit(self)
+
+    def get(self, *names):
+        """
+        Returns the child node with the given name.
+        """
+        if len(names) == 0:
+            return self
+        return self._kids[names[0]].get(*names[1:])
+
+    def get_document(self):
+        """
+        Retuns the document this node is in.
+        """
+        if self._document is None:
+            raise Exception('No Document set in hierarchy for ' + str(self))
+        return self._document
+
+    def get_name(self):
+        """
+        Returns this node's name.
+        """
+        return self._name
+
+    def get_ntype(self):
+        """
+        Returns this node's ntype.
+        """
+        return self._ntype
+
+    def get_parent_node(self):
+        """
+        Returns this node's parent, or ``None`` if this node is a root node.
+        """
+        return self._parent
+
+    def get_value(self, name):
+        """
+        Returns the value of this node's variable with the given name.
+        """
+        return self._data[str(name)].get_value()
+
+    def get_values(self, *names):
+        """
+        Returns all the requested variable values (see get_value())
+        """
+        x = [0] * len(names)
+        for k, name in enumerate(names):
+            x[k] = self._data[str(name)].get_value()
+        return tuple(x)
+
+    def get_variable(self, name):
+        """
+        Returns this node's variable with the given name.
+        """
+        name = str(name)
+        return self._data[name]
+
+    def get_xml(self):
+        """
+        Returns an ElementTree xml version of this node.
+        """
+        e = et.Element(self._ntype)
+        e.attrib['name'] = self._name
+        for d in self._data.values():
+            e.append(d.get_xml())
+        for k in self._kids:
+            e.append(k.get_xml())
+        return e
+
+    def write_xml(self, f, indent='\t', level=0, points=None):
+        """
+        Writes an xml version of this node to the text stream ``f``.
+
+        Each element is written on a new line, indented with ``level`` copies
+        of ``indent``. If ``indent`` is ``None`` the xml is written without
+        any whitespace.
+
+        If a :class:`BinaryPoints` object is given as ``points``, data sets
+        add their points to it instead of writing them as xml.
+        """
+        pre, end = ('', '') if indent is None else (indent * level, '\n')
+        tag = self._xml_start_tag(points)
+        if len(self._data) == 0 and len(self) == 0:
+            f.write(pre + tag[:-1] + '/>' + end)
+            return
+        f.write(pre + tag + end)
+        for d in self._data.values():
+            d.write_xml(f, indent, level + 1)
+        self._write_xml_children(f, indent, level + 1, points)
+        f.write(pre + '</' + self._ntype + '>' + end)
+
+    def _write_xml_children(self, f, indent, level, points):
+        """
+        Writes an xml version of this node's children to the text stream
+        ``f`` (see :meth:`write_xml`).
+        """
+        for k in self._kids:
+            k.write_xml(f, indent, level, points)
+
+    def _xml_start_tag(self, points):
+        """
+        Returns the xml start tag for this node.
+        """
+        return '<' + self._ntype + xml_attributes(name=self._name) + '>'
+
+    def has_value(self, name):
+        """
+        Returns True if this node has a variable with the given name.
+        """
+        return name in self._data
+
+    def index(self):
+        """
+        Returns the index of this node in its parent's list of kids.
+
+        **Required to work with DocumentModel**
+        """
+        if self._parent is None:
+            return 0
+        return self._parent._kids.index(self._name)
+
+    def is_selected(self):
+        """
+        Returns True if this node is selected.
+        """
+        return self._selected
+
+    def __iter__(self):
+        """
+        Returns an iterator over this node's children.
+        """
+        return iter(self._kids)
+
+    def data(self):
+        """
+        Returns an iterator over the :class:`DocumentValue` objects stored in
+        this node.
+        """
+        return iter(self._data.values())
+
+    def __len__(self):
+        """
+        Returns the number of children this node has.
+        """
+        return len(self._kids)
+
+    def __nonzero__(self):  # pragma: no python 3 cover
+        """
+        Used when writing ``if node:``, without overloading this, the value of
+        ``__len__`` would be used in these cases.
+
+        In Python 3, this was renamed __bool__.
+        """
+        return True
+
+    def parent(self):
+        """
+        Returns this node's parent.
+
+        **Required to work with DocumentModel.**
+        """
+        return self._parent
+
+    def nbytes(self):
+        """
+        Returns an estimate of the memory (in bytes) used by this node, its
+        variables, and its descendants.
+        """
+        n = NODE_NBYTES + VARIABLE_NBYTES * len(self._data)
+        for kid in self._kids:
+            n += kid.nbytes()
+        return n
+
+    def release(self):
+        """
+        Disconnects all listeners from this node, its variables and its
+        descendants.
+
+        Used when a node that has been removed from its document will not be
+        added back (e.g. when the action that removed it can no longer be
+        undone).
+        """
+        Signal.disconnect_all(self)
+        for var in self._data.values():
+            Signal.disconnect_all(var)
+        for kid in self._kids:
+            kid.release()
+
+    def remove(self):
+        """
+        Removes this node.
+        """
+        action = DA_RemoveNode(self)
+        return self.get_document()._perform(action)
+    #def remove_variable(self, variable):
+
+    def select(self):
+        """
+        Tells any views listening to this node that it should be selected.
+        """
+        if not self._selected:
+            self._selected = True
+            self.get_document().node_selected.emit(self)
+            self.node_selected.emit(self)
+
+    def set_value(self, **values):
+        """
+        Sets one or more variables in this node using the keyword syntax.
+        """
+        action = DA_ChangeVariables(self, values)
+        return self.get_document()._perform(action)
+
+    def silent_add_child(self, ntype, name, variables=None):
+        """
+        Creates and appends a child node without using actions or sending out
+        signals.
+
+        Variables can be added by setting ``variables`` to a list of tuples
+        ``(type, name, value)``.
+
+        Returns the new node.
+        """
+        node = self.get_document().create_node(self, ntype, str(name))
+        self.silent_add_existing_child(node)
+        if variables is not None:
+            for t, n, v in variables:
+                node.silent_add_variable(t, n, v)
+        return node
+
+    def silent_add_existing_child(self, child, index=None):
+        """
+        Appends a child node without using actions or sending out signals.
+
+        If an ``index`` is given, the child is inserted at that position
+        instead of appended at the end.
+
+        Returns the added node.
+        """
+        name = child.get_name()
+        if name in self._kids:
+            raise AttributeError('Duplicate child node: "' + name + '".')
+        # Notify views
+        d = self.get_document()
+        n = len(self._kids)
+        if index is not None:
+            n = max(0, min(n, index))
+        d.rows_inserting.emit(self, n, n)
+        # Add child
+        self._kids.insert(child, n)
+        child._set_document(self._document)
+        d.rows_inserted.emit(self, n, n)
+        # Return added child node
+        return child
+
+    def silent_add_existing_variable(self, var):
+        """
+        Appens a variable without using actions or sending out signals.
+
+        Returns the added variable.
+        """
+        name = var.get_name()
+        if name in self._data:
+            raise AttributeError('Duplicate variable name: "' + name + '".')
+        # Add
+        self._data[name] = var
+        # Return added variable
+        return var
+
+    def silent_add_variable(self, vtype, name, value=None):
+        """
+        Creates and appends a variable to this node without using actions or
+        sending out signals.
+
+        Returns the new variable.
+        """
+        var = DocumentVariable(self, vtype, str(name), value)
+        return self.silent_add_existing_variable(var)
+
+    def silent_remove_child(self, node):
+        """
+        Removes a child without using actions or sending out signals.
+
+        Returns the position the child was at, which can be passed to
+        :meth:`silent_add_existing_child` to restore it.
+        """
+        if node.get_parent_node() != self:
+            raise AttributeError('Node is not a child of this node.')
+        node.deselect()
+        n = node.index()
+        d = self.get_document()
+        d.rows_removing.emit(self, n, n)
+        self._kids.remove(node.get_name())
+        node._set_document(None)
+        d.rows_removed.emit(self, n, n)
+        return n
+
+    def silent_remove_variable(self, variable):
+        """
+        Removes a variable without using actions or sending out signals.
+        """
+        del(self._data[variable.get_name()])
+
+    def _set_document(self, document):
+        """
+        Sets the document for this node and all its descendants.
+
+        Called when a node is attached to (or detached from) a document.
+        """
+        self._document = document
+        for kid in self._kids:
+            kid._set_document(document)
+
+
+class Document(DocumentNode):
+    """
+    Represents an xml like document.
+    """
+    # Signals
+    # Emitted when an exception occurs during an action
+    # Attributes: Document, DocumentAction, Exception
+    action_exception = Signal(object, object, Exception)
+    # Emitted when the undo/redo history changes
+    # Attributes: Document
+    undo_redo_change = Signal(object)
+    # Called when a node was selected in one of the views
+    # Attributes: node or none
+    node_selected = Signal(object)
+    # Called when a node is added somewhere in the document
+    # Attributes: parent, child
+    doc_node_added = Signal(object, object)
+    # Called when a node is removed from the document
+    # Attributes: parent, child
+    doc_node_removed = Signal(object, object)
+    # Called when a document is deleted
+    # Attributes: document
+    doc_deleted = Signal(object)
+    # Called before and after child nodes are inserted into or removed from a
+    # node. Unlike the other signals, these are also emitted by the silent_
+    # methods, so that views mirroring the tree structure stay up to date.
+    # Attributes: parent, first, last
+    rows_inserting = Signal(object, int, int)
+    rows_inserted = Signal(object, int, int)
+    rows_removing = Signal(object, int, int)
+    rows_removed = Signal(object, int, int)
+    # Called when a transaction is committed or rolled back, and after an
+    # action is undone or redone
+    # Attributes: document
+    transaction_finished = Signal(object)
+    # Called with a batch of all nodes whose variables or children were
+    # changed by actions since the last batch (see set_change_scheduler)
+    # Attributes: document, set of nodes
+    nodes_changed = Signal(object, object)
+
+    def __init__(self, filename=None):
+        super(Document, self).__init__(None, 'document', 'document')
+        # A document is always its own document
+        self._document = self
+        # List of actions (changes) performed on this model.
+        self._undo = []
+        # List of undone changes
+        self._redo = []
+        # Estimated memory used by the undo and redo lists, in bytes
+        self._history_nbytes = 0
+        # Maximum number of undo steps and history memory (None for no limit)
+        self._history_limit = (HISTORY_COUNT, HISTORY_NBYTES)
+        # Actions performed in the current transaction, or None
+        self._transaction = None
+        # True while an action is being undone or redone
+        self._replaying = False
+        # Nodes changed since the last nodes_changed batch
+        self._changed_nodes = set()
+        # Function used to schedule delivery of a batch, or None, and True if
+        # a delivery is scheduled
+        self._schedule = None
+        self._scheduled = False
+        # Read the given file or create a default structure
+        self._read_file(filename)
+        # No changes!
+        self._changed = False
+
+    def can_drag(self, node):
+        """
+        Returns True if the given DocumentNode is drag/drop enabled.
+        """
+        return False
+
+    def can_redo(self):
+        """
+        Returns True if there are actions that can be redone.
+        """
+        return len(self._redo) > 0
+
+    def can_undo(self):
+        """
+        Returns True if there are actions that can be undone.
+        """
+        return len(self._undo) > 0
+
+    def _changes_made(self, action):
+        """
+        Adds the nodes changed by ``action`` to the next ``nodes_changed``
+        batch, and delivers or schedules the batch if no transaction is in
+        progress.
+        """
+        self._changed_nodes.update(action.changed_nodes())
+        if self._transaction is not None or not self._changed_nodes:
+            return
+        if self._schedule is None:
+            self.flush_changes()
+        elif not self._scheduled:
+            self._scheduled = True
+            self._schedule(self.flush_changes)
+
+    def clear_history(self):
+        """
+        Clears the undo and redo history.
+        """
+        for action in self._undo + self._redo:
+            action.release()
+        self._undo = []
+        self._redo = []
+        self._history_nbytes = 0
+        self.undo_redo_change.emit(self)
+
+    def create_node(self, parent, ntype, name):
+        """
+        Creates (but does not add) a new node of the given ``ntype`` for use in
+        this document.
+
+        Subclasses can override this method to use specialised node classes.
+        """
+        return DocumentNode(parent, ntype, name)
+
+    def delete(self):
+        """
+        Deletes this document.
+        """
+        self.doc_deleted.emit(self)
+
+    def flush_changes(self):
+        """
+        Emits ``nodes_changed`` with all nodes changed since the last batch,
+        if any.
+        """
+        self._scheduled = False
+        changed = self._changed_nodes
+        if changed:
+            self._changed_nodes = set()
+            self.nodes_changed.emit(self, changed)
+
+    def has_changes(self):
+        """
+        Returns True if any changes were made to this document (even if they
+        were subsequently undone).
+        """
+        return self._changed
+
+    def history_count(self):
+        """
+        Returns the number of steps that can be undone.
+        """
+        return len(self._undo)
+
+    def history_nbytes(self):
+        """
+        Returns an estimate of the memory (in bytes) used by the undo and redo
+        history, including nodes that are kept only so that their removal can
+        be undone.
+        """
+        return self._history_nbytes
+
+    def in_transaction(self):
+        """
+        Returns True if a transaction is in progress (see
+        :meth:`transaction()`), or if an action is being undone or redone.
+        """
+        return self._transaction is not None or self._replaying
+
+    def _perform(self, action):
+        """
+        Performs an action on this model.
+        """
+        try:
+            result = action.perform()
+            self._changed = True
+        except Exception as e:
+            # Show error info in console
+            print('Exception performing action: ' + str(type(action)))
+            print(traceback.format_exc())
+            # Emit signal about exception
+            self.action_exception.emit(self, action, e)
+            # Roll back transaction, or return None
+            if self._transaction is not None:
+                raise
+            return None
+        # Add action to current transaction, or to the undo list
+        if self._transaction is not None:
+            self._transaction.append(action)
+        else:
+            self._push(action)
+        self._changes_made(action)
+        # Return action result
+        return result
+
+    def _push(self, action):
+        """
+        Adds a performed action to the undo list, and clears the redo list.
+        """
+        for redo in self._redo:
+            self._history_nbytes -= redo.nbytes()
+            redo.release()
+        self._redo = []
+        self._undo.append(action)
+        self._history_nbytes += action.nbytes()
+        self._trim_history()
+        self.undo_redo_change.emit(self)
+
+    def _read_file(self, filename=None):
+        """
+        Loads the data in the given file into this document.
+        """
+        raise NotImplementedError
+
+    def redo(self):
+        """
+        Redoes the last undone action.
+        """
+        action = self._redo[-1]
+        nbytes = action.nbytes()
+        self._replaying = True
+        try:
+            result = action.perform()
+            self._changed = True
+        except Exception as e:
+            # Show error info in console
+            print('Exception redoing action: ' + str(type(action)))
+            print(traceback.format_exc())
+            # Emit signal about exception
+            self.action_exception.emit(self, action, e)
+            # Return None
+            return None
+        finally:
+            self._replaying = False
+            self.transaction_finished.emit(self)
+        # Move action to undo list
+        self._redo.pop()
+        self._undo.append(action)
+        self._history_nbytes += action.nbytes() - nbytes
+        self._trim_history()
+        self.undo_redo_change.emit(self)
+        self._changes_made(action)
+        # Return action result
+        return result
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Context manager that groups all actions performed inside it into a
+        single action, that can be undone and redone in one step::
+
+            with document.transaction():
+                for x, y in points:
+                    data_set.add_child(...)
+
+        The ``undo_redo_change`` signal is emitted once, when the transaction
+        is committed. Listeners that do expensive work on every change can
+        check :meth:`in_transaction()`, and wait for ``transaction_finished``.
+
+        If an exception occurs (including in one of the actions), all actions
+        performed in the transaction are undone and the exception is raised.
+
+        Transactions can be nested, in which case the actions of the inner
+        transaction become part of the outer one. An exception in an inner
+        transaction only undoes its own actions.
+        """
+        outer = self._transaction is None
+        if outer:
+            self._transaction = []
+            changed = self._changed
+        actions = self._transaction
+        start = len(actions)
+        try:
+            yield
+        except BaseException:
+            # Roll back actions performed in this transaction, and release
+            # them, as they won't be added to the history
+            try:
+                for action in reversed(actions[start:]):
+                    action.undo()
+                    self._changed_nodes.update(action.changed_nodes())
+                    action.release()
+                del(actions[start:])
+            finally:
+                if outer:
+                    self._transaction = None
+                    self._changed = changed
+                    self._changes_made(DA_Compound(()))
+                    self.transaction_finished.emit(self)
+            raise
+        if outer:
+            # Commit
+            self._transaction = None
+            action = DA_Compound(actions)
+            if actions:
+                self._push(action)
+            self._changes_made(action)
+            self.transaction_finished.emit(self)
+
+    def set_change_scheduler(self, schedule=None):
+        """
+        Sets a function used to schedule the delivery of ``nodes_changed``
+        batches.
+
+        By default, a batch is delivered after every action performed, undone
+        or redone outside of a transaction, and after every transaction. If a
+        ``schedule`` function is set, it is called with a callable (the first
+        time a change is made after a batch was delivered), and should arrange
+        for that callable to be called later. A GUI can use this to deliver a
+        single batch per turn of its event loop, e.g. with
+        ``lambda f: QTimer.singleShot(0, f)``.
+        """
+        self._schedule = schedule
+
+    def set_history_limit(self, count=HISTORY_COUNT, nbytes=HISTORY_NBYTES):
+        """
+        Limits the undo history to at most ``count`` steps, and to an
+        estimated ``nbytes`` bytes of memory. Either limit can be set to
+        ``None`` to disable it.
+
+        When a limit is exceeded, the oldest steps are removed from the
+        history, and any nodes they kept alive are released. The most recent
+        step is always kept.
+        """
+        self._history_limit = (count, nbytes)
+        if self._trim_history():
+            self.undo_redo_change.emit(self)
+
+    def _trim_history(self):
+        """
+        Removes the oldest actions from the undo list until the history is
+        within its limits, and returns True if any actions were removed.
+        """
+        count, nbytes = self._history_limit
+        n = 0
+        while len(self._undo) - n > 1:
+            too_long = count is not None and len(self._undo) - n > count
+            too_big = nbytes is not None and self._history_nbytes > nbytes
+            if not (too_long or too_big):
+                break
+            action = self._undo[n]
+            self._history_nbytes -= action.nbytes()
+            action.release()
+            n += 1
+        if n:
+            del(self._undo[:n])
+        return n > 0
+
+    def undo(self):
+        """
+        Undoes the last action.
+        """
+        action = self._undo[-1]
+        nbytes = action.nbytes()
+        self._replaying = True
+        try:
+            result = action.undo()
+            self._changed = True
+        except Exception as e:
+            # Show error info in console
+            print('Exception undoing action: ' + str(type(action)))
+            print(traceback.format_exc())
+            # Emit signal about exception
+            self.action_exception.emit(self, action, e)
+            # Return None
+            return None
+        finally:
+            self._replaying = False
+            self.transaction_finished.emit(self)
+        # Move action to redo list
+        self._undo.pop()
+        self._redo.append(action)
+        self._history_nbytes += action.nbytes() - nbytes
+        self.undo_redo_change.emit(self)
+        self._changes_made(action)
+        # Return action result
+        return result
+
+    def write(self, filename, compact=False):
+        """
+        Writes this document to the given path.
+
+        The xml is written directly to a temporary file in the same directory,
+        which then replaces ``filename``, so that an existing file is never
+        left half-written. If ``compact=True`` no indenting or newlines are
+        written.
+        """
+        with replace_file(filename) as f:
+            f.write(XML_HEADER)
+            self.write_xml(f, None if compact else '\t')
+        self._changed = False
+
+
+class DocumentVariable(object):
+    """
+    Stores a variable in a document node.
+    """
+    # Signals
+    # Called when this variable was removed
+    # Attributes: self
+    variable_removed = Signal(object)
+    # Called when this variable was changed
+    # Attributes: self
+    variable_changed = Signal(object)
+
+    def __init__(self, node, vtype, name, value=None):
+        self._node = node
+        self._vtype = vtype
+        self._name = name
+        if isinstance(value, basestring):
+            self._value = self._value_from_string(value)
+        else:
+            self._value = value
+
+    def get_name(self):
+        """
+        Returns this variable's name.
+        """
+        return self._name
+
+    def get_node(self):
+        """
+        Returns the node this variable belongs to.
+        """
+        return self._node
+
+    def get_str_value(self):
+        """
+        Returns this variable's value as a string.
+        """
+        return self._value_to_string(self.get_value())
+
+    def get_value(self):
+        """
+        Returns this variable's value in its native type.
+        """
+        return self._value
+
+    def get_vtype(self):
+        """
+        Returns this variable's data type.
+        """
+        return self._vtype
+
+    def set_value(self, value):
+        """
+        Changes this variable's value.
+        """
+        if isinstance(value, basestring):
+            value = self._value_from_string(value)
+        action = DA_ChangeVariable(self, value)
+        return self.get_node().get_document()._perform(action)
+
+    def get_xml(self):
+        """
+        Returns an ElementTree object representing this variable.
+        """
+        e = et.Element(T_VARIABLE)
+        e.attrib['vtype'] = self._vtype
+        e.attrib['name'] = self._name
+        e.attrib['value'] = self.get_str_value()
+        return e
+
+    def write_xml(self, f, indent='\t', level=0):
+        """
+        Writes an xml version of this variable to the text stream ``f`` (see
+        :meth:`DocumentNode.write_xml`).
+        """
+        pre, end = ('', '') if indent is None else (indent * level, '\n')
+        f.write(pre + '<' + T_VARIABLE + xml_attributes(
+            vtype=self._vtype, name=self._name, value=self.get_str_value())
+            + '/>' + end)
+
+    def silent_set_value(self, value):
+        """
+        Changes this variable's data type, without using actions or sending
+        signals.
+        """
+        if isinstance(value, basestring):
+            value = self._value_from_string(value)
+        self._value = value
+
+    def _value_from_string(self, value):
+        """
+        Creates a value from a string.
+        """
+        if self._vtype == V_INT:
+            return int(value) if value else 0
+        elif self._vtype == V_FLOAT:
+            return float(value) if value else 0
+        elif self._vtype == V_NORM:
+            return min(1, max(0, float(value) if value else 0))
+        elif self._vtype in (V_STR, V_PATH):
+            return str(value)
+        elif self._vtype == V_BOOL:
+            return (value.lower() == 'true')
+        else:
+            raise Exception('Unknown variable type: ' + str(self._vtype))
+
+    def _value_to_string(self, value):
+        if self._vtype == V_INT:
+            return str(value)
+        elif self._vtype == V_BOOL:
+            return str(value)
+        elif self._vtype in (V_FLOAT, V_NORM):
+            return str(value)
+        elif self._vtype in (V_STR, V_PATH):
+            return '' if value is None else value
+        else:
+            raise Exception('Unknown variable type: ' + str(self._vtype))
+
+
+class PointArray(object):
+    """
+    Columnar storage for the points in a data set.
+
+    The x and y coordinates of all points are stored in NumPy arrays, along
+    with an integer ID for each point. IDs are unique within an array, and do
+    not change when other points are added or removed.
+
+    Arrays returned by :meth:`x()`, :meth:`y()` and :meth:`ids()` are views on
+    the internal storage, and should not be modified.
+
+    An empty point array can also use existing arrays as its storage, e.g. a
+    read-only memory map of a binary file (see :meth:`extend()`). These are
+    then copied when the points are first changed.
+    """
+
+    def __init__(self):
+        # Number of points
+        self._n = 0
+        # Storage, with room for more points than currently stored
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+        self._ids = np.empty(0, dtype=np.int64)
+        # True if the storage is shared, and must be copied before changing
+        self._shared = False
+        # Map from point IDs to rows, or None if it needs to be rebuilt
+        self._rows = None
+        # Next unused point ID
+        self._next_id = 1
+
+    def append(self, x, y, pid=None):
+        """
+        Appends a point and returns its ID.
+        """
+        return self.insert(None, x, y, pid)
+
+    def __contains__(self, pid):
+        """
+        Returns True if this array contains a point with the given ID.
+        """
+        return pid in self._row_map()
+
+    def extend(self, x, y, ids=None, copy=True):
+        """
+        Appends points with coordinates ``x`` and ``y``, and returns their IDs.
+
+        IDs can be given as a sequence, any IDs that are ``None`` or already in
+        use will be replaced by new ones.
+
+        If ``copy=False``, this array is empty, and ``ids`` is an integer array
+        of unique positive IDs, then ``x``, ``y`` and ``ids`` are used as
+        storage without copying them. They are not modified, but copied when
+        the points are first changed.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n = len(x)
+        if len(y) != n:
+            raise ValueError('Arrays x and y must have the same length.')
+        if not copy and self._n == 0 and n > 0 and ids is not None:
+            ids = np.asarray(ids)
+            if ids.dtype == np.int64 and len(ids) == n and np.min(ids) > 0:
+                if len(np.unique(ids)) == n:
+                    self._x, self._y, self._ids = x, y, ids
+                    self._n = n
+                    self._next_id = int(np.max(ids)) + 1
+                    self._rows = None
+                    self._shared = True
+                    return ids
+            ids = ids.tolist()
+        self.unshare()
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        else:
+            if len(ids) != n:
+                raise ValueError('Arrays x and ids must have the same length.')
+            taken = set(self._row_map())
+            new_id = max([self._next_id] + [i + 1 for i in ids if i])
+            checked = []
+            for pid in ids:
+                if pid is None or pid in taken:
+                    pid = new_id
+                    new_id += 1
+                taken.add(pid)
+                checked.append(pid)
+            ids = np.array(checked, dtype=np.int64)
+        a, b = self._n, self._n + n
+        self._reserve(b)
+        self._x[a:b] = x
+        self._y[a:b] = y
+        self._ids[a:b] = ids
+        self._n = b
+        if n:
+            self._next_id = max(self._next_id, int(np.max(ids)) + 1)
+        self._rows = None
+        return ids
+
+    def get(self, pid):
+        """
+        Returns the coordinates ``(x, y)`` of the point with the given ID.
+        """
+        row = self.row(pid)
+        return float(self._x[row]), float(self._y[row])
+
+    def ids(self):
+        """
+        Returns an array with the ID of every point.
+        """
+        return self._ids[:self._n]
+
+    def insert(self, row, x, y, pid=None):
+        """
+        Inserts a point at the given ``row`` (or appends it if ``row`` is
+        ``None``) and returns its ID.
+
+        If no ``pid`` is given, a new ID is created.
+        """
+        if pid is None:
+            pid = self._next_id
+        elif pid in self:
+            raise ValueError('Duplicate point ID: ' + str(pid) + '.')
+        self.unshare()
+        n = self._n
+        row = n if row is None else max(0, min(n, row))
+        self._reserve(n + 1)
+        if row < n:
+            for a in (self._x, self._y, self._ids):
+                a[row + 1:n + 1] = a[row:n]
+            self._rows = None
+        self._x[row] = x
+        self._y[row] = y
+        self._ids[row] = pid
+        self._n = n + 1
+        if self._rows is not None:
+            self._rows[pid] = row
+        self._next_id = max(self._next_id, pid + 1)
+        return pid
+
+    def __len__(self):
+        """
+        Returns the number of points in this array.
+        """
+        return self._n
+
+    def nbytes(self):
+        """
+        Returns the number of bytes used to store the point data.
+        """
+        return self._x.nbytes + self._y.nbytes + self._ids.nbytes
+
+    def remove(self, pid):
+        """
+        Removes the point with the given ID, and returns the row it was in.
+        """
+        row = self.row(pid)
+        self.unshare()
+        n = self._n - 1
+        if row < n:
+            for a in (self._x, self._y, self._ids):
+                a[row:n] = a[row + 1:n + 1]
+            self._rows = None
+        else:
+            del(self._rows[pid])
+        self._n = n
+        return row
+
+    def _reserve(self, n):
+        """
+        Ensures there is storage for at least ``n`` points.
+        """
+        if n > len(self._x):
+            size = max(16, n, 2 * len(self._x))
+            for name in ('_x', '_y', '_ids'):
+                old = getattr(self, name)
+                new = np.empty(size, dtype=old.dtype)
+                new[:self._n] = old[:self._n]
+                setattr(self, name, new)
+
+    def row(self, pid):
+        """
+        Returns the row of the point with the given ID.
+        """
+        return self._row_map()[pid]
+
+    def _row_map(self):
+        """
+        Returns a dict mapping point IDs to rows.
+        """
+        if self._rows is None:
+            self._rows = dict(zip(self.ids().tolist(), range(self._n)))
+        return self._rows
+
+    def set(self, pid, x=None, y=None):
+        """
+        Changes the coordinates of the point with the given ID.
+        """
+        row = self.row(pid)
+        self.unshare()
+        if x is not None:
+            self._x[row] = x
+        if y is not None:
+            self._y[row] = y
+
+    def is_shared(self):
+        """
+        Returns True if this array uses shared storage, that will be copied
+        when the points are first changed (see :meth:`extend()`).
+        """
+        return self._shared
+
+    def unshare(self):
+        """
+        Copies shared storage (see :meth:`extend()`) into new arrays owned by
+        this point array. Does nothing if the storage is not shared.
+        """
+        if self._shared:
+            self._shared = False
+            for name in ('_x', '_y', '_ids'):
+                setattr(self, name, np.array(getattr(self, name)[:self._n]))
+
+    def x(self):
+        """
+        Returns an array with the x-coordinate of every point.
+        """
+        return self._x[:self._n]
+
+    def y(self):
+        """
+        Returns an array with the y-coordinate of every point.
+        """
+        return self._y[:self._n]
+
+
+class PointGrid(object):
+    """
+    A spatial index for points in normalised coordinates.
+
+    The unit square is divided into ``n`` by ``n`` cells, and the rows of the
+    points in each cell are stored together, so that the points near a
+    location can be found without checking every point. Points outside the
+    unit square are stored in the nearest cell.
+
+    Cells are numbered row by row, so that the cell at column ``i`` and row
+    ``j`` has index ``j * n + i``. The grid copies the given coordinates, and
+    is not updated when the points change.
+    """
+
+    def __init__(self, x, y, n=32):
+        self._n = int(n)
+        self._x = np.array(x, dtype=float)
+        self._y = np.array(y, dtype=float)
+        # Cell of every point, and rows sorted by cell
+        self._cells = self._index(self._y) * self._n + self._index(self._x)
+        self._order = np.argsort(self._cells, kind='stable')
+        # Start of each cell's rows in the sorted list
+        self._starts = np.searchsorted(
+            self._cells[self._order], np.arange(self._n * self._n + 1))
+
+    def cell(self, row):
+        """
+        Returns the index of the cell containing the point in the given row.
+        """
+        return int(self._cells[row])
+
+    def cells(self, x0, y0, x1, y1):
+        """
+        Returns a list of the indices of all cells that overlap with the
+        rectangle from ``(x0, y0)`` to ``(x1, y1)``.
+        """
+        i0, i1 = self._index(x0), self._index(x1)
+        j0, j1 = self._index(y0), self._index(y1)
+        return [j * self._n + i
+                for j in range(j0, j1 + 1) for i in range(i0, i1 + 1)]
+
+    def cell_rect(self, cell):
+        """
+        Returns the rectangle covered by the given cell, as a tuple
+        ``(x0, y0, x1, y1)``.
+        """
+        i, j = cell % self._n, cell // self._n
+        return i / self._n, j / self._n, (i + 1) / self._n, (j + 1) / self._n
+
+    def _index(self, v):
+        """
+        Returns the column (or row) of the cells containing the coordinates
+        ``v`` (an array or a scalar).
+        """
+        i = np.clip(np.floor(np.asarray(v) * self._n), 0, self._n - 1)
+        return i.astype(int) if i.ndim else int(i)
+
+    def __len__(self):
+        """
+        Returns the number of points in this grid.
+        """
+        return len(self._x)
+
+    def nearest(self, x, y, r):
+        """
+        Returns the row of the point nearest to ``(x, y)``, or ``None`` if no
+        point lies within a distance ``r``.
+        """
+        rows = [self.rows(c) for c in self.cells(x - r, y - r, x + r, y + r)]
+        rows = np.concatenate(rows)
+        if len(rows) == 0:
+            return None
+        d = (self._x[rows] - x)**2 + (self._y[rows] - y)**2
+        k = np.argmin(d)
+        return int(rows[k]) if d[k] <= r * r else None
+
+    def rows(self, cell):
+        """
+        Returns an array with the rows of all points in the given cell.
+        """
+        return self._order[self._starts[cell]:self._starts[cell + 1]]
+
+    def x(self):
+        """
+        Returns an array with the x-coordinate of every point.
+        """
+        return self._x
+
+    def y(self):
+        """
+        Returns an array with the y-coordinate of every point.
+        """
+        return self._y
+
+
+class BinaryPoints(object):
+    """
+    Stores the points of all data sets in a document in a single NumPy array,
+    which is saved as a binary ``.npy`` file next to the document's xml.
+
+    Each row contains a point's ID and its ``x`` and ``y`` coordinates (as
+    64-bit floats). The points of each data set are stored in consecutive
+    rows, so that a data set only needs to store an offset and a count.
+
+    Binary points are written when a :class:`GdeDocument` is saved with
+    ``binary=True``. To read them, use :meth:`load()`.
+    """
+    # Data type of the stored array
+    dtype = np.dtype([('id', '<i8'), ('x', '<f8'), ('y', '<f8')])
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._arrays = []
+        self._n = 0
+
+    def add(self, points):
+        """
+        Adds the points from a :class:`PointArray`, and returns the row
+        offset at which they will be stored.
+        """
+        offset = self._n
+        self._arrays.append(points)
+        self._n += len(points)
+        return offset
+
+    @staticmethod
+    def load(path):
+        """
+        Opens the binary points file at ``path`` as a read-only memory map,
+        and returns the array of points in it.
+
+        Raises a ``ValueError`` if the file does not contain a points array.
+        """
+        a = np.load(path, mmap_mode='r', allow_pickle=False)
+        if a.dtype != BinaryPoints.dtype or a.ndim != 1:
+            raise ValueError('No point data found in ' + str(path) + '.')
+        return a
+
+    def name(self):
+        """
+        Returns the file name (without a directory) of the binary points file.
+        """
+        return os.path.basename(self._filename)
+
+    def write(self, f):
+        """
+        Writes all added points to the binary file ``f``.
+        """
+        a = np.empty(self._n, dtype=self.dtype)
+        i = 0
+        for points in self._arrays:
+            j = i + len(points)
+            a['id'][i:j] = points.ids()
+            a['x'][i:j] = points.x()
+            a['y'][i:j] = points.y()
+            i = j
+        np.save(f, a, allow_pickle=False)
+
+
+# Header written at the start of every xml file
+XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+# Data point elements as written by GdeDocument.write(), used to read them
+# without an xml parser. Only IDs > 0 and values without entities are matched.
+_XML_POINT = re.compile(
+    b'<' + T_DATA_POINT.encode() + rb' name="point_([1-9][0-9]*)">\s*'
+    + b'<' + T_VARIABLE.encode() + b' vtype="' + V_NORM.encode()
+    + rb'" name="x" value="([^"<&]+)"/>\s*'
+    + b'<' + T_VARIABLE.encode() + b' vtype="' + V_NORM.encode()
+    + rb'" name="y" value="([^"<&]+)"/>\s*'
+    + b'</' + T_DATA_POINT.encode() + b'>')
+
+# Characters to escape in attribute values, in addition to &, < and >
+_XML_ESCAPES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+
+
+@contextlib.contextmanager
+def replace_file(filename, binary=False):
+    """
+    Context manager that opens a temporary file for writing, and uses it to
+    replace the file at ``filename`` when the context is closed.
+
+    The temporary file is created in the same directory, and given the
+    permissions of the file it replaces. If an exception occurs, the
+    temporary file is deleted and ``filename`` is left unchanged.
+
+    Files are opened in UTF-8 text mode, or in binary mode if
+    ``binary=True``.
+    """
+    filename = os.path.abspath(filename)
+    fd, temp = tempfile.mkstemp(
+        prefix='.' + os.path.basename(filename) + '.',
+        dir=os.path.dirname(filename))
+    try:
+        if binary:
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', encoding='utf-8', newline='\n')
+        with f:
+            yield f
+        # Give the new file the same permissions as the old one, or the
+        # default permissions for a new file (mkstemp uses 0600)
+        try:
+            mode = os.stat(filename).st_mode & 0o7777
+        except OSError:
+            mode = os.umask(0)
+            os.umask(mode)
+            mode = 0o666 & ~mode
+        os.chmod(temp, mode)
+        os.replace(temp, filename)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+
+def xml_attributes(**attrib):
+    """
+    Returns a string with the given attributes formatted for an xml tag, e.g.
+    `` name="x" value="1.0"``.
+    """
+    return ''.join(
+        ' ' + k + '="' + escape(str(v), _XML_ESCAPES) + '"'
+        for k, v in attrib.items())
+
+
+def point_id(name):
+    """
+    Returns the point ID encoded in a data point name of the form
+    ``point_<id>``, or ``None`` if the name does not have that form.
+    """
+    if name.startswith('point_'):
+        try:
+            pid = int(name[6:])
+        except ValueError:
+            return None
+        if pid > 0:
+            return pid
+    return None
+
+
+class DataSetNode(DocumentNode):
+    """
+    A :class:`DocumentNode` for a data set, that stores its data points in a
+    :class:`PointArray`.
+
+    Data points are presented as child nodes, but a :class:`DataPointNode` for
+    a point is only created when it is needed (e.g. when the point is shown in
+    a tree view, or edited). Nodes are cached for as long as they are in use
+    (referenced elsewhere, or selected), so that every point has at most one
+    node at a time. Code that only needs the coordinates should use
+    :meth:`get_point_array()`.
+
+    Data points are named ``point_<id>`` where ``id`` is the point's ID in the
+    point array.
+    """
+
+    def __init__(self, parent, ntype, name):
+        super(DataSetNode, self).__init__(parent, ntype, name)
+        # Point coordinates
+        self._points = PointArray()
+        # Data point nodes in use, indexed by point ID
+        self._point_nodes = weakref.WeakValueDictionary()
+        # Selected data point nodes, kept alive until deselected
+        self._selected_nodes = {}
+
+    def child(self, k):
+        """
+        Returns the ``k-th`` data point node.
+        """
+        return self._point_node(int(self._points.ids()[k]))
+
+    def clear_selection(self):
+        """
+        Clears the selection (if any) of this node and any children nodes.
+        """
+        self.deselect()
+        for kid in list(self._point_nodes.values()):
+            kid.clear_selection()
+
+    def get(self, *names):
+        """
+        Returns the child node with the given name.
+        """
+        if len(names) == 0:
+            return self
+        pid = point_id(names[0])
+        if pid is None or pid not in self._points:
+            raise KeyError(names[0])
+        return self._point_node(pid).get(*names[1:])
+
+    def get_point_array(self):
+        """
+        Returns the :class:`PointArray` containing this data set's points.
+        """
+        return self._points
+
+    def get_xml(self):
+        """
+        Returns an ElementTree xml version of this node.
+        """
+        e = et.Element(self._ntype)
+        e.attrib['name'] = self._name
+        for d in self._data.values():
+            e.append(d.get_xml())
+        p = self._points
+        for pid, x, y in zip(p.ids().tolist(), p.x().tolist(), p.y().tolist()):
+            point = et.SubElement(e, T_DATA_POINT)
+            point.attrib['name'] = 'point_' + str(pid)
+            et.SubElement(point, T_VARIABLE, collections.OrderedDict(
+                (('vtype', V_NORM), ('name', 'x'), ('value', str(x)))))
+            et.SubElement(point, T_VARIABLE, collections.OrderedDict(
+                (('vtype', V_NORM), ('name', 'y'), ('value', str(y)))))
+        return e
+
+    def _write_xml_children(self, f, indent, level, points):
+        """
+        Writes this data set's points to the text stream ``f``, straight from
+        the point array, or adds them to ``points`` if given.
+        """
+        if points is not None:
+            return
+        pre, end = ('', '') if indent is None else (indent, '\n')
+        p1, p2 = pre * level, pre * (level + 1)
+        point = (
+            p1 + '<' + T_DATA_POINT + ' name="point_{}">' + end
+            + p2 + '<' + T_VARIABLE + ' vtype="' + V_NORM
+            + '" name="x" value="{!r}"/>' + end
+            + p2 + '<' + T_VARIABLE + ' vtype="' + V_NORM
+            + '" name="y" value="{!r}"/>' + end
+            + p1 + '</' + T_DATA_POINT + '>' + end)
+        # Convert to lists in chunks, to limit memory use for large sets
+        p = self._points
+        ids, xs, ys = p.ids(), p.x(), p.y()
+        for i in range(0, len(p), 4096):
+            j = i + 4096
+            for pid, x, y in zip(
+                    ids[i:j].tolist(), xs[i:j].tolist(), ys[i:j].tolist()):
+                f.write(point.format(pid, x, y))
+
+    def _xml_start_tag(self, points):
+        """
+        Returns the xml start tag for this data set. If ``points`` is given,
+        the data set's points are added to it, and their position in it is
+        stored in the tag.
+        """
+        if points is None:
+            return super(DataSetNode, self)._xml_start_tag(points)
+        return '<' + self._ntype + xml_attributes(
+            name=self._name, offset=points.add(self._points),
+            count=len(self._points)) + '>'
+
+    def nbytes(self):
+        """
+        Returns an estimate of the memory (in bytes) used by this data set,
+        its variables and its points.
+        """
+        return (super(DataSetNode, self).nbytes() + self._points.nbytes()
+                + NODE_NBYTES * len(self._point_nodes))
+
+    def release(self):
+        """
+        Disconnects all listeners from this data set, its variables and any
+        cached point nodes.
+        """
+        super(DataSetNode, self).release()
+        for kid in list(self._point_nodes.values()):
+            kid.release()
+
+    def __iter__(self):
+        """
+        Returns an iterator over this data set's point nodes.
+        """
+        for pid in self._points.ids().tolist():
+            yield self._point_node(pid)
+
+    def __len__(self):
+        """
+        Returns the number of data points in this set.
+        """
+        return len(self._points)
+
+    def _point_node(self, pid):
+        """
+        Returns the (possibly newly created) node for the point with the given
+        ID.
+        """
+        node = self._point_nodes.get(pid)
+        if node is None:
+            node = DataPointNode(self, pid)
+            node._attach(self._points)
+            self._point_nodes[pid] = node
+        return node
+
+    def _set_document(self, document):
+        """
+        Sets the document for this node and all its descendants.
+        """
+        super(DataSetNode, self)._set_document(document)
+        for kid in list(self._point_nodes.values()):
+            kid._set_document(document)
+
+    def silent_add_child(self, ntype, name, variables=None):
+        """
+        Creates and appends a data point without using actions or sending out
+        signals.
+
+        The point's coordinates should be set in ``variables``, as a list of
+        tuples ``(type, name, value)``.
+
+        Returns the new node.
+        """
+        if ntype != T_DATA_POINT:
+            raise AttributeError('Data sets can only contain data points.')
+        pid = point_id(str(name))
+        if pid is None:
+            pid = self._points._next_id
+        node = DataPointNode(self, pid)
+        if variables is not None:
+            for t, n, v in variables:
+                node.get_variable(n).silent_set_value(v)
+        return self.silent_add_existing_child(node)
+
+    def silent_add_existing_child(self, child, index=None):
+        """
+        Appends (or, if ``index`` is given, inserts) a data point node without
+        using actions or sending out signals.
+
+        Returns the added node.
+        """
+        if not isinstance(child, DataPointNode):
+            raise AttributeError('Data sets can only contain data points.')
+        pid = child._pid
+        if pid in self._points:
+            raise AttributeError(
+                'Duplicate child node: "' + child.get_name() + '".')
+        # Notify views
+        d = self.get_document()
+        n = len(self._points)
+        if index is not None:
+            n = max(0, min(n, index))
+        d.rows_inserting.emit(self, n, n)
+        # Add point
+        self._points.insert(n, child.get_value('x'), child.get_value('y'), pid)
+        child._attach(self._points)
+        child._set_document(self._document)
+        self._point_nodes[pid] = child
+        d.rows_inserted.emit(self, n, n)
+        return child
+
+    def silent_add_points(self, x, y, ids=None, copy=True):
+        """
+        Appends a list of points without using actions or sending out signals.
+
+        Point IDs can be given as ``ids``, IDs that are ``None`` or already in
+        use are replaced by new ones. If ``copy=False`` the arrays may be used
+        as storage without copying them (see :meth:`PointArray.extend()`).
+
+        Returns an array containing the new points' IDs.
+        """
+        n = len(x)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        d = self.get_document()
+        k = len(self._points)
+        d.rows_inserting.emit(self, k, k + n - 1)
+        ids = self._points.extend(x, y, ids, copy)
+        d.rows_inserted.emit(self, k, k + n - 1)
+        return ids
+
+    def silent_remove_child(self, node):
+        """
+        Removes a data point without using actions or sending out signals.
+
+        Returns the row the point was in.
+        """
+        if node.get_parent_node() != self:
+            raise AttributeError('Node is not a child of this node.')
+        node.deselect()
+        n = node.index()
+        d = self.get_document()
+        d.rows_removing.emit(self, n, n)
+        node._detach()
+        self._points.remove(node._pid)
+        self._point_nodes.pop(node._pid, None)
+        node._set_document(None)
+        d.rows_removed.emit(self, n, n)
+        return n
+
+
+class DataPointNode(DocumentNode):
+    """
+    A :class:`DocumentNode` representing a single point in a
+    :class:`DataSetNode`.
+
+    The point's coordinates are stored in the data set's :class:`PointArray`,
+    and can be accessed through the variables ``x`` and ``y``. When a point is
+    removed from its data set, its coordinates are stored in the node itself
+    so that it can be re-added.
+    """
+
+    def __init__(self, parent, pid):
+        super(DataPointNode, self).__init__(
+            parent, T_DATA_POINT, 'point_' + str(pid))
+        # Point ID
+        self._pid = pid
+        # Point array this point is stored in, or None if detached
+        self._points = None
+        # Coordinates, used only while detached
+        self._coords = [0, 0]
+        # Coordinate variables
+        self._data['x'] = PointVariable(self, 'x')
+        self._data['y'] = PointVariable(self, 'y')
+
+    def _attach(self, points):
+        """
+        Stores this point's coordinates in the given :class:`PointArray`.
+
+        The point must already have been added to the array.
+        """
+        self._points = points
+
+    def _detach(self):
+        """
+        Copies this point's coordinates from its :class:`PointArray`, so that
+        they are retained when the point is removed from it.
+        """
+        if self._points is not None:
+            self._coords = list(self._points.get(self._pid))
+            self._points = None
+
+    def deselect(self):
+        """
+        Deselects this point, and lets its node be discarded when unused.
+        """
+        super(DataPointNode, self).deselect()
+        self._parent._selected_nodes.pop(self._pid, None)
+
+    def _get_coordinate(self, k):
+        """
+        Returns this point's x (``k=0``) or y (``k=1``) coordinate.
+        """
+        if self._points is None:
+            return self._coords[k]
+        return self._points.get(self._pid)[k]
+
+    def get_point_id(self):
+        """
+        Returns this point's ID in its data set's :class:`PointArray`.
+        """
+        return self._pid
+
+    def index(self):
+        """
+        Returns the index of this point in its data set.
+        """
+        return self._parent._points.row(self._pid)
+
+    def select(self):
+        """
+        Selects this point, keeping its node alive while it is selected.
+        """
+        self._parent._selected_nodes[self._pid] = self
+        super(DataPointNode, self).select()
+
+    def _set_coordinate(self, k, value):
+        """
+        Changes this point's x (``k=0``) or y (``k=1``) coordinate.
+        """
+        if self._points is None:
+            self._coords[k] = value
+        elif k == 0:
+            self._points.set(self._pid, x=value)
+        else:
+            self._points.set(self._pid, y=value)
+
+    def silent_add_existing_variable(self, var):
+        """
+        Data points only have the variables ``x`` and ``y``.
+        """
+        raise AttributeError('Data points can only have variables x and y.')
+
+
+class PointVariable(DocumentVariable):
+    """
+    A coordinate of a :class:`DataPointNode`.
+    """
+
+    def __init__(self, node, name):
+        super(PointVariable, self).__init__(node, V_NORM, name)
+        self._k = 0 if name == 'x' else 1
+
+    def get_value(self):
+        """
+        Returns this coordinate's value.
+        """
+        return self._node._get_coordinate(self._k)
+
+    def silent_set_value(self, value):
+        """
+        Changes this coordinate, without using actions or sending signals.
+        """
+        if isinstance(value, basestring):
+            value = self._value_from_string(value)
+        self._node._set_coordinate(self._k, value)
+
+
+class GdeDocument(Document):
+    """
+    Represents a document used by the GDE.
+
+    If a ``filename`` is given the document is read from that file, otherwise
+    a new document is created. An ``IOError`` is raised if the file uses a
+    binary points file that can't be read.
+    """
+    # Signals
+    # Called when the axes change, changing the coordinate conversion
+    # Attributes: (document)
+    calibration_changed = Signal(object)
+
+    def __init__(self, filename=None):
+        # Major version number
+        self._version = 0
+
+        # True if points are stored in a binary file, next to the xml
+        self._binary = False
+
+        # Path to the binary points file that data sets are mapped from
+        self._mapped = None
+
+        # Axis reference points
+        self._refs = None
+
+        # X-axis and Y-axis
+        self._xaxis = None
+        self._yaxis = None
+
+        # Data sets
+        self._data_node = None
+        self._active_data_set = None
+
+        # Coordinate conversion
+        self._calibration = Calibration()
+
+        # Spline fits, shared by the scene and data extraction
+        self._splines = SplineCache()
+
+        # Call parent constructor
+        super(GdeDocument, self).__init__(filename)
+
+        # Start listening to node selection
+        self.node_selected.connect(self.handle_node_selected)
+
+    def add_data_fit(self):
+        """
+        Adds a data fit to this document.
+        """
+
+    def add_data_set(self):
+        """
+        Adds a data set to this document.
+        """
+        n = len(self._data_node)
+        n = 'Data set ' + str(n + 1)
+        a = (
+            (V_STR, 'label', n),
+            (V_BOOL, 'spline', False),
+            (V_INT, 'segments', 0),
+            (V_INT, 'degree', 3),
+            (V_INT, 'penalty', 3),
+            (V_FLOAT, 'smoothing', 0.1),
+            (V_INT, 'samples', 100),
+        )
+        return self._data_node.add_child(T_DATA_SET, n, a)
+
+    def can_drag(self, node):
+        """
+        Returns True if the given node is draggable.
+        """
+        return node.get_ntype() == T_DATA_POINT
+
+    def create_node(self, parent, ntype, name):
+        """
+        Creates (but does not add) a new node of the given ``ntype``.
+        """
+        if ntype == T_DATA_SET:
+            return DataSetNode(parent, ntype, name)
+        return super(GdeDocument, self).create_node(parent, ntype, name)
+
+    def extract_data(self, path):
+        """
+        Extracts the data from every data set in the scene and writes it to a
+        series of csv files.
+        """
+        # Define function to export a single data set
+        fmt = '%- 1.5g'
+        row = fmt + ',' + fmt + '\n'
+        x = self._xaxis.get_value('label')
+        y = self._yaxis.get_value('label')
+        header = '"' + x + '","' + y + '"\n'
+
+        def chunks(dset):
+            # Get spline, if requested
+            if dset.get_value('spline'):
+                fit = self.fit_spline(dset)
+                if fit is not None:
+                    yield fit
+                    return
+            # Or convert data points to real coordinates in chunks, so that
+            # large (memory mapped) data sets are streamed to the file
+            points = dset.get_point_array()
+            x, y = points.x(), points.y()
+            for i in range(0, len(x), 8192):
+                j = i + 8192
+                yield self._calibration.norm2real(x[i:j], y[i:j])
+
+        def write(path, dset):
+            # Write data
+            with open(path, 'w') as f:
+                f.write(header)
+                for x1, y1 in chunks(dset):
+                    f.write(''.join(
+                        [row % p for p in zip(x1.tolist(), y1.tolist())]))
+
+        # Export all data sets
+        n = len(self._data_node)
+        if n == 0:
+            raise Exception('No data sets to export')
+        elif n == 1:
+            # Write single data set
+            write(path, self._data_node.child(0))
+        else:
+            # Write multiple data sets to multiple files
+            base, ext = os.path.splitext(path)
+            base += '-'
+            for dset in self._data_node:
+                path = base + dset.get_value('label') + ext
+                write(path, dset)
+
+    def fit_spline(self, dset, fitter=None):
+        """
+        Fits a p-spline to the points in the data set ``dset``, using the
+        spline settings stored in the data set, and returns a tuple ``(x, y)``
+        with the spline evaluated at ``samples`` evenly spaced points.
+
+        The fit is made in real coordinates, so that the spline shown on
+        screen is the same as the one extracted. Fits are cached, and the
+        returned arrays should not be modified.
+
+        If a :class:`SplineFitter` is given and no cached fit is available,
+        the fit is submitted to the fitter and ``None`` is returned. The
+        fitter's ``fit_ready`` signal is emitted when the fit is done.
+
+        Returns ``None`` if the data set has fewer than two points.
+        """
+        # Get data points in real coordinates
+        points = dset.get_point_array()
+        if len(points) < 2:
+            if fitter is not None:
+                fitter.cancel()
+            return None
+        x1, y1 = self._calibration.norm2real(points.x(), points.y())
+        # Get spline parameters
+        smo, pen, deg, seg, sam = dset.get_values(
+            'smoothing', 'penalty', 'degree', 'segments', 'samples')
+        if seg < 1:
+            # Segments = 0 means add a segment per data point
+            seg = len(x1)
+        # Return cached fit, if available
+        key = SplineCache.key(x1, y1, smo, pen, deg, seg, sam)
+        fit = self._splines.get(key)
+        if fit is not None:
+            if fitter is not None:
+                fitter.cancel()
+            return fit
+        # Points to evaluate the spline at
+        x2 = np.linspace(np.min(x1), np.max(x1), sam)
+        # Fit spline in the background
+        if fitter is not None:
+            fitter.submit(self._splines, key, x1, y1, x2, smo, seg, deg, pen)
+            return None
+        # Fit spline
+        y2 = pspline(x1, y1, x2, smo, seg, deg, pen)
+        return self._splines.put(key, x2, y2)
+
+    def get_active_data_set(self):
+        """
+        Returns the currently active dataset. If the document doesn't contain
+        any datasets a new set is created.
+        """
+        if self._active_data_set is None:
+            # Create data set
+            data = self.get('Data')
+            try:
+                self._active_data_set = data.child(-1)
+            except IndexError:
+                self.add_data_set()
+        return self._active_data_set
+
+    def get_calibration(self):
+        """
+        Returns the :class:`Calibration` that converts normalised coordinates
+        to real ones, based on the current axes.
+        """
+        return self._calibration
+
+    def get_xml(self):
+        """
+        Returns an ElementTree xml version of this document.
+        """
+        e = super(GdeDocument, self).get_xml()
+        e.attrib['major'] = str(self._version)
+        return e
+
+    def _xml_start_tag(self, points):
+        """
+        Returns the xml start tag for this document, including its version
+        and the name of its binary points file (if any).
+        """
+        if points is None:
+            attrib = xml_attributes(name=self._name, major=self._version)
+        else:
+            attrib = xml_attributes(
+                name=self._name, major=self._version, points=points.name())
+        return '<' + self._ntype + attrib + '>'
+
+    def handle_axis_changed(self):
+        """
+        Updates the coordinate conversion scheme when the axes are changed.
+        """
+        if self._refs is None:
+            return
+        # Find point where axes cross (may or may not be the origin).
+        # Get reference nodes
+        node_rx0, node_rx1, node_ry0, node_ry1 = self._refs
+
+        # Get vectors defining axes
+        rx = Line2D(
+            Point2D(*node_rx0.get_values('x', 'y')),
+            Point2D(*node_rx1.get_values('x', 'y')))
+        ry = Line2D(
+            Point2D(*node_ry0.get_values('x', 'y')),
+            Point2D(*node_ry1.get_values('x', 'y')))
+
+        # Get values of the head and tail of the reference vectors
+        vx0 = node_rx0.get_value('value')
+        vx1 = node_rx1.get_value('value')
+        vy0 = node_ry0.get_value('value')
+        vy1 = node_ry1.get_value('value')
+
+        # Get unit vectors on the displaced (axis)
+        # For rx, the tail will be on the line x=0 but the y value still
+        # depends on where the axis was displayed in the original graph.
+        dx = vx1 - vx0
+        if dx == 0:
+            dx = 1e-12
+        rx = Line2D(rx.point(-vx0 / dx), rx.point((1 - vx0) / dx))
+
+        dy = vy1 - vy0
+        if dy == 0:
+            dy = 1e-12
+        ry = Line2D(ry.point(-vy0 / dy), ry.point((1 - vy0) / dy))
+
+        # Now we swap rx and ry around so rx' tail is where ry's tail was and
+        # vice versa.
+        sx = Line2D(rx)
+        rx.move_to(ry.tail)
+        ry.move_to(sx.tail)
+
+        # Now rx is a unit vector on the x-axis pointing in the x direction
+        # and ry is a unit vector on the y-axis pointing in the y direction
+        # The origin is found by taking the intersection of these points
+        origin = rx.intersect(ry)
+
+        # Get matrix of unit vectors: this transforms real coordinates to
+        # normalised ones (relative to the origin), its inverse is used to
+        # transform normalised coordinates to real ones.
+        rx.move_to(origin)
+        ry.move_to(origin)
+        rx = rx.head - rx.tail
+        ry = ry.head - ry.tail
+        self._calibration = Calibration(
+            ((rx.x, ry.x), (rx.y, ry.y)), origin, inverse=True)
+        self.calibration_changed.emit(self)
+
+    def handle_data_set_added(self, parent, dset):
+        """
+        Called when a data set is added to the data node.
+        """
+        self._active_data_set = dset
+
+    def handle_data_set_removed(self, parent, dset):
+        """
+        Called when a data set is removed from the data node.
+        """
+        if dset == self._active_data_set:
+            self._active_data_set = None
+
+    def handle_node_selected(self, node):
+        """
+        Called when a node is selected in this document.
+        """
+        ntype = node.get_ntype()
+        if ntype == T_DATA_SET:
+            self._active_data_set = node
+        elif ntype == T_DATA_POINT:
+            self._active_data_set = node.get_parent_node()
+
+    def is_binary(self):
+        """
+        Returns True if this document's data points are stored in a binary
+        file, next to the xml (see :meth:`write()`).
+        """
+        return self._binary
+
+    def norm2real(self, x, y):
+        """
+        Converts normalised coordinates to real coordinates, using the current
+        axes.
+
+        Both ``x`` and ``y`` can be scalars or NumPy arrays.
+        """
+        return self._calibration.norm2real(x, y)
+
+    def _parse(self, filename):
+        """
+        Parses the gde file at ``filename`` and returns a tuple ``(root,
+        points)``.
+
+        Here ``root`` is the root element of the file, but with all data point
+        elements emptied or removed, and ``points`` is a dict that maps each
+        data set element to a tuple ``(x, y, ids)`` with the coordinates (as
+        strings or floats) and IDs of its points.
+
+        Files with data points in the format written by :meth:`write()` are
+        read with :meth:`_parse_fast()`. Other files are read with
+        ``iterparse``, and each data point is processed and discarded as soon
+        as it has been read, so that only the document structure is kept in
+        memory.
+        """
+        try:
+            parsed = self._parse_fast(filename)
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            return parsed
+
+        points = {}
+        xs, ys, ids = [], [], []
+        parser = et.iterparse(filename, events=('end', ))
+        for event, e in parser:
+            tag = e.tag
+            if tag == T_DATA_POINT:
+                x = y = None
+                for v in e:
+                    if v.tag == T_VARIABLE:
+                        name = v.attrib['name']
+                        if name == 'x':
+                            x = v.attrib['value']
+                        elif name == 'y':
+                            y = v.attrib['value']
+                if x is not None and y is not None:
+                    xs.append(x or 0)
+                    ys.append(y or 0)
+                    ids.append(point_id(e.attrib['name']))
+                e.clear()
+            elif tag == T_DATA_SET:
+                # Data points are only found inside data sets, so all points
+                # read since the last data set was closed belong to this one.
+                points[e] = (xs, ys, ids)
+                xs, ys, ids = [], [], []
+            elif tag != T_VARIABLE:
+                xs, ys, ids = [], [], []
+        return parser.root, points
+
+    def _parse_fast(self, filename):
+        """
+        Parses the gde file at ``filename`` like :meth:`_parse()`, but finds
+        the data points with a regular expression instead of an xml parser,
+        and returns their coordinates and IDs as arrays.
+
+        Only the remaining document structure is parsed as xml. Returns
+        ``None`` if any data points are not in the format used by
+        :meth:`write()`.
+        """
+        with open(filename, 'rb') as f:
+            text = f.read()
+        start = b'<' + T_DATA_POINT.encode()
+        end = b'</' + T_DATA_POINT.encode() + b'>'
+        end_set = b'</' + T_DATA_SET.encode() + b'>'
+
+        # Cut out each block of data points (written after all other children
+        # of their data set), converting them in chunks to limit memory use
+        parts = []
+        blocks = []
+        pos = 0
+        while True:
+            i = text.find(start, pos)
+            if i < 0:
+                break
+            k = text.find(end_set, i)
+            if k < 0:
+                return None
+            # Check that the block contains only points with two variables
+            n = text.count(start, i, k)
+            if text.count(b'<', i, k) != 4 * n:
+                return None
+            chunks = []
+            j = i
+            while j < k:
+                e = text.find(end, j + 1048576, k)
+                e = k if e < 0 else e + len(end)
+                found = _XML_POINT.findall(text, j, e)
+                if found:
+                    ids, xs, ys = zip(*found)
+                    chunks.append((
+                        np.array([float(x) for x in xs]),
+                        np.array([float(y) for y in ys]),
+                        np.array([int(x) for x in ids], dtype=np.int64)))
+                j = e
+            if sum(len(c[0]) for c in chunks) != n:
+                return None
+            parts.append(text[pos:i])
+            arrays = [np.concatenate(a) for a in zip(*chunks)]
+            blocks.append((len(parts), arrays))
+            pos = k
+        parts.append(text[pos:])
+        del(text)
+
+        # Parse the remaining structure, and find the data set of each block
+        root = et.fromstring(b''.join(parts))
+        sets = list(root.iter(T_DATA_SET))
+        tag = b'<' + T_DATA_SET.encode() + b' '
+        if sum(part.count(tag) for part in parts) != len(sets):
+            return None
+        points = {}
+        index = counted = 0
+        for k, arrays in blocks:
+            while counted < k:
+                index += parts[counted].count(tag)
+                counted += 1
+            points[sets[index - 1]] = tuple(arrays)
+        return root, points
+
+    def _read_file(self, filename=None):
+        """
+        Reads a Gde document or creates a default one.
+
+        Nodes are added using the ``silent_`` methods, so that reading a file
+        doesn't create undo actions or send out signals for every node.
+        """
+        def find(parent, ntype, name):
+            """
+            Finds the first child node of the given type with the given name.
+            """
+            if parent is None:
+                return None
+            for kid in parent.iterfind(ntype):
+                if kid.attrib['name'] == name:
+                    return kid
+            return None
+        try:
+            # Parse file
+            self.filename = filename
+            doc = points = None
+            if filename is not None:
+                try:
+                    doc, points = self._parse(filename)
+                except et.ParseError:
+                    #TODO: Show a warning dialog!
+                    print('Warning: Unable to read file ' + str(filename))
+
+            # Add version
+            if doc is not None:
+                try:
+                    major_version = int(doc.attrib['major'])
+                except Exception:
+                    major_version = 0
+            else:
+                major_version = DOCUMENT_VERSION
+            self._version = major_version
+
+            # Open binary points file, if used
+            binary = None
+            if doc is not None and 'points' in doc.attrib:
+                path = os.path.join(
+                    os.path.dirname(filename), doc.attrib['points'])
+                try:
+                    binary = BinaryPoints.load(path)
+                except (IOError, ValueError) as e:
+                    # Don't open without points: saving would overwrite them
+                    raise IOError(
+                        'Unable to read points from ' + path + ': ' + str(e))
+                self._mapped = os.path.abspath(path)
+                self._binary = True
+
+            # Add image
+            image = self.silent_add_child(T_IMAGE, 'Image')
+            image.silent_add_variable('path', 'path')
+            if doc is not None:
+                x = find(doc, T_IMAGE, 'Image')
+                x = find(x, T_VARIABLE, 'path')
+                if x is not None:
+                    image.get_variable('path').silent_set_value(
+                        x.attrib['value'])
+
+            # Add axes
+            d = [[0.3, 0.8, 0], [0.8, 0.8, 5], [0.2, 0.7, 0], [0.2, 0.2, 5]]
+            xlabel = 'x'
+            ylabel = 'y'
+            if doc is not None:
+                x = find(doc, T_AXES, 'Axes')
+
+                def pt(axis, name, idx):
+                    x = find(axis, T_AXIS_REFERENCE_POINT, name)
+                    y = find(x, T_VARIABLE, 'x')
+                    if y is not None:
+                        d[idx][0] = y.attrib['value']
+                    y = find(x, T_VARIABLE, 'y')
+                    if y is not None:
+                        d[idx][1] = y.attrib['value']
+                    y = find(x, T_VARIABLE, 'value')
+                    if y is not None:
+                        d[idx][2] = y.attrib['value']
+
+                y = find(x, T_AXIS, 'x')
+                if y is not None:
+                    pt(y, 'ref1', 0)
+                    pt(y, 'ref2', 1)
+                    z = find(y, T_VARIABLE, 'label')
+                    if z is not None:
+                        xlabel = z.attrib['value']
+
+                y = find(x, T_AXIS, 'y')
+                if y is not None:
+                    pt(y, 'ref1', 2)
+                    pt(y, 'ref2', 3)
+                    z = find(y, T_VARIABLE, 'label')
+                    if z is not None:
+                        ylabel = z.attrib['value']
+
+            def add_reference_point(parent, name, x, y, v):
+                return parent.silent_add_child(T_AXIS_REFERENCE_POINT, name, (
+                    (V_NORM, 'x', x),
+                    (V_NORM, 'y', y),
+                    (V_FLOAT, 'value', float(v)),
+                ))
+
+            axes = self.silent_add_child(T_AXES, 'Axes')
+            xaxis = axes.silent_add_child(T_AXIS, 'x')
+            xaxis.silent_add_variable(V_STR, 'label', xlabel)
+            x1 = add_reference_point(xaxis, 'ref1', *d[0])
+            x2 = add_reference_point(xaxis, 'ref2', *d[1])
+            yaxis = axes.silent_add_child(T_AXIS, 'y')
+            yaxis.silent_add_variable(V_STR, 'label', ylabel)
+            y1 = add_reference_point(yaxis, 'ref1', *d[2])
+            y2 = add_reference_point(yaxis, 'ref2', *d[3])
+
+            # Store axes and reference points
+            self._xaxis = xaxis
+            self._yaxis = yaxis
+            self._refs = (x1, x2, y1, y2)
+
+            # Add axis-change listeners to reference points
+            x1.variable_changed.connect(self.handle_axis_changed)
+            x2.variable_changed.connect(self.handle_axis_changed)
+            y1.variable_changed.connect(self.handle_axis_changed)
+            y2.variable_changed.connect(self.handle_axis_changed)
+
+            # Create initial calibration
+            self.handle_axis_changed()
+
+            # Add data set node
+            self._data_node = self.silent_add_child(T_DATA_SETS, 'Data')
+
+            # Listen for new data sets
+            self._data_node.child_added.connect(self.handle_data_set_added)
+            self._data_node.child_removed.connect(self.handle_data_set_removed)
+
+            # Add data sets, data points
+            if doc is not None:
+                if self._version < 1:
+                    root = doc
+                else:
+                    root = find(doc, T_DATA_SETS, 'Data')
+                if root is not None:
+
+                    # Spline fitting options
+                    def var(root, name, default_value):
+                        v = find(root, T_VARIABLE, name)
+                        if v is None:
+                            return default_value
+                        return v.attrib['value']
+
+                    # Data sets
+                    for z in root.iterfind(T_DATA_SET):
+                        # Name and label
+                        if self._version < 1:
+                            name = label = 'Data set 1'
+                        else:
+                            name = z.attrib['name']
+                            label = name
+                            x = z.find(T_VARIABLE)
+                            if x is not None:
+                                label = str(x.attrib['value'])
+
+                        spline = var(z, 'spline', False)
+                        s_seg = var(z, 'segments', 0)
+                        s_deg = var(z, 'degree', 3)
+                        s_pen = var(z, 'penalty', 3)
+                        s_smo = var(z, 'smoothing', 0.1)
+                        s_sam = var(z, 'samples', 100)
+                        # Add data set
+                        dset = self._data_node.silent_add_child(
+                            T_DATA_SET, name, (
+                                (V_STR, 'label', label),
+                                (V_BOOL, 'spline', spline),
+                                (V_INT, 'segments', s_seg),
+                                (V_INT, 'degree', s_deg),
+                                (V_INT, 'penalty', s_pen),
+                                (V_FLOAT, 'smoothing', s_smo),
+                                (V_INT, 'samples', s_sam),
+                            ))
+                        self._active_data_set = dset
+                        # Add data points from the binary file, without
+                        # copying them from the memory map
+                        if binary is not None and 'offset' in z.attrib:
+                            i = int(z.attrib['offset'])
+                            a = binary[i:i + int(z.attrib['count'])]
+                            dset.silent_add_points(
+                                a['x'], a['y'], a['id'], copy=False)
+                            continue
+                        # Add data points from the xml
+                        xs, ys, ids = points.get(z, ((), (), ()))
+                        xs = np.clip(np.array(xs, dtype=float), 0, 1)
+                        ys = np.clip(np.array(ys, dtype=float), 0, 1)
+                        dset.silent_add_points(xs, ys, ids, copy=False)
+        finally:
+            # Clear undo/redo
+            self.clear_history()
+            self._changed = False
+            # Set version to latest and save as such :)
+            self._version = DOCUMENT_VERSION
+
+    def write(self, filename, compact=False, binary=None):
+        """
+        Writes this document to the given path.
+
+        If ``binary=True``, data points are not written as xml, but stored in
+        a binary file ``filename + '.npy'`` (see :class:`BinaryPoints`). This
+        makes large documents much faster to load and save. If ``binary`` is
+        ``None``, the layout of the file this document was read from is used.
+
+        See :meth:`Document.write()` for the other arguments.
+        """
+        if binary is None:
+            binary = self._binary
+        if not binary:
+            super(GdeDocument, self).write(filename, compact)
+        else:
+            # Write xml, collecting points, then write points. The points file
+            # is replaced first, so that the xml never refers to missing rows.
+            path = filename + '.npy'
+            points = BinaryPoints(path)
+            # Stop using the file's memory map before replacing it (which is
+            # not allowed on all platforms)
+            if os.path.abspath(path) == self._mapped:
+                for dset in self._data_node:
+                    dset.get_point_array().unshare()
+                self._mapped = None
+            with replace_file(filename) as f:
+                f.write(XML_HEADER)
+                self.write_xml(f, None if compact else '\t', points=points)
+                with replace_file(path, binary=True) as g:
+                    points.write(g)
+            self._changed = False
+        self._binary = binary
+
+    def real2norm(self, x, y):
+        """
+        Converts real coordinates to normalised coordinates, using the current
+        axes.
+
+        Both ``x`` and ``y`` can be scalars or NumPy arrays.
+        """
+        return self._calibration.real2norm(x, y)
+
+    def set_active_data_set(self, data_set):
+        """
+        Sets the currently active data set.
+        """
+        self._active_data_set = data_set
+
+
+#
+# Coordinate conversion
+#
+class Calibration(object):
+    """
+    Converts between normalised (image) coordinates and real (axis)
+    coordinates, using an affine transformation.
+
+    A point ``(x, y)`` in normalised coordinates is converted to real
+    coordinates ``(u, v)`` using::
+
+        (u, v) = M * (x - x0, y - y0)
+
+    where ``M`` is a 2x2 ``matrix`` and ``(x0, y0)`` is the ``origin`` (the
+    point where the axes cross) in normalised coordinates.
+
+    If ``inverse=True``, the given ``matrix`` is taken to be the inverse of
+    ``M``, i.e. the matrix that converts real coordinates to normalised
+    coordinates relative to the origin. Its columns are then the real unit
+    vectors along the x and y axis.
+
+    With the default arguments, the calibration leaves coordinates unchanged.
+    """
+
+    def __init__(self, matrix=None, origin=None, inverse=False):
+        if matrix is None:
+            matrix = ((1, 0), (0, 1))
+        if origin is None:
+            origin = (0, 0)
+        matrix = np.array(matrix, dtype=float)
+        if matrix.shape != (2, 2):
+            raise ValueError('Calibration matrix must be 2x2.')
+        if inverse:
+            self._inverse = matrix
+            self._matrix = np.linalg.inv(matrix)
+        else:
+            self._matrix = matrix
+            self._inverse = np.linalg.inv(matrix)
+        self._origin = float(origin[0]), float(origin[1])
+
+        # Matrix entries, as Python floats (fast for scalar arguments)
+        self._m = [float(x) for x in self._matrix.flatten()]
+        self._i = [float(x) for x in self._inverse.flatten()]
+
+    def matrix(self):
+        """
+        Returns the matrix ``M`` that converts normalised to real coordinates.
+        """
+        return np.array(self._matrix)
+
+    def norm2real(self, x, y):
+        """
+        Converts normalised coordinates ``(x, y)`` to real coordinates.
+
+        Both ``x`` and ``y`` can be scalars or NumPy arrays.
+        """
+        a, b, c, d = self._m
+        x = x - self._origin[0]
+        y = y - self._origin[1]
+        return a * x + b * y, c * x + d * y
+
+    def origin(self):
+        """
+        Returns the origin (where the axes cross) in normalised coordinates.
+        """
+        return self._origin
+
+    def real2norm(self, x, y):
+        """
+        Converts real coordinates ``(x, y)`` to normalised coordinates.
+
+        Both ``x`` and ``y`` can be scalars or NumPy arrays.
+        """
+        a, b, c, d = self._i
+        return a * x + b * y + self._origin[0], c * x + d * y + self._origin[1]
+
+
+#
+# Tiny 2D Vector and line classes
+#
+class Point2D(object):
+    """
+    Represents a point in R2.
+    """
+
+    def __init__(self, x, y=None):
+        if isinstance(x, Point2D):
+            self.x = x.x
+            self.y = x.y
+        elif y is not None:
+            self.x = float(x)
+            self.y = float(y)
+        else:
+            raise AttributeError(
+                'Point2D can only be created with Point2D(float, float) or'
+                ' Point2D(Point2D).')
+
+    def __repr__(self):
+        return 'Point2D(' + str(self.x) + ', ' + str(self.y) + ')'
+
+    def __str__(self):
+        return '(' + str(self.x) + ', ' + str(self.y) + ')'
+
+    def __add__(self, other):
+        return Point2D(self.x + other.x, self.y + other.y)
+
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __sub__(self, other):
+        return Point2D(self.x - other.x, self.y - other.y)
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __mul__(self, other):
+        other = float(other)
+        return Point2D(self.x * other, self.y * other)
+
+    def __rmul__(self, other):
+        other = float(other)
+        return Point2D(self.x * other, self.y * other)
+
+    def __imul__(self, other):
+        other = float(other)
+        self.x *= other
+        self.y *= other
+        return self
+
+    def __neg__(self):
+        return Point2D(-self.x, -self.y)
+
+    def __pos__(self):
+        return Point2D(self)
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, key):
+        return (self.x, self.y)[key]
+
+    def __setitem__(self, key, value):
+        p = [self.x, self.y]
+        p[key] = float(value)
+        self.x, self.y = p
+
+    def __eq__(self, other):
+        if isinstance(other, Point2D):
+            return self.x == other.x and self.y == other.y
+        return False
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __ne__(self, other):
+        if isinstance(other, Point2D):
+            return self.x != other.x or self.y != other.y
+        return True
+
+    def transform(self, a, b, c, d):
+        """
+        Transforms this point by multiplying with the matrix ((a, b),(c, d)).
+        """
+        x, y = self.x, self.y
+        self.x = a * x + b * y
+        self.y = c * x + d * y
+
+
+class Line2D(object):
+    """
+    Represents a line segment in 2D euclidean space. A line is defined using
+    two points, representing the 'head' and 'tail' of a vector connecting the
+    points.
+
+    A Line2D can be created in three ways:
+
+        1. Using ``x = Line2D(y)``, where ``y`` is another instance of Line2D.
+        2. Using ``x = Line2D(tail, head)``, where both ``tail`` and ``head``
+           are instances of ``Point2D``.
+        3. Using ``x = Line2D(tail_x, tail_y, head_x, head_y)`` where all
+           arguments are of types that can be converted to ``float``.
+
+    """
+
+    def __init__(self, a, b=None, c=None, d=None):
+        if isinstance(a, Line2D):
+            self.tail = Point2D(a.tail)
+            self.head = Point2D(a.head)
+        elif isinstance(a, Point2D) and isinstance(b, Point2D):
+            self.tail = Point2D(a)
+            self.head = Point2D(b)
+        elif b is not None and c is not None and d is not None:
+            self.tail = Point2D(a, b)
+            self.head = Point2D(c, d)
+        else:
+            raise AttributeError(
+                'Invalid signature. Expecting Line2D(Line2D) or '
+                'Line2D(Point2D, Point2D) or'
+                ' Line2D(float, float, float, float).')
+
+    def __repr__(self):
+        return 'Line2D(' + str(self.tail) + ', ' + str(self.head) + ')'
+
+    def __str__(self):
+        return '(' + str(self.tail) + ', ' + str(self.head) + ')'
+
+    def __add__(self, other):
+        return Line2D(Point2D(self.tail), Point2D(other.head))
+
+    def __iadd__(self, other):
+        self.head = Point2D(other.head)
+        return self
+
+    def __neg__(self):
+        return Line2D(self.head, self.tail)
+
+    def __pos__(self):
+        return Line2D(self)
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, key):
+        return (self.tail, self.head)[key]
+
+    def __setitem__(self, key, value):
+        p = [self.tail, self.head]
+        p[key] = Point2D(value)
+        self.tail, self.head = p
+
+    def __eq__(self, other):
+        if isinstance(other, Line2D):
+            return self.tail == other.tail and self.head == other.head
+        return False
+
+    def __ne__(self, other):
+        if isinstance(other, Line2D):
+            return self.tail != other.tail or self.head != other.head
+        return True
+
+    def intersect(self, other):
+        """
+        Returns the point where the given lines intersect.
+        """
+        if self == other:
+            raise AttributeError('Identical lines never intersect.')
+        x1, y1 = self.tail
+        x2, y2 = self.head
+        x3, y3 = other.tail
+        x4, y4 = other.head
+        d = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+        if abs(d) < 1e-14:
+            raise AttributeError(
+                'Lines are too close to parallel to detect intersection.')
+        d = 1 / d
+        c1 = x1 * y2 - y1 * x2
+        c2 = x3 * y4 - y3 * x4
+        return Point2D(
+            d * (c1 * (x3 - x4) - c2 * (x1 - x2)),
+            d * (c1 * (y3 - y4) - c2 * (y1 - y2)))
+
+    def move_to(self, point):
+        """
+        Moves this line definition vector so that its tail is at the given
+        point.
+        """
+        self.translate(point - self.tail)
+
+    def point(self, k):
+        """
+        Returns a point ``p`` on the line according to::
+
+            p = tail + k * (head - tail)
+
+        where ``k`` is a scalar value and ``p``, ``tail`` and ``head`` are
+        2D points.
+        """
+        return self.tail + k * (self.head - self.tail)
+
+    def translate(self, distance):
+        """
+        Moves this vector an x and y distance specified by the given Point2D.
+        """
+        self.tail += distance
+        self.head += distance
+
+
+#
+# P-spline calculation
+#
+def pspline(x, y, x2=None, s=1, nseg=10, deg=3, pdeg=2):
+    """
+    Computes a penalized B-spline (or P-spline) that fits the data given by
+    ``x``, ``y``.
+
+    If an argument ``x2`` is given, the spline is evaluated at each point in
+    ``x2`` and the resulting values are returned. If no value ``x2`` is given
+    the evaluations at ``x`` are returned.
+
+    The fitted spline will have ``nseg`` segments of degree ``deg``. Data
+    fitting is performed using a penalty of degree ``pdeg`` (e.g. a penalty on
+    the ``pdeg``-th derivative). Smoothing is introduced using a smoothing
+    factor ``s``.
+
+    Both ``x`` and ``y`` must be 1D arrays of the same length. The length of
+    ``x2`` is arbitrary.
+
+    P-splines are described in:
+
+        Flexible Smoothing with B-splines and Penalties
+        Paul H.C. Eilers and Brian D. Marx
+        Statistical Science
+        1996, Vol. 11, No. 2, 89-121
+
+    This method was adapted from a computer lab script by Paul Eilers, 2007
+    http://www.stat.lsu.edu/faculty/marx/
+
+    As every point has only ``deg + 1`` non-zero basis functions, the linear
+    system solved to find the spline coefficients is banded. It is assembled
+    and solved in banded form, so that the time needed scales linearly with
+    the number of points and segments.
+
+    If all points in ``x`` (and ``x2``) have the same value, the mean of ``y``
+    is returned at every point.
+    """
+    def blocal(x, xl, xr, nseg=10, deg=3):
+        """
+        Evaluates the ``deg + 1`` non-zero b-spline basis functions at every
+        point in ``x``, using the Cox-de Boor recursion for equally spaced
+        knots.
+
+        Arguments::
+
+        ``x``
+            Points at which to evaluate the basis functions.
+        ``xl``
+            Left-hand border x-coordinate.
+        ``xr``
+            Right-hand border x-coordinate.
+        ``nseg``
+            Number of segments
+        ``deg``
+            B-spline degree
+
+        Returns a tuple ``(j, N)`` where ``j`` is an array containing the
+        segment each point is in, and ``N`` is a matrix where ``N[i, c]`` is
+        the value of basis function ``j[i] + c`` at point ``x[i]``.
+        """
+        # Find segment, and position within segment (0 <= u <= 1)
+        dx = (xr - xl) / float(nseg)
+        t = (x - xl) / dx
+        j = np.clip(np.floor(t), 0, nseg - 1).astype(int)
+        u = t - j
+
+        # Raise the degree from 0 to deg. At degree d, column c holds the
+        # basis function whose support starts c - d segments to the right of
+        # the current segment's start.
+        N = np.ones((len(x), 1))
+        for d in range(1, deg + 1):
+            M = np.zeros((len(x), d + 1))
+            for c in range(d + 1):
+                i = c - d
+                if c > 0:
+                    M[:, c] += (u - i) / d * N[:, c - 1]
+                if c < d:
+                    M[:, c] += (i + d + 1 - u) / d * N[:, c]
+            N = M
+        return j, N
+
+    def solve(A, b):
+        """
+        Solves ``M a = b`` for a symmetric banded matrix ``M`` given in lower
+        banded form, so that ``A[k, r] = M[r, r - k]``.
+
+        If ``M`` is positive definite, it is split into blocks of ``w`` rows
+        (where ``w`` is the half-bandwidth), which makes it block tridiagonal,
+        and solved with block cyclic reduction: every other block is
+        eliminated until one is left. Each step works on all blocks at once,
+        so that the time is spent in NumPy, which releases the GIL, instead of
+        in Python loops.
+
+        If ``M`` is not positive definite, a dense solver is used. If ``M`` is
+        singular (e.g. when there are more basis functions than points and no
+        smoothing) a least-squares solution is returned.
+        """
+        w = A.shape[0] - 1
+        n = A.shape[1]
+        m = max(w, 1)
+
+        # Create diagonal blocks D[i] and sub-diagonal blocks E[i] (coupling
+        # block i + 1 to block i), padding M with an identity matrix
+        nb = -(-n // m)
+        P = np.zeros((w + 1, nb * m))
+        P[:, :n] = A
+        P[0, n:] = 1
+        r, c = np.indices((m, m))
+        i = np.arange(nb)[:, None, None] * m
+        D = P[np.abs(r - c), i + np.maximum(r, c)]
+        k = m + r - c
+        E = P[np.minimum(k, w), i[1:] + r] * (k <= w)
+        z = np.zeros(nb * m)
+        z[:n] = b
+        z = z.reshape(nb, m, 1)
+
+        try:
+            # Eliminate the odd blocks, writing them as x = g - F x_l - G x_r
+            # and updating the even blocks, until a single block is left
+            levels = []
+            while len(D) > 1:
+                no = len(D) // 2
+                E = np.concatenate((E, np.zeros((len(D) - len(E), m, m))))
+                El, Er = E[0:2 * no:2], E[1::2]
+                Elt = El.transpose(0, 2, 1)
+                Do = D[1::2]
+                np.linalg.cholesky(Do)
+                S = np.linalg.solve(Do, np.concatenate(
+                    (El, Er.transpose(0, 2, 1), z[1::2]), axis=2))
+                F, G, g = S[:, :, :m], S[:, :, m:2 * m], S[:, :, 2 * m:]
+                D = D[0::2]
+                D[1:] -= (Er @ G)[:len(D) - 1]
+                D[:no] -= Elt @ F
+                z = z[0::2]
+                z[1:] -= (Er @ g)[:len(D) - 1]
+                z[:no] -= Elt @ g
+                E = -(Er @ F)[:len(D) - 1]
+                levels.append((F, G, g))
+            np.linalg.cholesky(D)
+        except np.linalg.LinAlgError:
+            M = np.diag(A[0])
+            for k in range(1, w + 1):
+                M += np.diag(A[k, k:], -k) + np.diag(A[k, k:], k)
+            try:
+                return np.linalg.solve(M, b)
+            except np.linalg.LinAlgError:
+                return np.linalg.lstsq(M, b, rcond=None)[0]
+
+        # Solve the last block, then substitute back
+        x = np.linalg.solve(D, z)
+        for F, G, g in reversed(levels):
+            no = len(F)
+            right = np.concatenate((x[1:], np.zeros((no + 1 - len(x), m, 1))))
+            y = np.empty((len(x) + no, m, 1))
+            y[0::2] = x
+            y[1::2] = g - F @ x[:no] - G @ right[:no]
+            x = y
+        return x.reshape(-1)[:n]
+
+    # Ensure x and y are numpy arrays
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Get left bound, right bound
+    if x2 is None:
+        # Use left and right boundaries of x
+        xl = np.min(x)
+        xr = np.max(x)
+    else:
+        # Use left and right boundaries of x2
+        x2 = np.asarray(x2, dtype=float)
+        xl = min(np.min(x), np.min(x2))
+        xr = max(np.max(x), np.max(x2))
+
+    # All points at the same x: the best fit is a constant
+    if not xr > xl:
+        return np.full(len(x if x2 is None else x2), np.mean(y))
+
+    # Number of basis functions, half-bandwidth of linear system
+    nb = nseg + deg
+    w = max(deg, pdeg)
+
+    # Evaluate B-splines, and compute B'B and B'y where B is the basis matrix.
+    # B'B is stored in lower banded form, so that A[k, r] = (B'B)[r, r - k]
+    j, N = blocal(x, xl, xr, nseg, deg)
+    A = np.zeros((w + 1, nb))
+    for k in range(deg + 1):
+        for c in range(k, deg + 1):
+            A[k] += np.bincount(j + c, N[:, c] * N[:, c - k], minlength=nb)
+    By = np.zeros(nb)
+    for c in range(deg + 1):
+        By += np.bincount(j + c, N[:, c] * y, minlength=nb)
+
+    # Add penalty s * D'D, where D is the matrix of pdeg-th differences. Row q
+    # of D contains the coefficients d in columns q to q + pdeg.
+    d = np.diff(np.eye(pdeg + 1), pdeg, axis=0)[0]
+    nq = nb - pdeg
+    if nq > 0:
+        for k in range(pdeg + 1):
+            for m in range(k, pdeg + 1):
+                A[k, m:m + nq] += s * d[m] * d[m - k]
+
+    # Compute penalized weighing of B-splines
+    a = solve(A, By)
+
+    # Evaluate spline and return
+    if x2 is not None:
+        # Evaluate on the given data points
+        j, N = blocal(x2, xl, xr, nseg, deg)
+    return sum(N[:, c] * a[j + c] for c in range(deg + 1))
+
+
+class SplineCache(object):
+    """
+    Bounded cache of spline fits, that discards the least recently used fit
+    when more than ``size`` fits are stored.
+
+    Fits are stored under a key created with :meth:`key()`, from the data
+    points and the spline settings. Stored arrays are made read-only, as they
+    are shared by every caller that requests the same fit.
+    """
+
+    def __init__(self, size=32):
+        self._size = int(size)
+        self._fits = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._fits
+
+    def clear(self):
+        """
+        Removes all stored fits.
+        """
+        self._fits.clear()
+
+    def get(self, key):
+        """
+        Returns the fit stored under ``key``, or ``None`` if no such fit is
+        available.
+        """
+        try:
+            fit = self._fits[key]
+        except KeyError:
+            return None
+        self._fits.move_to_end(key)
+        return fit
+
+    @staticmethod
+    def key(x, y, *settings):
+        """
+        Creates a key for the fit to points ``(x, y)`` with the given spline
+        settings.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.ascontiguousarray(x, dtype=float).data)
+        h.update(np.ascontiguousarray(y, dtype=float).data)
+        return (len(x), h.digest()) + tuple(settings)
+
+    def __len__(self):
+        return len(self._fits)
+
+    def put(self, key, x, y):
+        """
+        Stores the fit ``(x, y)`` under ``key``, and returns it as a tuple of
+        read-only arrays.
+        """
+        x = np.array(x, dtype=float)
+        y = np.array(y, dtype=float)
+        x.flags.writeable = False
+        y.flags.writeable = False
+        self._fits[key] = fit = (x, y)
+        self._fits.move_to_end(key)
+        while len(self._fits) > self._size:
+            self._fits.popitem(last=False)
+        return fit
+
+
+class DocumentAction(object):
+    """
+    Represents an action that can be performed on a document.
+    """
+    def __init__(self):
+        self._performed = False
+
+    def perform(self):
+        """
+        Performs this action. Return type depends on action.
+        """
+        if self._performed:
+            raise Exception(
+                'Action failed: Action cannot be performed twice.')
+        result = self._perform()
+        self._performed = True
+        return result
+
+    def changed_nodes(self):
+        """
+        Returns a list of the nodes whose variables or children are changed
+        when this action is performed or undone.
+        """
+        raise NotImplementedError
+
+    def nbytes(self):
+        """
+        Returns an estimate of the memory (in bytes) used by this action,
+        including any nodes it keeps alive while they are not part of the
+        document.
+        """
+        return ACTION_NBYTES
+
+    def release(self):
+        """
+        Called when this action is removed from the undo history for good.
+
+        Subclasses holding nodes or variables that are no longer part of the
+        document should release them here.
+        """
+
+    def undo(self):
+        """
+        Undoes this action. Return type depends on action.
+        """
+        if not self._performed:
+            raise Exception('Undo failed: Action not yet performed.')
+        result = self._undo()
+        self._performed = False
+        return result
+
+    def _perform(self):
+        """
+        Used by subclasses to perform an action.
+        """
+        raise NotImplementedError
+
+    def _undo(self):
+        """
+        Used by subclasses to undo an action.
+        """
+        raise NotImplementedError
+
+
+class DA_Compound(DocumentAction):
+    """
+    Groups a list of ``actions`` that have already been performed into a
+    single action, which undoes them in reverse order and redoes them in the
+    original order (see :meth:`Document.transaction()`).
+    """
+
+    def __init__(self, actions):
+        super(DA_Compound, self).__init__()
+        self.actions = list(actions)
+        self._performed = True
+
+    def changed_nodes(self):
+        nodes = []
+        for action in self.actions:
+            nodes.extend(action.changed_nodes())
+        return nodes
+
+    def nbytes(self):
+        return sum(action.nbytes() for action in self.actions)
+
+    def _perform(self):
+        for action in self.actions:
+            action.perform()
+
+    def release(self):
+        for action in self.actions:
+            action.release()
+        self.actions = []
+
+    def _undo(self):
+        for action in reversed(self.actions):
+            action.undo()
+
+
+class DA_AddNode(DocumentAction):
+    """
+    Adds a child to a parent node.
+
+    Variables can be added using a list of tuples (type, name, value).
+    """
+
+    def __init__(self, parent, ntype, name, variables):
+        super(DA_AddNode, self).__init__()
+        self.parent = parent
+        self.name = name
+        self.ntype = ntype
+        self.child = None
+        self.variables = variables
+        self.index = None
+
+    def _perform(self):
+        p = self.parent
+        c = self.child
+        if c is not None:
+            p.silent_add_existing_child(c, self.index)
+        else:
+            c = self.child = p.silent_add_child(
+                self.ntype, self.name, self.variables)
+        # Signals
+        p.get_document().doc_node_added.emit(p, c)
+        p.child_added.emit(p, c)
+        # Return
+        return c
+
+    def changed_nodes(self):
+        return [self.parent, self.child]
+
+    def nbytes(self):
+        n = ACTION_NBYTES + VARIABLE_NBYTES * len(self.variables or ())
+        if self.child is not None and not self._performed:
+            n += self.child.nbytes()
+        return n
+
+    def release(self):
+        if self.child is not None and not self._performed:
+            self.child.release()
+        self.child = self.parent = None
+
+    def _undo(self):
+        p = self.parent
+        c = self.child
+        self.index = p.silent_remove_child(c)
+        # Signals
+        p.get_document().doc_node_removed.emit(p, c)
+        p.child_removed.emit(p, c)
+        c.node_removed.emit(c)
+
+
+class DA_RemoveNode(DocumentAction):
+    """
+    Deletes a child node.
+    """
+
+    def __init__(self, node):
+        super(DA_RemoveNode, self).__init__()
+        self.child = node
+        self.parent = node.get_parent_node()
+        self.index = None
+
+    def changed_nodes(self):
+        return [self.parent, self.child]
+
+    def nbytes(self):
+        n = ACTION_NBYTES
+        if self._performed:
+            n += self.child.nbytes()
+        return n
+
+    def _perform(self):
+        p = self.parent
+        c = self.child
+        self.index = p.silent_remove_child(c)
+        # Signals
+        p.get_document().doc_node_removed.emit(p, c)
+        p.child_removed.emit(p, c)
+        c.node_removed.emit(c)
+
+    def release(self):
+        if self._performed:
+            self.child.release()
+        self.child = self.parent = None
+
+    def _undo(self):
+        p = self.parent
+        c = self.child
+        p.silent_add_existing_child(c, self.index)
+        # Signals
+        p.get_document().doc_node_added.emit(p, c)
+        p.child_added.emit(p, c)
+
+
+class DA_AddVariable(DocumentAction):
+    """
+    Adds a DocumentVariable to a DocumentNode
+    """
+
+    def __init__(self, parent, vtype, name, value=None):
+        super(DA_AddVariable, self).__init__()
+        self.parent = parent
+        self.vtype = vtype
+        self.name = name
+        self.value = value
+        self.variable = None
+
+    def _perform(self):
+        if self.variable is not None:
+            self.parent.silent_add_existing_variable(self.variable)
+        else:
+            self.variable = self.parent.silent_add_variable(
+                self.vtype, self.name, self.value)
+        self.parent.variable_added.emit(self.parent, self.variable)
+        return self.variable
+
+    def changed_nodes(self):
+        return [self.parent]
+
+    def nbytes(self):
+        return ACTION_NBYTES + VARIABLE_NBYTES
+
+    def release(self):
+        if self.variable is not None and not self._performed:
+            Signal.disconnect_all(self.variable)
+        self.variable = self.parent = None
+
+    def _undo(self):
+        self.parent.silent_remove_variable(self.variable)
+        self.parent.variable_removed.emit(self.parent, self.variable)
+        self.variable.variable_removed.emit(self.variable)
+
+
+class DA_RemoveVariable(DocumentAction):
+    """
+    Removes a DocumentVariable form a DocumentNode
+    """
+
+    def __init__(self, parent, variable):
+        super(DA_RemoveVariable, self).__init__()
+        self.parent = parent
+        self.variable = variable
+
+    def changed_nodes(self):
+        return [self.parent]
+
+    def nbytes(self):
+        return ACTION_NBYTES + VARIABLE_NBYTES
+
+    def _perform(self):
+        self.parent.silent_remove_variable(self.variable)
+        self.parent.variable_removed.emit(self.parent, self.variable)
+        self.variable.variable_removed.emit(self.variable)
+
+    def release(self):
+        if self._performed:
+            Signal.disconnect_all(self.variable)
+        self.variable = self.parent = None
+
+    def _undo(self):
+        self.parent.silent_add_existing_variable(self.variable)
+        self.parent.variable_added.emit(self.parent, self.variable)
+
+
+class DA_ChangeVariable(DocumentAction):
+    """
+    Changes a value within a DocumentNode
+    """
+
+    def __init__(self, variable, value):
+        super(DA_ChangeVariable, self).__init__()
+        self.variable = variable
+        self.parent = variable.get_node()
+        self.new_value = value
+        self.old_value = None
+
+    def changed_nodes(self):
+        return [self.parent]
+
+    def _perform(self):
+        if self.old_value is None:
+            self.old_value = self.variable.get_value()
+        self.variable.silent_set_value(self.new_value)
+        self.parent.variable_changed.emit(self.parent, self.variable)
+        self.variable.variable_changed.emit(self.variable)
+
+    def _undo(self):
+        self.variable.silent_set_value(self.old_value)
+        self.parent.variable_changed.emit(self.parent, self.variable)
+        self.variable.variable_changed.emit(self.variable)
+
+
+class DA_ChangeVariables(DocumentAction):
+    """
+    Changes one or more variables in a node. ``variables`` must be a dict
+    mapping variable names to values.
+    """
+
+    def __init__(self, node, variables):
+        super(DA_ChangeVariables, self).__init__()
+        self.node = node
+        self.variables = variables
+        self.old_variables = None
+
+    def changed_nodes(self):
+        return [self.node]
+
+    def nbytes(self):
+        return ACTION_NBYTES + 2 * VARIABLE_NBYTES * len(self.variables)
+
+    def _perform(self):
+        if self.old_variables is None:
+            self.old_variables = {}
+            for name, value in self.variables.items():
+                self.old_variables[name] = \
+                    self.node.get_variable(name).get_value()
+        for name, value in self.variables.items():
+            var = self.node.get_variable(name)
+            var.silent_set_value(value)
+            self.node.variable_changed.emit(self.node, var)
+            var.variable_changed.emit(var)
+
+    def _undo(self):
+        for name, value in self.old_variables.items():
+            var = self.node.get_variable(name)
+            var.silent_set_value(value)
+            self.node.variable_changed.emit(self.node, var)
+            var.variable_changed.emit(var)
@@ -6,67 +6,50 @@
 #
 # -----------------------------------------------------------------------------
 #
-# GDE Document structure.
-#
-# All data is stored in a Document object which is a hierarchy of DocumentNode
-# objects. Each document node has a name unique within its parent. DocumentNode
-# objects can contain data in the form of DocumentVariable objects. Each
-# DocumentVariable has a name that is unique within its parent, although node
-# and variable names may overlap.
-#
-# The methods to edit and append documents use DocumentActions and can send out
-# signals to allow undo/redo and listeners. In the cases where this is not
-# desired, the silent_ methods can be used.
+# The graphical user interface. Documents, coordinate conversion and spline
+# fitting are implemented in the Qt-free module ``gde.core``, and shown and
+# edited using the widgets defined here.
 #
 
 import collections
+import concurrent.futures
 import configparser
+import contextlib
+import hashlib
 import math
 import os
 import sys
+import threading
 import traceback
-
-import xml.dom.minidom as minidom
-import xml.etree.cElementTree as et
-
-import numpy as np
+import weakref
 
 import gde
+from .core import (
+    DataPointNode,
+    DataSetNode,
+    GdeDocument,
+    HISTORY_COUNT,
+    HISTORY_NBYTES,
+    PointGrid,
+    T_AXIS_REFERENCE_POINT,
+    T_DATA_POINT,
+    T_DATA_SET,
+    V_BOOL,
+    V_FLOAT,
+    V_INT,
+    V_NORM,
+    V_PATH,
+    V_STR,
+    pspline,
+)
 from .qt import Qt, QtCore, QtGui, QtWidgets, Application
 
 # ConfigParser in Python 2 and 3
 
-# Strings in Python 2 and 3
-try:
-    basestring
-except NameError:   # pragma: no python 2 cover
-    basestring = str
-
 
 # Application title
 TITLE = 'GDE'
 
-# Latest supported Gde document version
-DOCUMENT_VERSION = 2
-
-# Tags / Node-types (ntypes)
-T_IMAGE = 'image'
-T_AXES = 'axes'
-T_AXIS = 'axis'
-T_AXIS_REFERENCE_POINT = 'refpoint'
-T_DATA_SETS = 'datasets'
-T_DATA_SET = 'dataset'
-T_DATA_POINT = 'datapoint'
-T_VARIABLE = 'variable'
-
-# Variable types
-V_STR = 'str'       # A string
-V_INT = 'int'       # An integer
-V_BOOL = 'bool'     # A boolean
-V_FLOAT = 'float'   # A float
-V_NORM = 'norm'     # A float in the range [0,1]
-V_PATH = 'path'     # A path name
-
 # Gui z-indexes
 Z_BACKGROUND = 0
 Z_AXIS = 1
@@ -74,9 +57,15 @@ Z_DATA_SET = 2
 Z_DATA = 3
 Z_SELECTED = 9999
 
+# Points smaller than this (radius in pixels) are drawn as dots, not symbols
+MIN_GLYPH_PIXELS = 8
+
 # Settings file
 SETTINGS_FILE = os.path.join(gde.DIR_USER, 'gde.ini')
 
+# Directory for tiled copies of large images
+TILES_DIR = os.path.join(gde.DIR_USER, 'tiles')
+
 # Number of recent files to display
 N_RECENT_FILES = 5
 
@@ -158,1611 +147,6 @@ def icon():
     return icon
 
 
-#
-# Document classes
-#
-class DocumentNode(QtCore.QObject):
-    """
-    The ``DocumentNode`` class is used to build a tree structure where each
-    node can contain one or more ``DataValue`` objects.
-
-    A ``parent`` must be specified: For document roots this should be the
-    QObject owning the document, for all other nodes it should be the parent
-    node.
-
-    Each node has an ``ntype``, which describes the type of node it is. This is
-    a string property that can be set freely.
-
-    Data stored in the node can be obtained using ``get_value()``
-    """
-    # Signals
-    # Called when this node was deselected in one of the views
-    # Attributes: self
-    node_deselected = QtCore.Signal(object)
-    # Called when this node was selected in one of the views
-    # Attributes: self
-    node_selected = QtCore.Signal(object)
-    # Called when this node was removed
-    # Attributes: self
-    node_removed = QtCore.Signal(object)
-    # Called when a child was added to this node
-    # Attributes: self, child
-    child_added = QtCore.Signal(object, object)
-    # Called when a child was removed from this node
-    # Attributes: self, child
-    child_removed = QtCore.Signal(object, object)
-    # Called when a variable was added to this node
-    # Attributes: self, DocumentVariable
-    variable_added = QtCore.Signal(object, object)
-    # Called when a variable was removed from this nod
-    # Attributes: self, DocumentVariable
-    variable_removed = QtCore.Signal(object, object)
-    # Called when a variable in this node was changed
-    # Attributes: self, DocumentVariable
-    variable_changed = QtCore.Signal(object, object)
-
-    def __init__(self, parent, ntype, name):
-        # Initialize!
-        super(DocumentNode, self).__init__(parent)
-        self._parent = parent if isinstance(parent, DocumentNode) else None
-        self._ntype = ntype
-        self._name = name
-        # The document this node belongs to
-        self._document = None
-        # The document model of the document this node belongs to
-        self._model = None
-        # This node's data
-        self._data = collections.OrderedDict()
-        # This node's children
-        self._kids = collections.OrderedDict()
-        # Selection
-        self._selected = False
-
-    def add_child(self, ntype, name, variables=None):
-        """
-        Appends a child to this node.
-
-        Variables can be added by setting ``variables`` to a list of tuples
-        ``(type, name, value)``.
-
-        """
-        if variables is None:
-            variables = ()
-        action = DA_AddNode(self, ntype, name, variables)
-        return self.get_document()._perform(action)
-
-    def add_variable(self, vtype, name, value=None):
-        """
-        Adds a DocumentVariable to this node.
-        """
-        action = DA_AddVariable(self, vtype, name, value)
-        return self.get_document()._perform(action)
-
-    def __bool__(self):     # pragma: no python 2 cover
-        """
-        Python 3 equivalent of :meth:`__nonzero__()`.
-        """
-        return True
-
-    def can_drag(self):
-        """
-        Returns True if this item is draggable / droppable.
-        """
-        return self.get_document().can_drag(self)
-
-    def child(self, k):
-        """
-        Returns the ``k-th`` child node.
-
-        **Required to work with DocumentModel.**
-        """
-        return self._kids[list(self._kids.keys())[k]]
-
-    def clear_selection(self):
-        """
-        Clears the selection (if any) of this node and any children nodes.
-        """
-        self.deselect()
-        for kid in self._kids.values():
-            kid.clear_selection()
-
-    def deselect(self):
-        """
-        Deselect this node in any listening views.
-        """
-        if self._selected:
-            self._selected = False
-            self.node_deselected.emit(self)
-
-    def get(self, *names):
-        """
-        Returns the child node with the given name.
-        """
-        if len(names) == 0:
-            return self
-        return self._kids[names[0]].get(*names[1:])
-
-    def get_document(self):
-        """
-        Retuns the document this node is in.
-        """
-        node = self
-        while node is not None:
-            if isinstance(node, Document):
-                return node
-            node = node.get_parent_node()
-        raise Exception('No Document set in hierarchy for ' + str(self))
-
-    def get_model(self):
-        """
-        Returns the document model for the document this node is in.
-        """
-        if not self._model:
-            self._model = self.get_document().get_model()
-        return self._model
-
-    def get_model_index(self, column=0):
-        """
-        Returns a QModelIndex object refering to this node.
-        """
-        return self.get_model().createIndex(self.index(), column, self)
-
-    def get_model_selection(self):
-        """
-        Returns a QItemSelection for this node's entire row.
-        """
-        m = self.get_model()
-        a = m.createIndex(self.index(), 0, self)
-        b = m.createIndex(self.index(), 1, self)
-        return QtCore.QItemSelection(a, b)
-
-    def get_name(self):
-        """
-        Returns this node's name.
-        """
-        return self._name
-
-    def get_ntype(self):
-        """
-        Returns this node's ntype.
-        """
-        return self._ntype
-
-    def get_parent_node(self):
-        """
-        Returns this node's parent, or ``None`` if this node is a root node.
-        """
-        return self._parent
-
-    def get_value(self, name):
-        """
-        Returns the value of this node's variable with the given name.
-        """
-        return self._data[str(name)].get_value()
-
-    def get_values(self, *names):
-        """
-        Returns all the requested variable values (see get_value())
-        """
-        x = [0] * len(names)
-        for k, name in enumerate(names):
-            x[k] = self._data[str(name)].get_value()
-        return tuple(x)
-
-    def get_variable(self, name):
-        """
-        Returns this node's variable with the given name.
-        """
-        name = str(name)
-        return self._data[name]
-
-    def get_xml(self):
-        """
-        Returns an ElementTree xml version of this node.
-        """
-        e = et.Element(self._ntype)
-        e.attrib['name'] = self._name
-        for d in self._data.values():
-            e.append(d.get_xml())
-        for k in self._kids.values():
-            e.append(k.get_xml())
-        return e
-
-    def has_value(self, name):
-        """
-        Returns True if this node has a variable with the given name.
-        """
-        return name in self._data
-
-    def index(self):
-        """
-        Returns the index of this node in its parent's list of kids.
-
-        **Required to work with DocumentModel**
-        """
-        if self._parent is None:
-            return 0
-        return list(self._parent._kids.values()).index(self)
-
-    def is_selected(self):
-        """
-        Returns True if this node is selected.
-        """
-        return self._selected
-
-    def __iter__(self):
-        """
-        Returns an iterator over this node's children.
-        """
-        return iter(self._kids.values())
-
-    def data(self):
-        """
-        Returns an iterator over the :class:`DocumentValue` objects stored in
-        this node.
-        """
-        return iter(self._data.values())
-
-    def __len__(self):
-        """
-        Returns the number of children this node has.
-        """
-        return len(self._kids)
-
-    def __nonzero__(self):  # pragma: no python 3 cover
-        """
-        Used when writing ``if node:``, without overloading this, the value of
-        ``__len__`` would be used in these cases.
-
-        In Python 3, this was renamed __bool__.
-        """
-        return True
-
-    def parent(self):
-        """
-        Returns this node's parent.
-
-        **Required to work with DocumentModel.**
-        """
-        return self._parent
-
-    def remove(self):
-        """
-        Removes this node.
-        """
-        action = DA_RemoveNode(self)
-        return self.get_document()._perform(action)
-    #def remove_variable(self, variable):
-
-    def select(self):
-        """
-        Tells any views listening to this node that it should be selected.
-        """
-        if not self._selected:
-            self._selected = True
-            self.get_document().node_selected.emit(self)
-            self.node_selected.emit(self)
-
-    def set_value(self, **values):
-        """
-        Sets one or more variables in this node using the keyword syntax.
-        """
-        action = DA_ChangeVariables(self, values)
-        return self.get_document()._perform(action)
-
-    def silent_add_child(self, ntype, name):
-        """
-        Creates and appends a child node without using actions or sending out
-        signals.
-
-        Returns the new node.
-        """
-        node = DocumentNode(self, ntype, str(name))
-        return self.silent_add_existing_child(node)
-
-    def silent_add_existing_child(self, child):
-        """
-        Appends a child node without using actions or sending out signals.
-
-        Returns the added node.
-        """
-        name = child.get_name()
-        if name in self._kids:
-            raise AttributeError('Duplicate child node: "' + name + '".')
-        # Notify the document model
-        m = self.get_model()
-        n = len(self._kids)
-        m.beginInsertRows(self.get_model_index(), n, n)
-        # Add child
-        self._kids[name] = child
-        m.endInsertRows()
-        # Return added child node
-        return child
-
-    def silent_add_existing_variable(self, var):
-        """
-        Appens a variable without using actions or sending out signals.
-
-        Returns the added variable.
-        """
-        name = var.get_name()
-        if name in self._data:
-            raise AttributeError('Duplicate variable name: "' + name + '".')
-        # Notify the document model
-        m = self.get_model()
-        n = len(self._data) + 1
-        m.beginInsertRows(self.get_model_index(), n, n)
-        # Add
-        self._data[name] = var
-        # Notify document model
-        m.endInsertRows()
-        # Return added variable
-        return var
-
-    def silent_add_variable(self, vtype, name, value=None):
-        """
-        Creates and appends a variable to this node without using actions or
-        sending out signals.
-
-        Returns the new variable.
-        """
-        var = DocumentVariable(self, vtype, str(name), value)
-        return self.silent_add_existing_variable(var)
-
-    def silent_remove_child(self, node):
-        """
-        Removes a child without using actions or sending out signals.
-        """
-        if node.get_parent_node() != self:
-            raise AttributeError('Node is not a child of this node.')
-        node.deselect()
-        n = node.index()
-        m = self.get_model()
-        m.beginRemoveRows(self.get_model_index(), n, n + 1)
-        del(self._kids[node.get_name()])
-        m.endRemoveRows()
-
-    def silent_remove_variable(self, variable):
-        """
-        Removes a variable without using actions or sending out signals.
-        """
-        del(self._data[variable.get_name()])
-
-
-class Document(DocumentNode):
-    """
-    Represents an xml like document.
-    """
-    # Signals
-    # Emitted when an exception occurs during an action
-    # Attributes: Document, DocumentAction, Exception
-    action_exception = QtCore.Signal(object, object, Exception)
-    # Emitted when the undo/redo history changes
-    # Attributes: Document
-    undo_redo_change = QtCore.Signal(object)
-    # Called when a node was selected in one of the views
-    # Attributes: node or none
-    node_selected = QtCore.Signal(object)
-    # Called when a node is added somewhere in the document
-    # Attributes: parent, child
-    doc_node_added = QtCore.Signal(object, object)
-    # Called when a node is removed from the document
-    # Attributes: parent, child
-    doc_node_removed = QtCore.Signal(object, object)
-    # Called when a document is deleted
-    # Attributes: document
-    doc_deleted = QtCore.Signal(object)
-
-    def __init__(self, parent, filename=None):
-        super(Document, self).__init__(parent, 'document', 'document')
-        # Model for use with a treeview
-        self._model = DocumentModel(self)
-        # List of actions (changes) performed on this model.
-        self._undo = []
-        # List of undone changes
-        self._redo = []
-        # Read the given file or create a default structure
-        self._read_file(filename)
-        # No changes!
-        self._changed = False
-
-    def can_drag(self, node):
-        """
-        Returns True if the given DocumentNode is drag/drop enabled.
-        """
-        return False
-
-    def can_redo(self):
-        """
-        Returns True if there are actions that can be redone.
-        """
-        return len(self._redo) > 0
-
-    def can_undo(self):
-        """
-        Returns True if there are actions that can be undone.
-        """
-        return len(self._undo) > 0
-
-    def delete(self):
-        """
-        Deletes this document.
-        """
-        self.doc_deleted.emit(self)
-
-    def get_model(self):
-        """
-        Returns a model of this document for use with TreeView components.
-        """
-        return self._model
-
-    def has_changes(self):
-        """
-        Returns True if any changes were made to this document (even if they
-        were subsequently undone).
-        """
-        return self._changed
-
-    def _perform(self, action):
-        """
-        Performs an action on this model.
-        """
-        try:
-            result = action.perform()
-            self._changed = True
-        except Exception as e:
-            # Show error info in console
-            print('Exception performing action: ' + str(type(action)))
-            print(traceback.format_exc())
-            # Emit signal about exception
-            self.action_exception.emit(self, action, e)
-            # Return None
-            return None
-        # Add action to undo list, clear redo list
-        self._redo = []
-        self._undo.append(action)
-        self.undo_redo_change.emit(self)
-        # Return action result
-        return result
-
-    def _read_file(self, filename=None):
-        """
-        Loads the data in the given file into this document.
-        """
-        raise NotImplementedError
-
-    def redo(self):
-        """
-        Redoes the last undone action.
-        """
-        action = self._redo[-1]
-        try:
-            result = action.perform()
-            self._changed = True
-        except Exception as e:
-            # Show error info in console
-            print('Exception redoing action: ' + str(type(action)))
-            print(traceback.format_exc())
-            # Emit signal about exception
-            self.action_exception.emit(self, action, e)
-            # Return None
-            return None
-        # Add action to undo list, clear redo list
-        self._redo.pop()
-        self._undo.append(action)
-        self.undo_redo_change.emit(self)
-        # Return action result
-        return result
-
-    def undo(self):
-        """
-        Undoes the last action.
-        """
-        action = self._undo[-1]
-        try:
-            result = action.undo()
-            self._changed = True
-        except Exception as e:
-            # Show error info in console
-            print('Exception undoing action: ' + str(type(action)))
-            print(traceback.format_exc())
-            # Emit signal about exception
-            self.action_exception.emit(self, action, e)
-            # Return None
-            return None
-        # Remove action from undo list, add to redo list
-        self._undo.pop()
-        self._redo.append(action)
-        self.undo_redo_change.emit(self)
-        # Return action result
-        return result
-
-    def write(self, filename):
-        """
-        Writes this document to the given path.
-        """
-        e = self.get_xml()
-        xml = et.tostring(e, encoding='utf-8')
-        xml = minidom.parseString(xml)
-        try:
-            f = open(filename, 'wb')
-            f.write(xml.toprettyxml(encoding='utf-8'))
-            self._changed = False
-        finally:
-            if f:
-                f.close()
-
-
-class DocumentVariable(QtCore.QObject):
-    """
-    Stores a variable in a document node.
-    """
-    # Signals
-    # Called when this variable was removed
-    # Attributes: self
-    variable_removed = QtCore.Signal(object)
-    # Called when this variable was changed
-    # Attributes: self
-    variable_changed = QtCore.Signal(object)
-
-    def __init__(self, node, vtype, name, value=None):
-        super(DocumentVariable, self).__init__(node)
-        self._node = node
-        self._vtype = vtype
-        self._name = name
-        if isinstance(value, basestring):
-            self._value = self._value_from_string(value)
-        else:
-            self._value = value
-
-    def get_name(self):
-        """
-        Returns this variable's name.
-        """
-        return self._name
-
-    def get_node(self):
-        """
-        Returns the node this variable belongs to.
-        """
-        return self._node
-
-    def get_str_value(self):
-        """
-        Returns this variable's value as a string.
-        """
-        return self._value_to_string(self._value)
-
-    def get_value(self):
-        """
-        Returns this variable's value in its native type.
-        """
-        return self._value
-
-    def get_vtype(self):
-        """
-        Returns this variable's data type.
-        """
-        return self._vtype
-
-    def set_value(self, value):
-        """
-        Changes this variable's value.
-        """
-        if isinstance(value, basestring):
-            value = self._value_from_string(value)
-        action = DA_ChangeVariable(self, value)
-        return self.get_node().get_document()._perform(action)
-
-    def get_xml(self):
-        """
-        Returns an ElementTree object representing this variable.
-        """
-        e = et.Element(T_VARIABLE)
-        e.attrib['vtype'] = self._vtype
-        e.attrib['name'] = self._name
-        e.attrib['value'] = self.get_str_value()
-        return e
-
-    def silent_set_value(self, value):
-        """
-        Changes this variable's data type, without using actions or sending
-        signals.
-        """
-        if isinstance(value, basestring):
-            value = self._value_from_string(value)
-        self._value = value
-
-    def _value_from_string(self, value):
-        """
-        Creates a value from a string.
-        """
-        if self._vtype == V_INT:
-            return int(value) if value else 0
-        elif self._vtype == V_FLOAT:
-            return float(value) if value else 0
-        elif self._vtype == V_NORM:
-            return min(1, max(0, float(value) if value else 0))
-        elif self._vtype in (V_STR, V_PATH):
-            return str(value)
-        elif self._vtype == V_BOOL:
-            return (value.lower() == 'true')
-        else:
-            raise Exception('Unknown variable type: ' + str(self._vtype))
-
-    def _value_to_string(self, value):
-        if self._vtype == V_INT:
-            return str(value)
-        elif self._vtype == V_BOOL:
-            return str(value)
-        elif self._vtype in (V_FLOAT, V_NORM):
-            return str(value)
-        elif self._vtype in (V_STR, V_PATH):
-            return '' if value is None else value
-        else:
-            raise Exception('Unknown variable type: ' + str(self._vtype))
-
-
-class GdeDocument(Document):
-    """
-    Represents a document used by the GDE.
-
-    The argument ``parent`` should be a QObject owning this document.
-    """
-
-    def __init__(self, parent, filename=None):
-        # Major version number
-        self._version = 0
-
-        # Axis reference points
-        self._refs = None
-
-        # X-axis and Y-axis
-        self._xaxis = None
-        self._yaxis = None
-
-        # Data sets
-        self._data_node = None
-        self._active_data_set = None
-
-        # Coordinate conversion method
-        def trivial(x, y):
-            return x, y
-        self.norm2real = trivial
-
-        # Call parent constructor
-        super(GdeDocument, self).__init__(parent, filename)
-
-        # Start listening to node selection
-        self.node_selected.connect(self.handle_node_selected)
-
-    def add_data_fit(self):
-        """
-        Adds a data fit to this document.
-        """
-
-    def add_data_set(self):
-        """
-        Adds a data set to this document.
-        """
-        n = len(self._data_node)
-        n = 'Data set ' + str(n + 1)
-        a = (
-            (V_STR, 'label', n),
-            (V_BOOL, 'spline', False),
-            (V_INT, 'segments', 0),
-            (V_INT, 'degree', 3),
-            (V_INT, 'penalty', 3),
-            (V_FLOAT, 'smoothing', 0.1),
-            (V_INT, 'samples', 100),
-        )
-        return self._data_node.add_child(T_DATA_SET, n, a)
-
-    def can_drag(self, node):
-        """
-        Returns True if the given node is draggable.
-        """
-        return node.get_ntype() == T_DATA_POINT
-
-    def extract_data(self, path):
-        """
-        Extracts the data from every data set in the scene and writes it to a
-        series of csv files.
-        """
-        # Define function to export a single data set
-        fmt = '{:< 1.5g}'
-        x = self._xaxis.get_value('label')
-        y = self._yaxis.get_value('label')
-        header = '"' + x + '","' + y + '"\n'
-
-        def write(path, dset):
-            # Check if spline was requested
-            spline = dset.get_value('spline')
-            if spline:
-                x1 = []
-                y1 = []
-                for point in dset:
-                    x, y = self.norm2real(*point.get_values('x', 'y'))
-                    x1.append(x)
-                    y1.append(y)
-                x1 = np.array(x1, copy=False)
-                xmin = np.min(x1)
-                xmax = np.max(x1)
-                # Get spline parameters
-                smo = dset.get_value('smoothing')
-                pen = dset.get_value('penalty')
-                deg = dset.get_value('degree')
-                seg = dset.get_value('segments')
-                sam = dset.get_value('samples')
-                if seg < 1:
-                    # Segments = 0 means add a segment per data point
-                    seg = len(x1)
-                # Points to evaluate the spline at
-                x2 = np.linspace(xmin, xmax, sam)
-                # Fit spline
-                y2 = pspline(x1, y1, x2, smo, seg, deg, pen)
-                x, y = iter(x2), iter(y2)
-                # Write data
-                with open(path, 'w') as f:
-                    f.write(header)
-                    for i in range(sam):
-                        f.write(
-                            fmt.format(next(x)) + ','
-                            + fmt.format(next(y)) + '\n')
-            else:
-                with open(path, 'w') as f:
-                    f.write(header)
-                    for point in dset:
-                        x, y = self.norm2real(*point.get_values('x', 'y'))
-                        f.write(fmt.format(x) + ',' + fmt.format(y) + '\n')
-
-        # Export all data sets
-        n = len(self._data_node)
-        if n == 0:
-            raise Exception('No data sets to export')
-        elif n == 1:
-            # Write single data set
-            write(path, self._data_node.child(0))
-        else:
-            # Write multiple data sets to multiple files
-            base, ext = os.path.splitext(path)
-            base += '-'
-            for dset in self._data_node:
-                path = base + dset.get_value('label') + ext
-                write(path, dset)
-
-    def get_active_data_set(self):
-        """
-        Returns the currently active dataset. If the document doesn't contain
-        any datasets a new set is created.
-        """
-        if self._active_data_set is None:
-            # Create data set
-            data = self.get('Data')
-            try:
-                self._active_data_set = data.child(-1)
-            except IndexError:
-                self.add_data_set()
-        return self._active_data_set
-
-    def get_xml(self):
-        """
-        Returns an ElementTree xml version of this document.
-        """
-        e = super(GdeDocument, self).get_xml()
-        e.attrib['major'] = str(self._version)
-        return e
-
-    def handle_axis_changed(self):
-        """
-        Updates the coordinate conversion scheme when the axes are changed.
-        """
-        if self._refs is None:
-            return
-        # Find point where axes cross (may or may not be the origin).
-        # Get reference nodes
-        node_rx0, node_rx1, node_ry0, node_ry1 = self._refs
-
-        # Get vectors defining axes
-        rx = Line2D(
-            Point2D(*node_rx0.get_values('x', 'y')),
-            Point2D(*node_rx1.get_values('x', 'y')))
-        ry = Line2D(
-            Point2D(*node_ry0.get_values('x', 'y')),
-            Point2D(*node_ry1.get_values('x', 'y')))
-
-        # Get values of the head and tail of the reference vectors
-        vx0 = node_rx0.get_value('value')
-        vx1 = node_rx1.get_value('value')
-        vy0 = node_ry0.get_value('value')
-        vy1 = node_ry1.get_value('value')
-
-        # Get unit vectors on the displaced (axis)
-        # For rx, the tail will be on the line x=0 but the y value still
-        # depends on where the axis was displayed in the original graph.
-        dx = vx1 - vx0
-        if dx == 0:
-            dx = 1e-12
-        rx = Line2D(rx.point(-vx0 / dx), rx.point((1 - vx0) / dx))
-
-        dy = vy1 - vy0
-        if dy == 0:
-            dy = 1e-12
-        ry = Line2D(ry.point(-vy0 / dy), ry.point((1 - vy0) / dy))
-
-        # Now we swap rx and ry around so rx' tail is where ry's tail was and
-        # vice versa.
-        sx = Line2D(rx)
-        rx.move_to(ry.tail)
-        ry.move_to(sx.tail)
-
-        # Now rx is a unit vector on the x-axis pointing in the x direction
-        # and ry is a unit vector on the y-axis pointing in the y direction
-        # The origin is found by taking the intersection of these points
-        origin = rx.intersect(ry)
-
-        # Get determinant of of matrix of unit vectors
-        rx.move_to(origin)
-        ry.move_to(origin)
-        rx = rx.head - rx.tail
-        ry = ry.head - ry.tail
-        idet = 1.0 / (rx.x * ry.y - ry.x * rx.y)
-
-        # Set transformation matrix
-        def transform(x, y):
-            # Get position relative to origin
-            x -= origin.x
-            y -= origin.y
-            # Transform to real coordinates
-            xx = idet * (x * ry.y - y * ry.x)
-            yy = idet * (y * rx.x - x * rx.y)
-            return xx, yy
-        self.norm2real = transform
-
-    def handle_data_set_added(self, parent, dset):
-        """
-        Called when a data set is added to the data node.
-        """
-        self._active_data_set = dset
-
-    def handle_data_set_removed(self, parent, dset):
-        """
-        Called when a data set is removed from the data node.
-        """
-        if dset == self._active_data_set:
-            self._active_data_set = None
-
-    def handle_node_selected(self, node):
-        """
-        Called when a node is selected in this document.
-        """
-        ntype = node.get_ntype()
-        if ntype == T_DATA_SET:
-            self._active_data_set = node
-        elif ntype == T_DATA_POINT:
-            self._active_data_set = node.get_parent_node()
-
-    def _read_file(self, filename=None):
-        """
-        Reads a Gde document or creates a default one.
-        """
-        def find(parent, ntype, name):
-            """
-            Finds the first child node of the given type with the given name.
-            """
-            if parent is None:
-                return None
-            for kid in parent.iterfind(ntype):
-                if kid.attrib['name'] == name:
-                    return kid
-            return None
-        try:
-            # Parse file
-            self.filename = filename
-            doc = None
-            if filename is not None:
-                try:
-                    doc = et.parse(filename)
-                except et.ParseError:
-                    #TODO: Show a warning dialog!
-                    print('Warning: Unable to read file ' + str(filename))
-
-            # Add version
-            if doc:
-                doctag = doc.getroot()
-                try:
-                    major_version = int(doctag.attrib['major'])
-                except Exception:
-                    major_version = 0
-            else:
-                major_version = DOCUMENT_VERSION
-            self._version = major_version
-
-            # Add image
-            image = self.add_child(T_IMAGE, 'Image')
-            image.add_variable('path', 'path')
-            if doc:
-                x = find(doc, T_IMAGE, 'Image')
-                x = find(x, T_VARIABLE, 'path')
-                if x is not None:
-                    image.set_value(path=x.attrib['value'])
-
-            # Add axes
-            d = [[0.3, 0.8, 0], [0.8, 0.8, 5], [0.2, 0.7, 0], [0.2, 0.2, 5]]
-            xlabel = 'x'
-            ylabel = 'y'
-            if doc:
-                x = find(doc, T_AXES, 'Axes')
-
-                def pt(axis, name, idx):
-                    x = find(axis, T_AXIS_REFERENCE_POINT, name)
-                    y = find(x, T_VARIABLE, 'x')
-                    if y is not None:
-                        d[idx][0] = y.attrib['value']
-                    y = find(x, T_VARIABLE, 'y')
-                    if y is not None:
-                        d[idx][1] = y.attrib['value']
-                    y = find(x, T_VARIABLE, 'value')
-                    if y is not None:
-                        d[idx][2] = y.attrib['value']
-
-                y = find(x, T_AXIS, 'x')
-                if y is not None:
-                    pt(y, 'ref1', 0)
-                    pt(y, 'ref2', 1)
-                    z = find(y, T_VARIABLE, 'label')
-                    if z is not None:
-                        xlabel = z.attrib['value']
-
-                y = find(x, T_AXIS, 'y')
-                if y is not None:
-                    pt(y, 'ref1', 2)
-                    pt(y, 'ref2', 3)
-                    z = find(y, T_VARIABLE, 'label')
-                    if z is not None:
-                        ylabel = z.attrib['value']
-
-            def add_reference_point(parent, name, x, y, v):
-                r = parent.add_child(T_AXIS_REFERENCE_POINT, name)
-                r.add_variable(V_NORM, 'x', x)
-                r.add_variable(V_NORM, 'y', y)
-                r.add_variable(V_FLOAT, 'value', float(v))
-                return r
-
-            axes = self.add_child(T_AXES, 'Axes')
-            xaxis = axes.add_child(T_AXIS, 'x')
-            xaxis.add_variable(V_STR, 'label', xlabel)
-            x1 = add_reference_point(xaxis, 'ref1', *d[0])
-            x2 = add_reference_point(xaxis, 'ref2', *d[1])
-            yaxis = axes.add_child(T_AXIS, 'y')
-            yaxis.add_variable(V_STR, 'label', ylabel)
-            y1 = add_reference_point(yaxis, 'ref1', *d[2])
-            y2 = add_reference_point(yaxis, 'ref2', *d[3])
-
-            # Store axes and reference points
-            self._xaxis = xaxis
-            self._yaxis = yaxis
-            self._refs = (x1, x2, y1, y2)
-
-            # Add axis-change listeners to reference points
-            x1.variable_changed.connect(self.handle_axis_changed)
-            x2.variable_changed.connect(self.handle_axis_changed)
-            y1.variable_changed.connect(self.handle_axis_changed)
-            y2.variable_changed.connect(self.handle_axis_changed)
-
-            # Create initial norm2real function
-            self.handle_axis_changed()
-
-            # Add data set node
-            self._data_node = self.add_child(T_DATA_SETS, 'Data')
-
-            # Listen for new data sets
-            self._data_node.child_added.connect(self.handle_data_set_added)
-            self._data_node.child_removed.connect(self.handle_data_set_removed)
-
-            # Add data sets, data points
-            if doc:
-                if self._version < 1:
-                    root = doc
-                else:
-                    root = find(doc, T_DATA_SETS, 'Data')
-                if root:
-
-                    # Spline fitting options
-                    def var(root, name, default_value):
-                        v = find(root, T_VARIABLE, name)
-                        if v is None:
-                            return default_value
-                        return v.attrib['value']
-
-                    # Data sets
-                    for z in root.iterfind(T_DATA_SET):
-                        # Name and label
-                        if self._version < 1:
-                            name = label = 'Data set 1'
-                        else:
-                            name = z.attrib['name']
-                            label = name
-                            x = z.find(T_VARIABLE)
-                            if x is not None:
-                                label = str(x.attrib['value'])
-
-                        spline = var(z, 'spline', False)
-                        s_seg = var(z, 'segments', 0)
-                        s_deg = var(z, 'degree', 3)
-                        s_pen = var(z, 'penalty', 3)
-                        s_smo = var(z, 'smoothing', 0.1)
-                        s_sam = var(z, 'samples', 100)
-                        # Add data set
-                        dset = self._data_node.add_child(T_DATA_SET, name, (
-                            (V_STR, 'label', label),
-                            (V_BOOL, 'spline', spline),
-                            (V_INT, 'segments', s_seg),
-                            (V_INT, 'degree', s_deg),
-                            (V_INT, 'penalty', s_pen),
-                            (V_FLOAT, 'smoothing', s_smo),
-                            (V_INT, 'samples', s_sam),
-                        ))
-                        self._active_data_set = dset
-                        # Add data points
-                        for p in z.iterfind(T_DATA_POINT):
-                            x = find(p, T_VARIABLE, 'x')
-                            y = find(p, T_VARIABLE, 'y')
-                            if x is not None and y is not None:
-                                x = x.attrib['value']
-                                y = y.attrib['value']
-                                n = str(p.attrib['name'])
-                                v = ((V_NORM, 'x', x), (V_NORM, 'y', y))
-                                dset.add_child(T_DATA_POINT, n, v)
-        finally:
-            # Clear undo/redo
-            self._undo = []
-            self._redo = []
-            self._changed = False
-            self.undo_redo_change.emit(self)
-            # Set version to latest and save as such :)
-            self._version = DOCUMENT_VERSION
-
-    def set_active_data_set(self, data_set):
-        """
-        Sets the currently active data set.
-        """
-        self._active_data_set = data_set
-
-
-#
-# Tiny 2D Vector and line classes
-#
-class Point2D(object):
-    """
-    Represents a point in R2.
-    """
-
-    def __init__(self, x, y=None):
-        if isinstance(x, Point2D):
-            self.x = x.x
-            self.y = x.y
-        elif y is not None:
-            self.x = float(x)
-            self.y = float(y)
-        else:
-            raise AttributeError(
-                'Point2D can only be created with Point2D(float, float) or'
-                ' Point2D(Point2D).')
-
-    def __repr__(self):
-        return 'Point2D(' + str(self.x) + ', ' + str(self.y) + ')'
-
-    def __str__(self):
-        return '(' + str(self.x) + ', ' + str(self.y) + ')'
-
-    def __add__(self, other):
-        return Point2D(self.x + other.x, self.y + other.y)
-
-    def __iadd__(self, other):
-        self.x += other.x
-        self.y += other.y
-        return self
-
-    def __sub__(self, other):
-        return Point2D(self.x - other.x, self.y - other.y)
-
-    def __isub__(self, other):
-        self.x -= other.x
-        self.y -= other.y
-        return self
-
-    def __mul__(self, other):
-        other = float(other)
-        return Point2D(self.x * other, self.y * other)
-
-    def __rmul__(self, other):
-        other = float(other)
-        return Point2D(self.x * other, self.y * other)
-
-    def __imul__(self, other):
-        other = float(other)
-        self.x *= other
-        self.y *= other
-        return self
-
-    def __neg__(self):
-        return Point2D(-self.x, -self.y)
-
-    def __pos__(self):
-        return Point2D(self)
-
-    def __len__(self):
-        return 2
-
-    def __getitem__(self, key):
-        return (self.x, self.y)[key]
-
-    def __setitem__(self, key, value):
-        p = [self.x, self.y]
-        p[key] = float(value)
-        self.x, self.y = p
-
-    def __eq__(self, other):
-        if isinstance(other, Point2D):
-            return self.x == other.x and self.y == other.y
-        return False
-
-    def __hash__(self):
-        return hash((self.x, self.y))
-
-    def __ne__(self, other):
-        if isinstance(other, Point2D):
-            return self.x != other.x or self.y != other.y
-        return True
-
-    def transform(self, a, b, c, d):
-        """
-        Transforms this point by multiplying with the matrix ((a, b),(c, d)).
-        """
-        x, y = self.x, self.y
-        self.x = a * x + b * y
-        self.y = c * x + d * y
-
-
-class Line2D(object):
-    """
-    Represents a line segment in 2D euclidean space. A line is defined using
-    two points, representing the 'head' and 'tail' of a vector connecting the
-    points.
-
-    A Line2D can be created in three ways:
-
-        1. Using ``x = Line2D(y)``, where ``y`` is another instance of Line2D.
-        2. Using ``x = Line2D(tail, head)``, where both ``tail`` and ``head``
-           are instances of ``Point2D``.
-        3. Using ``x = Line2D(tail_x, tail_y, head_x, head_y)`` where all
-           arguments are of types that can be converted to ``float``.
-
-    """
-
-    def __init__(self, a, b=None, c=None, d=None):
-        if isinstance(a, Line2D):
-            self.tail = Point2D(a.tail)
-            self.head = Point2D(a.head)
-        elif isinstance(a, Point2D) and isinstance(b, Point2D):
-            self.tail = Point2D(a)
-            self.head = Point2D(b)
-        elif b is not None and c is not None and d is not None:
-            self.tail = Point2D(a, b)
-            self.head = Point2D(c, d)
-        else:
-            raise AttributeError(
-                'Invalid signature. Expecting Line2D(Line2D) or '
-                'Line2D(Point2D, Point2D) or'
-                ' Line2D(float, float, float, float).')
-
-    def __repr__(self):
-        return 'Line2D(' + str(self.tail) + ', ' + str(self.head) + ')'
-
-    def __str__(self):
-        return '(' + str(self.tail) + ', ' + str(self.head) + ')'
-
-    def __add__(self, other):
-        return Line2D(Point2D(self.tail), Point2D(other.head))
-
-    def __iadd__(self, other):
-        self.head = Point2D(other.head)
-        return self
-
-    def __neg__(self):
-        return Line2D(self.head, self.tail)
-
-    def __pos__(self):
-        return Line2D(self)
-
-    def __len__(self):
-        return 2
-
-    def __getitem__(self, key):
-        return (self.tail, self.head)[key]
-
-    def __setitem__(self, key, value):
-        p = [self.tail, self.head]
-        p[key] = Point2D(value)
-        self.tail, self.head = p
-
-    def __eq__(self, other):
-        if isinstance(other, Line2D):
-            return self.tail == other.tail and self.head == other.head
-        return False
-
-    def __ne__(self, other):
-        if isinstance(other, Line2D):
-            return self.tail != other.tail or self.head != other.head
-        return True
-
-    def intersect(self, other):
-        """
-        Returns the point where the given lines intersect.
-        """
-        if self == other:
-            raise AttributeError('Identical lines never intersect.')
-        x1, y1 = self.tail
-        x2, y2 = self.head
-        x3, y3 = other.tail
-        x4, y4 = other.head
-        d = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
-        if abs(d) < 1e-14:
-            raise AttributeError(
-                'Lines are too close to parallel to detect intersection.')
-        d = 1 / d
-        c1 = x1 * y2 - y1 * x2
-        c2 = x3 * y4 - y3 * x4
-        return Point2D(
-            d * (c1 * (x3 - x4) - c2 * (x1 - x2)),
-            d * (c1 * (y3 - y4) - c2 * (y1 - y2)))
-
-    def move_to(self, point):
-        """
-        Moves this line definition vector so that its tail is at the given
-        point.
-        """
-        self.translate(point - self.tail)
-
-    def point(self, k):
-        """
-        Returns a point ``p`` on the line according to::
-
-            p = tail + k * (head - tail)
-
-        where ``k`` is a scalar value and ``p``, ``tail`` and ``head`` are
-        2D points.
-        """
-        return self.tail + k * (self.head - self.tail)
-
-    def translate(self, distance):
-        """
-        Moves this vector an x and y distance specified by the given Point2D.
-        """
-        self.tail += distance
-        self.head += distance
-
-
-#
-# P-spline calculation
-#
-def pspline(x, y, x2=None, s=1, nseg=10, deg=3, pdeg=2):
-    """
-    Computes a penalized B-spline (or P-spline) that fits the data given by
-    ``x``, ``y``.
-
-    If an argument ``x2`` is given, the spline is evaluated at each point in
-    ``x2`` and the resulting values are returned. If no value ``x2`` is given
-    the evaluations at ``x`` are returned.
-
-    The fitted spline will have ``nseg`` segments of degree ``deg``. Data
-    fitting is performed using a penalty of degree ``pdeg`` (e.g. a penalty on
-    the ``pdeg``-th derivative). Smoothing is introduced using a smoothing
-    factor ``s``.
-
-    Both ``x`` and ``y`` must be 1D arrays of the same length. The length of
-    ``x2`` is arbitrary.
-
-    P-splines are described in:
-
-        Flexible Smoothing with B-splines and Penalties
-        Paul H.C. Eilers and Brian D. Marx
-        Statistical Science
-        1996, Vol. 11, No. 2, 89-121
-
-    This method was adapted from a computer lab script by Paul Eilers, 2007
-    http://www.stat.lsu.edu/faculty/marx/
-    """
-    def bbase(x, xl, xr, nseg=10, deg=3):
-        """
-        Create a b-spline basis
-
-        Arguments::
-
-        ``x``
-            ?Points at which to evaluate?
-        ``xl``
-            Left-hand border x-coordinate.
-        ``xr``
-            Right-hand border x-coordinate.
-        ``nseg``
-            Number of segments
-        ``deg``
-            B-spline degree
-        """
-        # Get knots
-        dx = (xr - xl) / float(nseg)
-        knots = xl + np.arange(-deg, 1 + nseg + deg) * dx
-
-        # Create ufunc for truncated power function
-        def tpower(x, t):
-            """
-            Truncated power function (x^p if x > t, else 0)
-            """
-            return (x > t) * (x - t) ** deg
-        tp = np.frompyfunc(tpower, 2, 1)
-
-        # Compute bases
-        P = tp.outer(x, knots)
-
-        # For some reason P get dtype object, leads to issues later, so
-        P = np.array(P, dtype=x.dtype)
-        D = np.diff(np.eye(P.shape[1]), deg + 1, axis=0)
-        D /= math.gamma(deg + 1) * dx ** deg
-        return np.dot(P, np.transpose(D)) * -1**(deg + 1)
-
-    # Ensure x and y are numpy arrays
-    x = np.array(x, copy=False)
-    y = np.array(y, copy=False)
-
-    # Get left bound, right bound
-    if x2 is None:
-        # Use left and right boundaries of x
-        xl = np.min(x)
-        xr = np.max(x)
-    else:
-        # Use left and right boundaries of x2
-        x2 = np.array(x2, copy=False)
-        xl = min(np.min(x), np.min(x2))
-        xr = max(np.max(x), np.max(x2))
-
-    # Compute bases for B-splines
-    B = bbase(x, xl, xr, nseg, deg)
-
-    # Compute differences for penalty
-    D = np.diff(np.eye(B.shape[1]), pdeg, axis=0)
-    P = np.dot(np.transpose(D), D)
-
-    # Compute penalized weighing of B-splines
-    a = np.linalg.solve(
-        np.dot(np.transpose(B), B) + s * P,
-        np.dot(np.transpose(B), y))
-
-    # Evaluate spline and return
-    if x2 is None:
-        # Evaluate on x
-        return np.dot(B, a)
-    else:
-        # Evaluate on the given data points
-        B = bbase(x2, xl, xr, nseg, deg)
-        return np.dot(B, a)
-
-
-class DocumentAction(object):
-    """
-    Represents an action that can be performed on a document.
-    """
-    def __init__(self):
-        self._performed = False
-
-    def perform(self):
-        """
-        Performs this action. Return type depends on action.
-        """
-        if self._performed:
-            raise Exception(
-                'Action failed: Action cannot be performed twice.')
-        result = self._perform()
-        self._performed = True
-        return result
-
-    def undo(self):
-        """
-        Undoes this action. Return type depends on action.
-        """
-        if not self._performed:
-            raise Exception('Undo failed: Action not yet performed.')
-        result = self._undo()
-        self._performed = False
-        return result
-
-    def _perform(self):
-        """
-        Used by subclasses to perform an action.
-        """
-        raise NotImplementedError
-
-    def _undo(self):
-        """
-        Used by subclasses to undo an action.
-        """
-        raise NotImplementedError
-
-
-class DA_AddNode(DocumentAction):
-    """
-    Adds a child to a parent node.
-
-    Variables can be added using a list of tuples (type, name, value).
-    """
-
-    def __init__(self, parent, ntype, name, variables):
-        super(DA_AddNode, self).__init__()
-        self.parent = parent
-        self.name = name
-        self.ntype = ntype
-        self.child = None
-        self.variables = variables
-
-    def _perform(self):
-        p = self.parent
-        c = self.child
-        if c is not None:
-            p.silent_add_existing_child(c)
-        else:
-            c = self.child = p.silent_add_child(self.ntype, self.name)
-            for t, n, v in self.variables:
-                c.silent_add_variable(t, n, v)
-        # Signals
-        p.get_document().doc_node_added.emit(p, c)
-        p.child_added.emit(p, c)
-        # Return
-        return c
-
-    def _undo(self):
-        p = self.parent
-        c = self.child
-        p.silent_remove_child(c)
-        # Signals
-        p.get_document().doc_node_removed.emit(p, c)
-        p.child_removed.emit(p, c)
-        c.node_removed.emit(c)
-
-
-class DA_RemoveNode(DocumentAction):
-    """
-    Deletes a child node.
-    """
-
-    def __init__(self, node):
-        super(DA_RemoveNode, self).__init__()
-        self.child = node
-        self.parent = node.get_parent_node()
-
-    def _perform(self):
-        p = self.parent
-        c = self.child
-        p.silent_remove_child(c)
-        # Signals
-        p.get_document().doc_node_removed.emit(p, c)
-        p.child_removed.emit(p, c)
-        c.node_removed.emit(c)
-
-    def _undo(self):
-        p = self.parent
-        c = self.child
-        p.silent_add_existing_child(c)
-        # Signals
-        p.get_document().doc_node_added.emit(p, c)
-        p.child_added.emit(p, c)
-
-
-class DA_AddVariable(DocumentAction):
-    """
-    Adds a DocumentVariable to a DocumentNode
-    """
-
-    def __init__(self, parent, vtype, name, value=None):
-        super(DA_AddVariable, self).__init__()
-        self.parent = parent
-        self.vtype = vtype
-        self.name = name
-        self.value = value
-        self.variable = None
-
-    def _perform(self):
-        if self.variable is not None:
-            self.parent.silent_add_existing_variable(self.variable)
-        else:
-            self.variable = self.parent.silent_add_variable(
-                self.vtype, self.name, self.value)
-        self.parent.variable_added.emit(self.parent, self.variable)
-        return self.variable
-
-    def _undo(self):
-        self.parent.silent_remove_variable(self.variable)
-        self.parent.variable_removed.emit(self.parent, self.variable)
-        self.variable.variable_removed.emit(self.variable)
-
-
-class DA_RemoveVariable(DocumentAction):
-    """
-    Removes a DocumentVariable form a DocumentNode
-    """
-
-    def __init__(self, parent, variable):
-        super(DA_RemoveVariable, self).__init__()
-        self.parent = parent
-        self.variable = variable
-
-    def _perform(self):
-        self.parent.silent_remove_variable(self.variable)
-        self.parent.variable_removed.emit(self.parent, self.variable)
-        self.variable.variable_removed.emit(self.variable)
-
-    def _undo(self):
-        self.parent.silent_add_existing_variable(self.variable)
-        self.parent.variable_added.emit(self.parent, self.variable)
-
-
-class DA_ChangeVariable(DocumentAction):
-    """
-    Changes a value within a DocumentNode
-    """
-
-    def __init__(self, variable, value):
-        super(DA_ChangeVariable, self).__init__()
-        self.variable = variable
-        self.parent = variable.get_node()
-        self.new_value = value
-        self.old_value = None
-
-    def _perform(self):
-        if self.old_value is None:
-            self.old_value = self.variable.get_value()
-        self.variable.silent_set_value(self.new_value)
-        self.parent.variable_changed.emit(self.parent, self.variable)
-        self.variable.variable_changed.emit(self.variable)
-
-    def _undo(self):
-        self.variable.silent_set_value(self.old_value)
-        self.parent.variable_changed.emit(self.parent, self.variable)
-        self.variable.variable_changed.emit(self.variable)
-
-
-class DA_ChangeVariables(DocumentAction):
-    """
-    Changes one or more variables in a node. ``variables`` must be a dict
-    mapping variable names to values.
-    """
-
-    def __init__(self, node, variables):
-        super(DA_ChangeVariables, self).__init__()
-        self.node = node
-        self.variables = variables
-        self.old_variables = None
-
-    def _perform(self):
-        if self.old_variables is None:
-            self.old_variables = {}
-            for name, value in self.variables.items():
-                self.old_variables[name] = \
-                    self.node.get_variable(name).get_value()
-        for name, value in self.variables.items():
-            var = self.node.get_variable(name)
-            var.silent_set_value(value)
-            self.node.variable_changed.emit(self.node, var)
-            var.variable_changed.emit(var)
-
-    def _undo(self):
-        for name, value in self.old_variables.items():
-            var = self.node.get_variable(name)
-            var.silent_set_value(value)
-            self.node.variable_changed.emit(self.node, var)
-            var.variable_changed.emit(var)
-
-
 #
 # DocumentModel
 #
@@ -1772,11 +156,35 @@ class DA_ChangeVariables(DocumentAction):
 class DocumentModel(QtCore.QAbstractItemModel):
     """
     Implements the Qt abstract item model for a :class:`Document`.
+
+    The model listens to the document's ``rows_`` signals to keep any attached
+    views up to date. Call :meth:`disconnect_document()` before discarding the
+    model.
+
+    Indices store a pointer to their node, which Qt does not keep alive. Data
+    point nodes are only kept while in use (see :class:`DataSetNode`), so
+    indices for data points instead point to an object representing all rows
+    in their data set, and the node is looked up when needed. Use
+    :meth:`node()` to get the node for any index.
     """
 
-    def __init__(self, document):
-        super(DocumentModel, self).__init__(document)
+    class _PointRows(object):
+        """ Index pointer for the data point rows of a data set. """
+        __slots__ = ('data_set', )
+
+        def __init__(self, data_set):
+            self.data_set = weakref.ref(data_set)
+
+    def __init__(self, document, parent=None):
+        super(DocumentModel, self).__init__(parent)
         self.document = document
+        # Index pointers for data point rows, per data set
+        self._point_rows = weakref.WeakKeyDictionary()
+        # Mirror changes to the document structure
+        document.rows_inserting.connect(self.handle_rows_inserting)
+        document.rows_inserted.connect(self.handle_rows_inserted)
+        document.rows_removing.connect(self.handle_rows_removing)
+        document.rows_removed.connect(self.handle_rows_removed)
 
     def columnCount(self, node):
         """
@@ -1784,6 +192,17 @@ class DocumentModel(QtCore.QAbstractItemModel):
         """
         return 1
 
+    def disconnect_document(self):
+        """
+        Stops listening to changes in this model's document.
+        """
+        document = self.document
+        document.rows_inserting.disconnect(self.handle_rows_inserting)
+        document.rows_inserted.disconnect(self.handle_rows_inserted)
+        document.rows_removing.disconnect(self.handle_rows_removing)
+        document.rows_removed.disconnect(self.handle_rows_removed)
+        self._point_rows = weakref.WeakKeyDictionary()
+
     def data(self, index, role):
         """
         Returns the data stored at the given index (where index is given as a
@@ -1796,7 +215,7 @@ class DocumentModel(QtCore.QAbstractItemModel):
         if role != Qt.ItemDataRole.DisplayRole:
             return None
         # Get the node this index points at
-        item = index.internalPointer()
+        item = self.node(index)
         if index.column() == 1:
             return item.get_ntype()
         else:
@@ -1817,6 +236,30 @@ class DocumentModel(QtCore.QAbstractItemModel):
         # Return flags
         return flags
 
+    def handle_rows_inserted(self, parent, first, last):
+        """
+        Called after child nodes were inserted into ``parent``.
+        """
+        self.endInsertRows()
+
+    def handle_rows_inserting(self, parent, first, last):
+        """
+        Called before child nodes are inserted into ``parent``.
+        """
+        self.beginInsertRows(self.node_index(parent), first, last)
+
+    def handle_rows_removed(self, parent, first, last):
+        """
+        Called after child nodes were removed from ``parent``.
+        """
+        self.endRemoveRows()
+
+    def handle_rows_removing(self, parent, first, last):
+        """
+        Called before child nodes are removed from ``parent``.
+        """
+        self.beginRemoveRows(self.node_index(parent), first, last)
+
     def headerData(self, section, orientation, role):
         """
         Return the header for the row/column requested as ``section``.
@@ -1839,16 +282,47 @@ class DocumentModel(QtCore.QAbstractItemModel):
         if not self.hasIndex(row, column, parent):
             return QtCore.QModelIndex()
         # Get parent DocumentNode
-        if parent.isValid():
-            parent = parent.internalPointer()
-        else:
-            parent = self.document
+        parent = self.node(parent)
+        if isinstance(parent, DataSetNode):
+            return self.createIndex(row, column, self._rows(parent))
         # Find child, return index
         try:
             child = parent.child(row)
             return self.createIndex(row, column, child)
-        except KeyError:
+        except IndexError:
+            return QtCore.QModelIndex()
+
+    def node(self, index):
+        """
+        Returns the :class:`DocumentNode` at the given ``QModelIndex``, or the
+        document for an invalid index.
+        """
+        if not index.isValid():
+            return self.document
+        pointer = index.internalPointer()
+        if isinstance(pointer, DocumentModel._PointRows):
+            return pointer.data_set().child(index.row())
+        return pointer
+
+    def node_index(self, node, column=0):
+        """
+        Returns a ``QModelIndex`` referring to the given node.
+        """
+        if node is None or node is self.document:
             return QtCore.QModelIndex()
+        if isinstance(node, DataPointNode):
+            pointer = self._rows(node.get_parent_node())
+        else:
+            pointer = node
+        return self.createIndex(node.index(), column, pointer)
+
+    def node_selection(self, node):
+        """
+        Returns a ``QItemSelection`` for the given node's entire row.
+        """
+        return QtCore.QItemSelection(
+            self.node_index(node, 0),
+            self.node_index(node, self.columnCount(None) - 1))
 
     def parent(self, index):
         """
@@ -1857,7 +331,11 @@ class DocumentModel(QtCore.QAbstractItemModel):
         if not index.isValid():
             return QtCore.QModelIndex()
         # Get parent
-        parent = index.internalPointer().parent()
+        pointer = index.internalPointer()
+        if isinstance(pointer, DocumentModel._PointRows):
+            parent = pointer.data_set()
+        else:
+            parent = pointer.parent()
         # Return index to parent
         if parent is None or parent == self.document:
             return QtCore.QModelIndex()
@@ -1871,11 +349,17 @@ class DocumentModel(QtCore.QAbstractItemModel):
         """
         if parent.column() > 0:
             return 0
-        if parent.isValid():
-            parent = parent.internalPointer()
-        else:
-            parent = self.document
-        return len(parent)
+        return len(self.node(parent))
+
+    def _rows(self, data_set):
+        """
+        Returns the index pointer for the data point rows of ``data_set``.
+        """
+        rows = self._point_rows.get(data_set)
+        if rows is None:
+            rows = self._point_rows[data_set] = DocumentModel._PointRows(
+                data_set)
+        return rows
 
     def supportedDropActions(self):
         """
@@ -1900,7 +384,7 @@ class GraphDataExtractor(Application):
         # Set application icon
         self.setWindowIcon(icon())
         # Create gde document
-        self._document = GdeDocument(self)
+        self._document = GdeDocument()
         # Set size, center
         self.resize(800, 600)
         qr = self.frameGeometry()
@@ -1923,6 +407,9 @@ class GraphDataExtractor(Application):
         # Cursor position label on status bar
         self._label_cursor = QtWidgets.QLabel()
         self.statusBar().addPermanentWidget(self._label_cursor)
+        # Undo history size label on status bar
+        self._label_history = QtWidgets.QLabel()
+        self.statusBar().addPermanentWidget(self._label_history)
         # Menu bar
         self.create_menu()
         # Tool bar
@@ -1933,6 +420,8 @@ class GraphDataExtractor(Application):
         self._path = QtCore.QDir.currentPath()
         self._file = None
         self._recent_files = []
+        # Maximum number of undo steps and history memory (in bytes)
+        self._history_limit = (HISTORY_COUNT, HISTORY_NBYTES)
         # Load settings from ini file
         self.load_config()
         # Load document
@@ -1940,7 +429,8 @@ class GraphDataExtractor(Application):
         if filename is not None:
             if os.path.isfile(filename):
                 doc = filename
-        self.load_document(doc)
+        if not self.load_document(doc):
+            self.load_document()
         self.update_window_title()
 
     def action_about(self):
@@ -2000,7 +490,13 @@ class GraphDataExtractor(Application):
         if fname:
             fname = str(fname)
             if fname:
-                self._document.extract_data(fname)
+                try:
+                    self._document.extract_data(fname)
+                except Exception:
+                    QtWidgets.QMessageBox.warning(
+                        self, TITLE,
+                        '<h1>Unable to extract data.</h1>'
+                        '<pre>' + traceback.format_exc() + '</pre>')
 
     def action_license(self):
         """
@@ -2076,17 +572,23 @@ class GraphDataExtractor(Application):
         """
         self.clear_focus()
         if save_as or self._file is None:
-            fname = QtWidgets.QFileDialog.getSaveFileName(
+            filters = (
+                'Gde files (*.gde)',
+                'Gde files with binary data points (*.gde)',
+            )
+            fname, selected = QtWidgets.QFileDialog.getSaveFileName(
                 self,
                 'Save gde file',
-                self._path, filter='Gde files (*.gde)')[0]
+                self._path, filter=';;'.join(filters),
+                initialFilter=filters[int(self._document.is_binary())])
             if fname:
                 fname = str(fname)
                 if fname:
                     if os.path.splitext(fname)[1] == '':
                         fname += '.gde'
                     self.set_filename(fname)
-                    self._document.write(self._file)
+                    self._document.write(
+                        self._file, binary=(selected == filters[1]))
         else:
             self._document.write(self._file)
         self.update_window_title()
@@ -2345,6 +847,8 @@ class GraphDataExtractor(Application):
         """
         self._tool_undo.setEnabled(document.can_undo())
         self._tool_redo.setEnabled(document.can_redo())
+        self._label_history.setText('Undo: {} steps, {:.1f} MB'.format(
+            document.history_count(), document.history_nbytes() / 1048576))
 
     def load_config(self):
         """
@@ -2394,18 +898,49 @@ class GraphDataExtractor(Application):
                         self._recent_files.append(filename)
             self.update_recent_files_menu()
 
+        # Undo history limits (0 for no limit)
+        if config.has_section('history'):
+            count, nbytes = self._history_limit
+            try:
+                if config.has_option('history', 'steps'):
+                    count = int(config.get('history', 'steps')) or None
+                if config.has_option('history', 'memory_mb'):
+                    nbytes = int(config.get('history', 'memory_mb')) or None
+                    if nbytes:
+                        nbytes *= 1048576
+            except ValueError:
+                pass
+            else:
+                self._history_limit = (count, nbytes)
+
     def load_document(self, filename=None):
         """
         Loads a document into the editor.
+
+        Returns ``True`` if successful. If the document can't be read, a
+        warning is shown, the current document is kept, and ``False`` is
+        returned.
         """
+        try:
+            document = GdeDocument(filename)
+        except IOError:
+            QtWidgets.QMessageBox.warning(
+                self, TITLE,
+                '<h1>Unable to open file.</h1>'
+                '<pre>' + traceback.format_exc() + '</pre>')
+            return False
         if self._document:
             self._document.delete()
-        self._document = GdeDocument(self, filename)
+        self._document = document
         self.set_filename(filename)
         # Add to recent files
         if filename is not None:
             self.add_recent_file(filename)
-        # React to changes in undo/redo status
+        # Limit undo history, react to changes in undo/redo status
+        self._document.set_history_limit(*self._history_limit)
+        # Deliver changes to nodes once per event loop iteration
+        self._document.set_change_scheduler(
+            lambda f: QtCore.QTimer.singleShot(0, f))
         self._document.action_exception.connect(self.handle_action_exception)
         self._document.undo_redo_change.connect(self.handle_undo_redo_change)
         # React to node selection
@@ -2417,6 +952,7 @@ class GraphDataExtractor(Application):
         self._scene.set_document(self._document)
         # Tell undo/redo buttons about change
         self.handle_undo_redo_change(self._document)
+        return True
 
     def prompt_save_changes(self):
         """
@@ -2466,6 +1002,12 @@ class GraphDataExtractor(Application):
         for k, filename in enumerate(self._recent_files):
             config.set('files', 'recent_' + str(k), filename)
 
+        # Undo history limits (0 for no limit)
+        count, nbytes = self._history_limit
+        config.add_section('history')
+        config.set('history', 'steps', str(count or 0))
+        config.set('history', 'memory_mb', str((nbytes or 0) // 1048576))
+
         # Write configuration to ini file
         inifile = os.path.expanduser(SETTINGS_FILE)
         with open(inifile, 'w') as configfile:
@@ -2540,6 +1082,7 @@ class DocumentTreeView(QtWidgets.QTreeView):
     def __init__(self, parent):
         super(DocumentTreeView, self).__init__(parent=parent)
         self._document = None
+        self._model = None
         #self.setDragEnabled(True)
         #self.setDragDropMode(QtWidgets.QAbstractItemView.InternalMove)
         self.show()
@@ -2550,7 +1093,7 @@ class DocumentTreeView(QtWidgets.QTreeView):
         """
         selection = self._sm.selectedRows()
         if len(selection) > 0:
-            node = selection[0].internalPointer()
+            node = self._model.node(selection[0])
             if not node.is_selected():
                 self._document.clear_selection()
                 node.select()
@@ -2560,12 +1103,12 @@ class DocumentTreeView(QtWidgets.QTreeView):
         Selection changed in any view.
         """
         if node is not None:
-            new = node.get_model_selection()
+            new = self._model.node_selection(node)
             if new != self._sm.selection():
                 self._sm.clearSelection()
                 self._sm.select(
                     new, QtCore.QItemSelectionModel.SelectionFlag.Select)
-                index = node.get_model_index()
+                index = self._model.node_index(node)
                 while index.isValid():
                     self.expand(index)
                     index = index.parent()
@@ -2574,9 +1117,14 @@ class DocumentTreeView(QtWidgets.QTreeView):
         """
         Sets or replaces this view's document.
         """
+        # Disconnect from previous document
+        if self._document is not None:
+            self._document.node_selected.disconnect(self.node_selected)
+            self._model.disconnect_document()
         self._document = document
         # Set document model
-        self.setModel(document.get_model())
+        self._model = DocumentModel(document, self)
+        self.setModel(self._model)
         # Set single/multiple selection mode
         self.setSelectionMode(
             QtWidgets.QAbstractItemView.SelectionMode.SingleSelection)
@@ -2639,21 +1187,38 @@ class DocumentVariableList(QtWidgets.QWidget):
         self._node = None
         # Listen for deleted nodes
         document.doc_node_removed.connect(self.handle_node_deleted)
+        # Update fields after changes to the node
+        document.nodes_changed.connect(self.handle_nodes_changed)
         # React to changes in selected node
         document.node_selected.connect(self.handle_node_selected)
 
-    def handle_node_deleted(self, document, node):
+    def handle_node_deleted(self, parent, node):
         """
         Called when a node is deleted.
         """
-        if node == self._node:
-            self.set_node(None)
+        # Clear if the deleted node is this list's node, or one of its parents
+        n = self._node
+        while n is not None:
+            if n == node:
+                self.set_node(None)
+                return
+            n = n.get_parent_node()
 
     def handle_node_selected(self, node):
         """
         Called when a node is selected in one of the views.
         """
-        self.set_node(node)
+        self.set_node(node)
+
+    def handle_nodes_changed(self, document, nodes):
+        """
+        Called with a batch of changed nodes: updates all fields once if this
+        list's node is one of them.
+        """
+        if self._node in nodes:
+            for k in self._kids:
+                if isinstance(k, DocumentVariableField):
+                    k.handleVariableChanged(k._variable)
 
     def set_node(self, node):
         """
@@ -2682,14 +1247,15 @@ class DocumentVariableList(QtWidgets.QWidget):
 
 class DocumentVariableField(QtWidgets.QWidget):
     """
-    Abstract class to be extended by variable edit fields of different types
+    Abstract class to be extended by variable edit fields of different types.
+
+    Fields are updated by their :class:`DocumentVariableList`, once for each
+    batch of changes to the node.
     """
 
     def __init__(self, parent, variable):
         super(DocumentVariableField, self).__init__(parent)
         self._variable = variable
-        # Add document change listener
-        variable.variable_changed.connect(self.handleVariableChanged)
 
     @staticmethod
     def create(parent, variable):
@@ -2710,8 +1276,8 @@ class DocumentVariableField(QtWidgets.QWidget):
 
     def handleVariableChanged(self, variable):
         """
-        Called when the underlying variable is changed (including changes made
-        by this field).
+        Called when the underlying variable may have changed (including
+        changes made by this field).
         """
         pass
 
@@ -2736,7 +1302,10 @@ class TextVariableField(QtWidgets.QLineEdit, DocumentVariableField):
             pass
         else:
             raise ValueError('Unsupported variable type <' + str(vtype) + '>.')
-        self.setText(variable.get_str_value())
+        # Last value shown, so that edits in progress are only replaced if
+        # the variable really changed
+        self._value = variable.get_str_value()
+        self.setText(self._value)
         self.editingFinished.connect(self.handleFieldChanged)
 
     def focusOutEvent(self, event):
@@ -2757,10 +1326,13 @@ class TextVariableField(QtWidgets.QLineEdit, DocumentVariableField):
 
     def handleVariableChanged(self, variable):
         """
-        Called when the underlying variable is changed (including changes made
-        by this field).
+        Called when the underlying variable may have changed (including
+        changes made by this field).
         """
-        self.setText(self._variable.get_str_value())
+        value = self._variable.get_str_value()
+        if value != self._value:
+            self._value = value
+            self.setText(value)
 
 
 class BoolVariableField(QtWidgets.QCheckBox, DocumentVariableField):
@@ -2786,8 +1358,8 @@ class BoolVariableField(QtWidgets.QCheckBox, DocumentVariableField):
 
     def handleVariableChanged(self, variable):
         """
-        Called when the underlying variable is changed (including changes made
-        by this field).
+        Called when the underlying variable may have changed (including
+        changes made by this field).
         """
         checked = self._variable.get_value()
         if self.isChecked() != checked:
@@ -2847,10 +1419,10 @@ class GdeScene(QtWidgets.QGraphicsScene):
         # Axes
         self._xaxis = None
         self._yaxis = None
-        # Data points (regardless of the series they belong to)
-        self._data = {}
         # Data set items (splines)
         self._sets = {}
+        # Scene items, indexed by node (see register_item)
+        self._items = {}
         # Init
         super(GdeScene, self).__init__(gde)
         self.setBackgroundBrush(QtGui.QColor(255, 255, 255))
@@ -2870,32 +1442,23 @@ class GdeScene(QtWidgets.QGraphicsScene):
             self._image.disconnect()
             self._xaxis.disconnect()
             self._yaxis.disconnect()
-            #for item in self._data.values():
-            #    item.disconnect()
             for item in self._sets.values():
                 item.disconnect()
-        # Child items will disconnect when deleted by refcount decrease.
         self._image = None
         self._xaxis = None
         self._yaxis = None
-        #self._data = {}
         self._sets = {}
+        self._items = {}
         self._document = None
         super(GdeScene, self).clear()
 
     def get_item_for_node(self, node):
         """
-        Returns the first scene item found for the given node.
+        Returns the scene item for the given node, or ``None`` if it doesn't
+        have one (e.g. for data points that aren't selected or under the
+        mouse, see :class:`DataSetItem`).
         """
-        def deep(parent):
-            for child in parent.children():
-                if child._node == node:
-                    return child
-                item = deep(child)
-                if item is not None:
-                    return item
-            return None
-        return deep(self)
+        return self._items.get(node)
 
     def handle_node_added(self, parent, child):
         """
@@ -2905,7 +1468,7 @@ class GdeScene(QtWidgets.QGraphicsScene):
         if ntype == T_DATA_SET:
             # Add data set item
             item = DataSetItem(child)
-            self._data[child] = item
+            self._sets[child] = item
             self.addItem(item)
 
     def handle_node_removed(self, parent, child):
@@ -2916,16 +1479,20 @@ class GdeScene(QtWidgets.QGraphicsScene):
         if ntype == T_DATA_SET:
             try:
                 item = self._sets[child]
-                del(self._sets[child])
-                self.removeItem(item)
             except KeyError:
-                pass
+                return
+            del(self._sets[child])
+            self.removeItem(item)
+            item.disconnect()
 
     def mouseMoveEvent(self, event):
         """
         Show mouse position in status bar
         """
         p = event.scenePos()
+        if event.buttons() == Qt.MouseButton.NoButton:
+            for item in self._sets.values():
+                item.hover(p.x(), p.y())
         x, y = p.x() * self.S, p.y() * self.S
         x = 0 if x < 0 else 1 if x > 1 else x
         y = 0 if y < 0 else 1 if y > 1 else y
@@ -2946,6 +1513,10 @@ class GdeScene(QtWidgets.QGraphicsScene):
         """
         Ctrl-Click: add data point
         """
+        # Create item for the point under the mouse, so that it can be dragged
+        p = event.scenePos()
+        for item in self._sets.values():
+            item.hover(p.x(), p.y())
         if event.button() == Qt.MouseButton.LeftButton:
             if event.modifiers() == Qt.KeyboardModifier.ControlModifier:
                 p = event.scenePos()
@@ -2959,6 +1530,17 @@ class GdeScene(QtWidgets.QGraphicsScene):
         """
         return x * self.W, y * self.W
 
+    def register_item(self, item):
+        """
+        Adds a :class:`SceneItem` to the node-to-item index.
+
+        Called by scene items when they are added to this scene or change
+        their node, so there is no need to call this method directly.
+        """
+        node = item.get_node()
+        if node is not None:
+            self._items[node] = item
+
     def scene2norm(self, x, y):
         """
         Converts scene coordinates to normalised coordinates.
@@ -2992,6 +1574,17 @@ class GdeScene(QtWidgets.QGraphicsScene):
         document.doc_node_removed.connect(self.handle_node_removed)
         document.doc_deleted.connect(self.clear)
 
+    def unregister_item(self, item):
+        """
+        Removes a :class:`SceneItem` from the node-to-item index.
+
+        Called by scene items when they are removed from this scene or change
+        their node, so there is no need to call this method directly.
+        """
+        node = item.get_node()
+        if node is not None and self._items.get(node) is item:
+            del(self._items[node])
+
 
 class SceneItem(QtWidgets.QGraphicsItem):
     """
@@ -3006,13 +1599,15 @@ class SceneItem(QtWidgets.QGraphicsItem):
         self._node = node
         self._original_z_index = 0
         super(SceneItem, self).__init__(parent=parent)
+        # Store document, so that we can disconnect after the node is removed
+        self._document = node.get_document()
         # React to node selection changes
         node.node_selected.connect(self.select)
         node.node_deselected.connect(self.deselect)
         # React to node variable changes
         node.variable_changed.connect(self.handle_variable_changed)
         # React to document deletion
-        node.get_document().doc_deleted.connect(self.handle_document_deleted)
+        self._document.doc_deleted.connect(self.handle_document_deleted)
 
     def deselect(self):
         """
@@ -3034,8 +1629,7 @@ class SceneItem(QtWidgets.QGraphicsItem):
             node.node_selected.disconnect(self.select)
             node.node_deselected.disconnect(self.deselect)
             node.variable_changed.disconnect(self.handle_variable_changed)
-            node.get_document().doc_deleted.disconnect(
-                self.handle_document_deleted)
+            self._document.doc_deleted.disconnect(self.handle_document_deleted)
 
     def handle_document_deleted(self, doc):
         """
@@ -3054,7 +1648,11 @@ class SceneItem(QtWidgets.QGraphicsItem):
         """
         Handles event when this item has changed
         """
-        if change == SceneItem.GraphicsItemChange.ItemSceneHasChanged:
+        if change == SceneItem.GraphicsItemChange.ItemSceneChange:
+            scene = self.scene()
+            if isinstance(scene, GdeScene):
+                scene.unregister_item(self)
+        elif change == SceneItem.GraphicsItemChange.ItemSceneHasChanged:
             self.set_scene(value)
         return QtWidgets.QGraphicsItem.itemChange(self, change, value)
 
@@ -3094,8 +1692,12 @@ class SceneItem(QtWidgets.QGraphicsItem):
         """
         Sets or replaces this item's node.
         """
-        self._node = node
         scene = self.scene()
+        if isinstance(scene, GdeScene):
+            scene.unregister_item(self)
+        self._node = node
+        if isinstance(scene, GdeScene):
+            scene.register_item(self)
         if scene is not None:
             self.init(scene, node)
 
@@ -3111,6 +1713,8 @@ class SceneItem(QtWidgets.QGraphicsItem):
         """
         Sets or replaces this item's scene
         """
+        if isinstance(scene, GdeScene):
+            scene.register_item(self)
         if self._node is not None:
             self.init(scene, self._node)
 
@@ -3143,6 +1747,19 @@ class DraggableItem(SceneItem):
         # Used to gather dragging into a single event
         self._original_location = False
 
+    def _drag_items(self):
+        """
+        Returns a list containing this item and any other selected draggable
+        items, which are moved along with it when it is dragged.
+        """
+        items = [self]
+        scene = self.scene()
+        if scene is not None:
+            for item in scene.selectedItems():
+                if item is not self and isinstance(item, DraggableItem):
+                    items.append(item)
+        return items
+
     def mousePressEvent(self, event):
         """
         Mouse pressed? Then show drag icon and allow moving
@@ -3156,7 +1773,10 @@ class DraggableItem(SceneItem):
         """
         self.setCursor(Qt.CursorShape.BlankCursor)
         if not self._original_location:
-            self._original_location = self.pos()
+            # Store the original location of every item being moved
+            for item in self._drag_items():
+                if not item._original_location:
+                    item._original_location = item.pos()
         return QtWidgets.QGraphicsItem.mouseMoveEvent(self, event)
 
     def mouseReleaseEvent(self, event):
@@ -3165,10 +1785,19 @@ class DraggableItem(SceneItem):
         """
         self.setCursor(Qt.CursorShape.OpenHandCursor)
         if self._original_location:
-            p = self.pos()
-            if p != self._original_location:
-                self.handle_drag(p.x(), p.y())
-            self._original_location = False
+            # Find all items that were moved
+            moved = []
+            for item in self._drag_items():
+                if item._original_location:
+                    if item.pos() != item._original_location:
+                        moved.append(item)
+                    item._original_location = False
+            # Store new locations as a single change
+            if moved:
+                with self._document.transaction():
+                    for item in moved:
+                        p = item.pos()
+                        item.handle_drag(p.x(), p.y())
         return QtWidgets.QGraphicsItem.mouseReleaseEvent(self, event)
 
     def itemChange(self, change, value):
@@ -3221,17 +1850,436 @@ class DraggableItem(SceneItem):
         return x, y
 
 
+# Users of unlimited_image_allocation(), and the limit to restore after
+_allocation_lock = threading.Lock()
+_allocation_users = 0
+_allocation_limit = None
+
+
+@contextlib.contextmanager
+def unlimited_image_allocation():
+    """
+    Context manager that lets ``QImageReader`` read images over Qt's default
+    size limit (256MB) while it is open.
+
+    The limit is shared by all threads, so it is removed when the first
+    context is opened, and restored when the last one is closed. Image loads
+    on other threads meanwhile run without a limit, but never fail because a
+    context closed early.
+    """
+    global _allocation_users, _allocation_limit
+    with _allocation_lock:
+        if _allocation_users == 0:
+            _allocation_limit = QtGui.QImageReader.allocationLimit()
+            QtGui.QImageReader.setAllocationLimit(0)
+        _allocation_users += 1
+    try:
+        yield
+    finally:
+        with _allocation_lock:
+            _allocation_users -= 1
+            if _allocation_users == 0:
+                QtGui.QImageReader.setAllocationLimit(_allocation_limit)
+
+
+class ImagePyramid(object):
+    """
+    A tiled, multi-resolution copy of an image file, stored on disk so that
+    very large images can be shown without keeping them in memory.
+
+    Level 0 of the pyramid has the image's full resolution, and every next
+    level halves its width and height, until the image fits in a single tile.
+    Each level is cut into tiles of ``TILE_SIZE`` by ``TILE_SIZE`` pixels,
+    stored as PNG files in a directory in :attr:`TILES_DIR`. Tiles are only
+    loaded when they are drawn, and the most recently used tiles are kept in
+    memory, up to ``cache_nbytes``.
+
+    A pyramid is created with :meth:`build()`, which reads the full image
+    once, and is reused until the image file changes. Only the
+    ``CACHE_COUNT`` most recently built pyramids are kept on disk.
+    """
+    # Width and height of a tile, in pixels
+    TILE_SIZE = 512
+
+    # Number of pyramids kept on disk
+    CACHE_COUNT = 8
+
+    # Name of the file listing a pyramid's size, written when it is complete
+    INDEX = 'index.ini'
+
+    def __init__(self, path, cache_nbytes=64 * 1024 * 1024):
+        self._path = os.path.abspath(path)
+        # Directory, based on the file's path, size, and modification time
+        st = os.stat(self._path)
+        key = '\n'.join((self._path, str(st.st_size), str(st.st_mtime_ns),
+                         str(self.TILE_SIZE)))
+        key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        self._dir = os.path.join(TILES_DIR, key)
+        # Size of each level, or None if not built
+        self._sizes = None
+        # Loaded tiles, least recently used first
+        self._tiles = collections.OrderedDict()
+        self._max_tiles = max(1, cache_nbytes // (4 * self.TILE_SIZE**2))
+        # Read index of existing pyramid
+        self._read_index()
+
+    def build(self, preview=None, progress=None):
+        """
+        Reads the image, and stores it as tiles at every level.
+
+        If given, ``preview`` is called with a low-resolution ``QImage`` of the
+        image (at most ``ImageLoader.PREVIEW_SIZE`` pixels wide and high) as
+        soon as it has been read, and ``progress`` is called with the fraction
+        of tiles stored after every tile. Building can be cancelled by raising
+        an exception from either of these.
+
+        This only uses ``QImage`` objects, and so can be called from a worker
+        thread.
+        """
+        reader = QtGui.QImageReader(self._path)
+        with unlimited_image_allocation():
+            image = reader.read()
+        if image.isNull():
+            raise ValueError('Unable to read image: ' + reader.errorString())
+        if preview is not None:
+            n = ImageLoader.PREVIEW_SIZE
+            preview(image.scaled(
+                n, n, Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation))
+
+        # Size of every level, and total number of tiles
+        t = self.TILE_SIZE
+        sizes = [(image.width(), image.height())]
+        while sizes[-1][0] > t or sizes[-1][1] > t:
+            w, h = sizes[-1]
+            sizes.append(((w + 1) // 2, (h + 1) // 2))
+        total = sum(((w + t - 1) // t) * ((h + t - 1) // t) for w, h in sizes)
+        done = 0
+
+        # Store tiles in a temporary directory, then move into place
+        temp = self._dir + '.tmp'
+        if os.path.isdir(temp):
+            gde.rmtree(temp)
+        os.makedirs(temp)
+        try:
+            for level, (w, h) in enumerate(sizes):
+                if level > 0:
+                    image = image.scaled(
+                        w, h, Qt.AspectRatioMode.IgnoreAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation)
+                for j in range(0, (h + t - 1) // t):
+                    for i in range(0, (w + t - 1) // t):
+                        # Save with fast (level 2) compression. Tiles on the
+                        # right and bottom edges are cut to the image size.
+                        tile = image.copy(
+                            i * t, j * t, min(t, w - i * t), min(t, h - j * t))
+                        tile.save(
+                            self._tile_path(level, i, j, temp), 'png', 80)
+                        done += 1
+                        if progress is not None:
+                            progress(done / total)
+            del(image)
+
+            config = configparser.ConfigParser()
+            config.add_section('pyramid')
+            config.set('pyramid', 'tile_size', str(t))
+            config.set('pyramid', 'sizes', ' '.join(
+                str(w) + 'x' + str(h) for w, h in sizes))
+            with open(os.path.join(temp, self.INDEX), 'w') as f:
+                config.write(f)
+        except BaseException:
+            gde.rmtree(temp)
+            raise
+        if os.path.isdir(self._dir):
+            gde.rmtree(self._dir)
+        os.replace(temp, self._dir)
+        self._read_index()
+
+        # Remove the oldest pyramids (but not those still being built)
+        dirs = []
+        for name in os.listdir(TILES_DIR):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(TILES_DIR, name)
+            try:
+                dirs.append((os.path.getmtime(path), path))
+            except OSError:     # pragma: no cover
+                pass
+        dirs.sort()
+        for mtime, path in dirs[:-self.CACHE_COUNT]:
+            try:
+                gde.rmtree(path)
+            except OSError:     # pragma: no cover
+                pass
+
+    def is_built(self):
+        """
+        Returns True if this pyramid's tiles are available on disk.
+        """
+        return self._sizes is not None
+
+    def paint(self, painter, rect, exposed, scale):
+        """
+        Draws the tiles that overlap with ``exposed``, with the image
+        stretched to fill ``rect`` (both ``QRectF`` objects in the painter's
+        coordinates), and with ``scale`` the number of device pixels per unit
+        in the painter's coordinates.
+        """
+        if self._sizes is None:
+            return
+        # Choose the lowest level with at least one pixel per device pixel
+        w, h = self._sizes[0]
+        d = scale * max(rect.width() / w, rect.height() / h)
+        level = 0 if d >= 1 else int(math.floor(-math.log2(d)))
+        level = min(level, len(self._sizes) - 1)
+        w, h = self._sizes[level]
+
+        # Find and draw tiles in the exposed area
+        t = self.TILE_SIZE
+        fx, fy = rect.width() / w, rect.height() / h
+        visible = painter.combinedTransform().inverted()[0].mapRect(
+            QtCore.QRectF(painter.viewport()))
+        exposed = exposed.intersected(rect).intersected(visible)
+        if exposed.isEmpty():
+            return
+        # Draw without antialiasing, to avoid seams between tiles
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, False)
+        i0 = max(0, int((exposed.left() - rect.left()) / fx) // t)
+        j0 = max(0, int((exposed.top() - rect.top()) / fy) // t)
+        i1 = min((w - 1) // t, int((exposed.right() - rect.left()) / fx) // t)
+        j1 = min((h - 1) // t, int((exposed.bottom() - rect.top()) / fy) // t)
+        used = 0
+        for j in range(j0, j1 + 1):
+            for i in range(i0, i1 + 1):
+                tile = self.tile(level, i, j)
+                if tile is None:
+                    continue
+                used += 1
+                painter.drawPixmap(
+                    QtCore.QRectF(
+                        rect.left() + i * t * fx, rect.top() + j * t * fy,
+                        tile.width() * fx, tile.height() * fy),
+                    tile, QtCore.QRectF(tile.rect()))
+        painter.restore()
+
+        # Remove least recently used tiles, but keep all tiles just drawn
+        n = max(self._max_tiles, used)
+        while len(self._tiles) > n:
+            self._tiles.popitem(last=False)
+
+    def _read_index(self):
+        """
+        Reads the size of every level from an existing pyramid.
+        """
+        self._sizes = None
+        config = configparser.ConfigParser()
+        try:
+            if not config.read(os.path.join(self._dir, self.INDEX)):
+                return
+            if config.getint('pyramid', 'tile_size') != self.TILE_SIZE:
+                return
+            sizes = config.get('pyramid', 'sizes').split()
+            self._sizes = [tuple(int(x) for x in s.split('x')) for s in sizes]
+        except (configparser.Error, ValueError):
+            return
+
+    def size(self):
+        """
+        Returns the full size ``(width, height)`` of this pyramid's image, or
+        ``None`` if it hasn't been built.
+        """
+        return None if self._sizes is None else self._sizes[0]
+
+    def tile(self, level, i, j):
+        """
+        Returns a ``QPixmap`` with the tile in column ``i`` and row ``j`` of
+        the given level, or ``None`` if it can't be loaded.
+        """
+        key = (level, i, j)
+        tile = self._tiles.get(key)
+        if tile is None:
+            tile = QtGui.QPixmap(self._tile_path(level, i, j))
+            if tile.isNull():
+                return None
+            self._tiles[key] = tile
+        else:
+            self._tiles.move_to_end(key)
+        return tile
+
+    def _tile_path(self, level, i, j, root=None):
+        """
+        Returns the path to a tile.
+        """
+        name = str(level) + '-' + str(i) + '-' + str(j) + '.png'
+        return os.path.join(self._dir if root is None else root, name)
+
+
+class ImageLoader(QtCore.QObject):
+    """
+    Loads images on a background thread, for a single client.
+
+    Only the most recent request made with :meth:`load` is of interest: when a
+    new request is made, earlier requests are cancelled and their results are
+    ignored. Signals are emitted on the thread that owns the loader.
+
+    Images with more than ``tiled_pixels`` pixels are loaded as an
+    :class:`ImagePyramid`, creating its tiles if needed. While the tiles are
+    created, a low-resolution preview and the progress are reported. For
+    smaller images, a preview is only reported if the image format allows a
+    scaled-down version to be read quickly (e.g. JPEG).
+    """
+    # Signals
+    # Emitted when a low-resolution preview of the image is ready
+    # Attributes: QImage
+    preview_ready = QtCore.Signal(object)
+    # Emitted while tiles are being created
+    # Attributes: fraction of tiles done
+    progress = QtCore.Signal(float)
+    # Emitted when the image has been loaded
+    # Attributes: QImage (None if tiled, and a null image if loading failed),
+    #             ImagePyramid (None if not tiled)
+    image_ready = QtCore.Signal(object, object)
+    # Emitted by worker threads to hand results to the owning thread
+    # Attributes: request, signal name, arguments
+    _report = QtCore.Signal(int, str, object)
+
+    # Width and height of preview images, in pixels
+    PREVIEW_SIZE = 1024
+
+    # Executor shared by all loaders
+    _executor = None
+
+    class _Cancelled(Exception):
+        """ Raised in a worker when its request has been cancelled. """
+
+    def __init__(self, parent=None):
+        super(ImageLoader, self).__init__(parent)
+        self._request = 0
+        self._future = None
+        self._report.connect(self._handle_report)
+
+    def cancel(self):
+        """
+        Cancels the current request, if any.
+        """
+        self._request += 1
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _handle_report(self, request, name, args):
+        """
+        Emits a signal reported by a worker, if its request is still wanted.
+        """
+        if request == self._request:
+            if name == 'image_ready':
+                self._future = None
+            getattr(self, name).emit(*args)
+
+    def load(self, path, tiled_pixels, cache_nbytes):
+        """
+        Requests the image at ``path`` to be loaded, using an
+        :class:`ImagePyramid` with the given ``cache_nbytes`` if it has more
+        than ``tiled_pixels`` pixels.
+
+        Any earlier request is cancelled.
+        """
+        self.cancel()
+        request = self._request
+
+        def report(name, *args):
+            if request != self._request:
+                raise ImageLoader._Cancelled()
+            self._report.emit(request, name, args)
+
+        percent = [0]
+
+        def progress(fraction):
+            # Report whole percentages only
+            p = int(100 * fraction)
+            if p != percent[0]:
+                percent[0] = p
+                report('progress', fraction)
+            elif request != self._request:
+                raise ImageLoader._Cancelled()
+
+        def load():
+            try:
+                reader = QtGui.QImageReader(path)
+                size = reader.size()
+                w, h = size.width(), size.height()
+                if w * h > tiled_pixels:
+                    pyramid = ImagePyramid(path, cache_nbytes)
+                    if not pyramid.is_built():
+                        pyramid.build(
+                            lambda x: report('preview_ready', x), progress)
+                    report('image_ready', None, pyramid)
+                    return
+                n = self.PREVIEW_SIZE
+                option = QtGui.QImageIOHandler.ImageOption.ScaledSize
+                if max(w, h) > 2 * n and reader.supportsOption(option):
+                    small = QtGui.QImageReader(path)
+                    small.setScaledSize(size.scaled(
+                        n, n, Qt.AspectRatioMode.KeepAspectRatio))
+                    report('preview_ready', small.read())
+                report('image_ready', reader.read(), None)
+            except ImageLoader._Cancelled:
+                pass
+            except Exception:
+                print(traceback.format_exc())
+                try:
+                    report('image_ready', QtGui.QImage(), None)
+                except ImageLoader._Cancelled:
+                    pass
+
+        if ImageLoader._executor is None:
+            ImageLoader._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='gde-image')
+        self._future = ImageLoader._executor.submit(load)
+
+
 class ImageItem(SceneItem):
     """
     Draws a full-size background image onto the scene.
+
+    The image is drawn from a cached, semi-transparent pixmap, scaled to the
+    size it is shown at in the view. The pixmap is recreated only when the
+    image changes or the view is zoomed, and is never larger than the image
+    itself or than :attr:`CACHE_NBYTES`.
+
+    Images with more than :attr:`TILED_PIXELS` pixels are instead shown using
+    an :class:`ImagePyramid`, which is created the first time the image is
+    opened.
+
+    Images are loaded in the background by an :class:`ImageLoader`. Until an
+    image is ready, a low-resolution preview (if available) and the loading
+    progress are shown.
     """
+    # Maximum memory used by the cached pixmap or tiles, in bytes
+    CACHE_NBYTES = 64 * 1024 * 1024
+
+    # Images with more pixels than this are shown using tiles
+    TILED_PIXELS = 4096 * 4096
 
     def __init__(self, node):
         super(ImageItem, self).__init__(node)
         self.setZValue(Z_BACKGROUND)
         self._image = None
+        # Cached pixmap
+        self._pixmap = None
+        # Tiled image, for large images
+        self._pyramid = None
+        # Background loading, and progress (None if not loading)
+        self._loader = ImageLoader()
+        self._loader.preview_ready.connect(self.handle_preview_ready)
+        self._loader.progress.connect(self.handle_progress)
+        self._loader.image_ready.connect(self.handle_image_ready)
+        self._progress = None
         # Allow selecting
         self.setFlag(ImageItem.GraphicsItemFlag.ItemIsSelectable)
+        # Only draw the exposed part of the scene
+        self.setFlag(ImageItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
 
     def boundingRect(self):
         """
@@ -3241,6 +2289,38 @@ class ImageItem(SceneItem):
         if s:
             return s.sceneRect()
 
+    def disconnect(self):
+        """
+        Disconnects any listeners attached to this item.
+        """
+        self._loader.cancel()
+        super(ImageItem, self).disconnect()
+
+    def handle_image_ready(self, image, pyramid):
+        """
+        Called when the image has been loaded.
+        """
+        self._image = image
+        self._pixmap = None
+        self._pyramid = pyramid
+        self._progress = None
+        self.update()
+
+    def handle_preview_ready(self, image):
+        """
+        Called when a low-resolution preview of the image is available.
+        """
+        self._image = image
+        self._pixmap = None
+        self.update()
+
+    def handle_progress(self, fraction):
+        """
+        Called while a large image is being prepared for display.
+        """
+        self._progress = fraction
+        self.update()
+
     def handle_variable_changed(self, node, variable):
         """
         Variable in item's node has changed.
@@ -3252,25 +2332,49 @@ class ImageItem(SceneItem):
         Initialize to the given scene and node.
         """
         self._image = None
+        self._pixmap = None
+        self._pyramid = None
+        self._progress = None
+        self._loader.cancel()
         if node is not None:
             path = node.get_value('path')
             if path:
-                try:
-                    self._image = QtGui.QImage(node.get_value('path'))
-                except Exception:
-                    pass
+                self._progress = 0
+                self._loader.load(path, self.TILED_PIXELS, self.CACHE_NBYTES)
         if scene is not None:
             self.update()
 
+    def is_loading(self):
+        """
+        Returns True if this item's image is being loaded.
+        """
+        return self._progress is not None
+
     def paint(self, painter, option, widget):
         """
         Paints this item.
         """
+        if self._pyramid is not None:
+            painter.setOpacity(0.5)
+            self._pyramid.paint(
+                painter, self.scene().sceneRect(), option.exposedRect,
+                option.levelOfDetailFromTransform(painter.worldTransform()))
+            return
         is_none = self._image is None
         is_null = (not is_none) and self._image.isNull()
-        if not (is_none or is_null):
-            painter.setOpacity(0.5)
-            painter.drawImage(self.scene().sceneRect(), self._image)
+        if self._progress is not None:
+            # Show preview (if any) and progress while loading
+            if not (is_none or is_null):
+                self._paint_image(painter, option)
+            text = 'Loading image...'
+            if self._progress > 0:
+                text += ' ' + str(int(100 * self._progress)) + '%'
+            painter.setOpacity(0.7)
+            painter.setFont(QtGui.QFont('Decorative', 200))
+            painter.drawText(
+                self.scene().sceneRect(), Qt.AlignmentFlag.AlignCenter, text)
+        elif not (is_none or is_null):
+            self._paint_image(painter, option)
         else:
             text = 'Double-click to select image file...\n' \
                    'Ctrl-click to add data points'
@@ -3281,6 +2385,55 @@ class ImageItem(SceneItem):
             painter.drawText(
                 self.scene().sceneRect(), Qt.AlignmentFlag.AlignCenter, text)
 
+    def _paint_image(self, painter, option):
+        """
+        Paints the exposed part of the image, using a cached pixmap.
+        """
+        rect = self.scene().sceneRect()
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        pixmap = self.pixmap(rect.width() * scale, rect.height() * scale)
+        # Draw exposed part, from the pixmap area that covers it
+        sx = pixmap.width() / rect.width()
+        sy = pixmap.height() / rect.height()
+        target = option.exposedRect.intersected(rect)
+        source = QtCore.QRectF(
+            (target.x() - rect.x()) * sx, (target.y() - rect.y()) * sy,
+            target.width() * sx, target.height() * sy)
+        painter.drawPixmap(target, pixmap, source)
+
+    def pixmap(self, width, height):
+        """
+        Returns a semi-transparent pixmap of this item's image, scaled to
+        ``width`` by ``height`` pixels, or smaller if that exceeds the image
+        size or :attr:`CACHE_NBYTES`.
+
+        The last pixmap is cached, and reused as long as the requested size
+        doesn't change.
+        """
+        image = self._image
+        w = min(int(math.ceil(width)), image.width())
+        h = min(int(math.ceil(height)), image.height())
+        f = math.sqrt(self.CACHE_NBYTES / 4 / max(1, w * h))
+        if f < 1:
+            w, h = int(w * f), int(h * f)
+        w, h = max(1, w), max(1, h)
+        pixmap = self._pixmap
+        if pixmap is None or pixmap.width() != w or pixmap.height() != h:
+            scaled = image.scaled(
+                w, h, Qt.AspectRatioMode.IgnoreAspectRatio,
+                Qt.TransformationMode.SmoothTransformation)
+            # Draw scaled image with 50% opacity
+            faded = QtGui.QImage(
+                w, h, QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+            faded.fill(Qt.GlobalColor.transparent)
+            painter = QtGui.QPainter(faded)
+            painter.setOpacity(0.5)
+            painter.drawImage(0, 0, scaled)
+            painter.end()
+            del(scaled)
+            pixmap = self._pixmap = QtGui.QPixmap.fromImage(faded)
+        return pixmap
+
 
 class AxisItem(SceneItem):
     """
@@ -3425,6 +2578,10 @@ class AxisPointItem(DraggableItem):
         self._pen = QtGui.QPen()
         self._pen.setWidth(0)
         self._pen.setColor(QtGui.QColor(0, 128, 0))
+        self._dot_pen = QtGui.QPen(self._pen)
+        self._dot_pen.setWidth(3)
+        self._dot_pen.setCosmetic(True)
+        self._dot_pen.setCapStyle(Qt.PenCapStyle.SquareCap)
         # Restriction on movement
         self._restrict = False
         self._dragging = False
@@ -3432,6 +2589,9 @@ class AxisPointItem(DraggableItem):
         self._isx = axis.is_x()
         # Set z-value
         self.setZValue(Z_AXIS)
+        # Cache rendering, until the item changes or the view is zoomed
+        self.setCacheMode(
+            AxisPointItem.CacheMode.DeviceCoordinateCache)
 
     def boundingRect(self):
         """
@@ -3505,6 +2665,11 @@ class AxisPointItem(DraggableItem):
         r2, r3, d3 = int(r2), int(r3), int(d3)
         if self.isSelected() or self.hasFocus():
             painter.drawEllipse(-r1, -r1, d1, d1)
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod * r1 < MIN_GLYPH_PIXELS:
+            painter.setPen(self._dot_pen)
+            painter.drawPoint(0, 0)
+            return
         painter.drawEllipse(-r3, -r3, d3, d3)
         painter.drawLine(-r2, 0, r2, 0)
         painter.drawLine(0, -r2, 0, r2)
@@ -3530,9 +2695,110 @@ class AxisPointItem(DraggableItem):
         self._axis.update_coords()
 
 
+class SplineFitter(QtCore.QObject):
+    """
+    Fits splines on a background thread, for a single client.
+
+    Only the most recent request made with :meth:`submit` is of interest:
+    earlier requests that haven't started yet are cancelled. Earlier requests
+    that are already running are finished, stored in the cache, and reported
+    if no newer fit has been reported yet, so that a spline that takes longer
+    to fit than the time between requests (e.g. while dragging points) is
+    still updated whenever a fit is done. Results of requests made before a
+    call to :meth:`cancel()` are not reported. When a fit is ready,
+    ``fit_ready`` is emitted on the thread that owns the fitter.
+    """
+    # Signals
+    # Emitted when the most recently requested fit is ready
+    # Attributes: (x, y) or None if the fit failed
+    fit_ready = QtCore.Signal(object)
+    # Emitted by worker threads when a fit is done, to hand the result to the
+    # owning thread
+    # Attributes: request, cache, key, x, y
+    _fit_done = QtCore.Signal(int, object, object, object, object)
+
+    # Executor shared by all fitters
+    _executor = None
+
+    def __init__(self, parent=None):
+        super(SplineFitter, self).__init__(parent)
+        self._request = 0
+        # Oldest request that can still be reported
+        self._wanted = 0
+        self._future = None
+        self._fit_done.connect(self._handle_fit_done)
+
+    def cancel(self):
+        """
+        Cancels the current request, if any, and stops results of all earlier
+        requests from being reported.
+        """
+        self._request += 1
+        self._wanted = self._request
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _handle_fit_done(self, request, cache, key, x, y):
+        """
+        Stores a finished fit, and reports it if it's still wanted.
+
+        Failed fits are reported only for the most recent request.
+        """
+        fit = None
+        if y is not None:
+            fit = cache.put(key, x, y)
+        if request == self._request:
+            self._future = None
+        elif fit is None:
+            return
+        if request >= self._wanted:
+            self._wanted = request + 1
+            self.fit_ready.emit(fit)
+
+    def submit(self, cache, key, x, y, x2, s, nseg, deg, pdeg):
+        """
+        Requests a :meth:`pspline` fit to ``(x, y)``, evaluated at ``x2``, to
+        be stored in ``cache`` under ``key``.
+
+        Any earlier request that hasn't started yet is cancelled. The given
+        arrays must not be modified after submitting.
+        """
+        if self._future is not None:
+            self._future.cancel()
+        self._request += 1
+        request = self._request
+
+        def fit():
+            try:
+                y2 = pspline(x, y, x2, s, nseg, deg, pdeg)
+            except Exception:
+                print(traceback.format_exc())
+                y2 = None
+            self._fit_done.emit(request, cache, key, x2, y2)
+
+        if SplineFitter._executor is None:
+            SplineFitter._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='gde-spline')
+        self._future = SplineFitter._executor.submit(fit)
+
+
 class DataSetItem(SceneItem):
     """
-    Data Set item. Usually empty, but can draw an interpolating p-spline.
+    Data Set item. Draws the data set's points, and can draw an interpolating
+    p-spline.
+
+    All points are drawn by this single item, straight from the data set's
+    point array. A :class:`PointGrid` is used to find points under the mouse,
+    and to draw only the points in the exposed part of the scene, with the
+    symbols in each grid cell cached as a single path. Interactive
+    :class:`DataPointItem` objects are created only for points that are
+    selected, under the mouse, or being dragged (see :meth:`hover()`), and
+    the set skips these points when drawing.
+
+    Splines are fit in the background, so that the current spline is shown
+    until the fit for the latest data is ready. The fit is updated once for
+    every batch of changes to the data set or its points.
     """
     # Signals
 
@@ -3540,29 +2806,110 @@ class DataSetItem(SceneItem):
         super(DataSetItem, self).__init__(node)
         # Set z-value
         self.setZValue(Z_DATA_SET)
-        # Data point items
+        # Only draw the exposed part of the scene
+        self.setFlag(
+            SceneItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        # Data point items, for selected or hovered points only
         self._data = {}
-        # Path
+        # Point under the mouse
+        self._hover = None
+        # Spatial index, point IDs at the time it was made, and symbol paths
+        # and dots for each cell (all created when needed)
+        self._grid = None
+        self._grid_ids = None
+        self._cells = {}
+        self._dots = {}
+        # Spline path
         self._path = None
-        # Create pen
+        # Background spline fitting
+        self._fitter = SplineFitter()
+        self._fitter.fit_ready.connect(self.handle_spline_fitted)
+        # Create pens
         self._pen = QtGui.QPen()
         self._pen.setWidth(50)
         self._pen.setColor(QtGui.QColor(0, 0, 255, 128))
+        self._point_pen = QtGui.QPen()
+        self._point_pen.setWidth(0)
+        self._point_pen.setColor(QtGui.QColor(0, 0, 255))
+        self._dot_pen = QtGui.QPen(self._point_pen)
+        self._dot_pen.setWidth(3)
+        self._dot_pen.setCosmetic(True)
+        self._dot_pen.setCapStyle(Qt.PenCapStyle.SquareCap)
         # React to child addition / removal
         node.child_added.connect(self.handle_child_added)
         node.child_removed.connect(self.handle_child_removed)
+        # React to axis changes (the spline is fit in real coordinates)
+        self._document.calibration_changed.connect(
+            self.handle_calibration_changed)
+        # Update points and spline once per batch of changes
+        self._document.nodes_changed.connect(self.handle_nodes_changed)
+        # Create items for points selected in other views
+        self._document.node_selected.connect(self.handle_node_selected)
+
+    def _add_item(self, node):
+        """
+        Creates, stores and returns an interactive item for the given point.
+        """
+        item = DataPointItem(node, self)
+        self._data[node] = item
+        scene = self.scene()
+        if scene:
+            item.set_scene(scene)
+        self._update_point(node)
+        return item
 
     def boundingRect(self):
         """
         Returns this item's bounding rectangle.
         """
-        if self._path:
-            scene = self.scene()
-            if scene:
-                w, h = scene.norm2scene(1, 1)
-                return QtCore.QRectF(0, 0, w, h)
+        scene = self.scene()
+        if scene:
+            r = DataPointItem.R
+            w, h = scene.norm2scene(1, 1)
+            return QtCore.QRectF(-r, -r, w + 2 * r, h + 2 * r)
         return QtCore.QRectF(0, 0, 1, 1)
 
+    def _cell_dots(self, cell):
+        """
+        Returns a polygon with the positions of all points in the given grid
+        cell, except those that have their own item.
+        """
+        dots = self._dots.get(cell)
+        if dots is None:
+            dots = QtGui.QPolygonF(
+                [QtCore.QPointF(x, y) for x, y in self._cell_points(cell)])
+            self._dots[cell] = dots
+        return dots
+
+    def _cell_path(self, cell):
+        """
+        Returns a path with the symbols for all points in the given grid cell,
+        except those that have their own item.
+        """
+        path = self._cells.get(cell)
+        if path is None:
+            path = QtGui.QPainterPath()
+            glyph = DataPointItem.glyph()
+            for x, y in self._cell_points(cell):
+                path.addPath(glyph.translated(x, y))
+            self._cells[cell] = path
+        return path
+
+    def _cell_points(self, cell):
+        """
+        Returns a list of scene coordinates ``(x, y)`` for all points in the
+        given grid cell, except those that have their own item.
+        """
+        grid = self._grid
+        rows = grid.rows(cell)
+        if len(rows) == 0:
+            return []
+        skip = set(node.get_point_id() for node in self._data)
+        ids = self._grid_ids[rows].tolist()
+        xs = (grid.x()[rows] * GdeScene.W).tolist()
+        ys = (grid.y()[rows] * GdeScene.W).tolist()
+        return [(x, y) for pid, x, y in zip(ids, xs, ys) if pid not in skip]
+
     def disconnect(self):
         """
         Disconnects any listeners attached to this item.
@@ -3571,141 +2918,283 @@ class DataSetItem(SceneItem):
         if node:
             node.child_added.disconnect(self.handle_child_added)
             node.child_removed.disconnect(self.handle_child_removed)
+            self._document.calibration_changed.disconnect(
+                self.handle_calibration_changed)
+            self._document.nodes_changed.disconnect(
+                self.handle_nodes_changed)
+            self._document.node_selected.disconnect(
+                self.handle_node_selected)
+        for item in self._data.values():
+            item.disconnect()
+        self._fitter.cancel()
         super(DataSetItem, self).disconnect()
 
+    def get_grid(self):
+        """
+        Returns a :class:`PointGrid` for this data set's points, creating it
+        if needed.
+        """
+        if self._grid is None:
+            points = self._node.get_point_array()
+            self._grid = PointGrid(points.x(), points.y())
+            self._grid_ids = points.ids().copy()
+            self._cells = {}
+            self._dots = {}
+        return self._grid
+
+    def handle_calibration_changed(self, document):
+        """
+        Handles changes to the axes.
+        """
+        self.update_spline()
+
     def handle_child_added(self, parent, child):
         """
         Handle addition of a data point.
         """
-        item = DataPointItem(child, self)
-        self._data[child] = item
-        scene = self.scene()
-        if scene:
-            item.set_scene(scene)
-        self.update_spline()
+        self.update_points()
+        if child.is_selected():
+            self._add_item(child)
 
     def handle_child_removed(self, parent, child):
         """
         Handle removal of a data point.
         """
-        try:
-            item = self._data[child]
-        except KeyError:
-            return
-        del(self._data[child])
-        # Remove child item (it's a bit weird...)
-        item.setParentItem(None)
-        item.deselect()
-        scene = self.scene()
-        if scene:
-            scene.removeItem(item)
-        # Disconnect any listeners
-        item.disconnect()
-        self.update_spline()
+        if self._hover is child:
+            self._hover = None
+        self.update_points()
+        self._remove_item(child)
 
-    def handle_variable_changed(self):
+    def handle_node_selected(self, node):
         """
-        Handles the event where a child variable is changed.
+        Creates an item for a point in this set selected in another view.
         """
-        self.update_spline()
+        if node.get_parent_node() is self._node and node not in self._data:
+            self._add_item(node).select()
+
+    def handle_nodes_changed(self, document, nodes):
+        """
+        Updates the points and spline if the data set or any of its points
+        changed.
+        """
+        node = self._node
+        for n in nodes:
+            if n is node or n.get_parent_node() is node:
+                self.update_points()
+                self.update_spline()
+                return
+
+    def handle_spline_fitted(self, fit):
+        """
+        Called when a spline fit made in the background is ready.
+        """
+        self.set_spline(fit)
+
+    def hover(self, x, y):
+        """
+        Called when the mouse is at scene coordinates ``(x, y)`` and no button
+        is pressed, or a button has just been pressed.
+
+        Creates an item for the point under the mouse (if any), so that it can
+        be selected and dragged, and removes items for points that are no
+        longer selected, under the mouse, or being dragged.
+        """
+        node = None
+        scene = self.scene()
+        if scene is not None and self._node is not None:
+            grid = self.get_grid()
+            x, y = scene.scene2norm(x, y)
+            r = scene.scene2norm(DataPointItem.R, 0)[0]
+            row = grid.nearest(x, y, r)
+            if row is not None:
+                pid = int(self._grid_ids[row])
+                if pid in self._node.get_point_array():
+                    node = self._node.get('point_' + str(pid))
+        self._hover = node
+        if node is not None and node not in self._data:
+            self._add_item(node)
+        for node, item in list(self._data.items()):
+            if node is self._hover or item.isSelected():
+                continue
+            if item._original_location:
+                continue
+            self._remove_item(node)
 
     def init(self, scene, node):
         """
         Initialize to the given node and scene
         """
-        # Add data point items
         if node is not None:
-            for child in node:
-                item = DataPointItem(child, self)
-                self._data[child] = item
+            self.update_points()
+            for item in self._data.values():
                 if scene:
                     item.set_scene(scene)
             self.update_spline()
 
     def paint(self, painter, option, widget):
         """
-        Paints this spline
+        Paints this spline and the data points without an item of their own.
+
+        When zoomed out, points are drawn as dots instead of symbols (see
+        :attr:`MIN_GLYPH_PIXELS`).
         """
-        if self._path is None:
+        if self._path is not None:
+            painter.setPen(self._pen)
+            painter.drawPath(self._path)
+        if self._node is None or len(self._node) == 0:
             return
-        # Create painter
-        #painter = QtGui.QPainter()
-        #painter.begin(self)
-        # Set pen
-        painter.setPen(self._pen)
-        # Draw path
-        painter.drawPath(self._path)
+        # Draw the points in the exposed rectangle, one grid cell at a time
+        grid = self.get_grid()
+        r = DataPointItem.R
+        rect = option.exposedRect.adjusted(-r, -r, r, r)
+        s = GdeScene.S
+        cells = grid.cells(rect.left() * s, rect.top() * s,
+                           rect.right() * s, rect.bottom() * s)
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod * r < MIN_GLYPH_PIXELS:
+            painter.save()
+            painter.setRenderHint(
+                QtGui.QPainter.RenderHint.Antialiasing, False)
+            painter.setPen(self._dot_pen)
+            for cell in cells:
+                dots = self._cell_dots(cell)
+                if not dots.isEmpty():
+                    painter.drawPoints(dots)
+            painter.restore()
+        else:
+            painter.setPen(self._point_pen)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            for cell in cells:
+                path = self._cell_path(cell)
+                if not path.isEmpty():
+                    painter.drawPath(path)
 
-    def update_spline(self):
+    def _remove_item(self, node):
         """
-        Creates a spline based on the current data set.
+        Removes the interactive item for the given point, if it has one.
         """
-        # Get node & scene, don't draw spline if nothing found
-        self._path = None
-        node = self.get_node()
-        scene = self.scene()
-        if node is None or scene is None:
-            return
-        # Spline enabled?
-        enabled = self._node.get_value('spline')
-        if not enabled:
-            scene.update()  # Removes spline if previously drawn
+        try:
+            item = self._data[node]
+        except KeyError:
             return
-        # Gather data points
-        x1 = []
-        y1 = []
-        for point in self._node:
-            x1.append(point.get_value('x'))
-            y1.append(point.get_value('y'))
-        x1 = np.array(x1, copy=False)
-        xmin = np.min(x1)
-        xmax = np.max(x1)
-        # Fewer than two points? Then don't draw anything
-        if len(x1) < 2:
+        del(self._data[node])
+        # Remove child item (it's a bit weird...)
+        item.setParentItem(None)
+        item.deselect()
+        scene = self.scene()
+        if scene:
+            scene.removeItem(item)
+        # Disconnect any listeners
+        item.disconnect()
+        self._update_point(node)
+
+    def set_spline(self, fit):
+        """
+        Shows the spline given as a tuple ``(x, y)`` in real coordinates, or
+        removes the current spline if ``fit`` is ``None``.
+        """
+        scene = self.scene()
+        if fit is None or scene is None or len(fit[0]) < 1:
+            if self._path is not None:
+                self._path = None
+                if scene is not None:
+                    scene.update()  # Removes spline if previously drawn
             return
-        # Get spline parameters
-        smo = self._node.get_value('smoothing')
-        pen = self._node.get_value('penalty')
-        deg = self._node.get_value('degree')
-        seg = self._node.get_value('segments')
-        sam = self._node.get_value('samples')
-        if seg < 1:
-            # Segments = 0 means add a segment per data point
-            seg = len(x1)
-        # Points to evaluate the spline at
-        x2 = np.linspace(xmin, xmax, sam)
-        # Reticulate spline
-        y2 = pspline(x1, y1, x2, smo, seg, deg, pen)
+        # Convert back to normalised coordinates
+        x2, y2 = self._document.real2norm(*fit)
         # Create path
         path = QtGui.QPainterPath()
         x, y = iter(x2), iter(y2)
         path.moveTo(*scene.norm2scene(next(x), next(y)))
-        for i in range(1, sam):
+        for i in range(1, len(x2)):
             path.lineTo(*scene.norm2scene(next(x), next(y)))
         self._path = path
         # Redraw
         self.update()
 
+    def _update_point(self, node):
+        """
+        Redraws the grid cell containing the given point, after an item was
+        created or removed for it.
+        """
+        grid = self._grid
+        if grid is None:
+            return
+        cell = grid.cell(node.index())
+        self._cells.pop(cell, None)
+        self._dots.pop(cell, None)
+        x0, y0, x1, y1 = grid.cell_rect(cell)
+        r = DataPointItem.R
+        x0, y0 = GdeScene.W * x0 - r, GdeScene.W * y0 - r
+        x1, y1 = GdeScene.W * x1 + r, GdeScene.W * y1 + r
+        self.update(QtCore.QRectF(x0, y0, x1 - x0, y1 - y0))
+
+    def update_points(self):
+        """
+        Redraws all points, after points were added, removed, or moved.
+        """
+        self._grid = self._grid_ids = None
+        self._cells = {}
+        self._dots = {}
+        self.update()
+
+    def update_spline(self):
+        """
+        Creates a spline based on the current data set.
+
+        If the fit isn't cached, it is made in the background and the current
+        spline is shown until it's ready.
+        """
+        # Get node & scene, don't draw spline if nothing found
+        node = self.get_node()
+        scene = self.scene()
+        if node is None or scene is None:
+            self._fitter.cancel()
+            self._path = None
+            return
+        # Spline enabled? And at least two points?
+        if not node.get_value('spline') or len(node) < 2:
+            self._fitter.cancel()
+            self.set_spline(None)
+            return
+        # Reticulate spline, or get cached fit
+        fit = self._document.fit_spline(node, self._fitter)
+        if fit is not None:
+            self.set_spline(fit)
+
 
 class DataPointItem(DraggableItem):
     """
     Data point view on the image.
+
+    Data point items are created by their :class:`DataSetItem`, only for
+    points that are selected, under the mouse, or being dragged.
     """
+    # Radius of the circle drawn around selected points, in scene units
+    R = 240
 
     def __init__(self, node, parent):
         # Parent data set item
         self._parent = parent
         # Dimensions
-        self._r = 240
+        self._r = self.R
         self._d = 2 * self._r
         # Create pen
         self._pen = QtGui.QPen()
         self._pen.setWidth(0)
         self._pen.setColor(QtGui.QColor(0, 0, 255))
+        self._dot_pen = QtGui.QPen(self._pen)
+        self._dot_pen.setWidth(3)
+        self._dot_pen.setCosmetic(True)
+        self._dot_pen.setCapStyle(Qt.PenCapStyle.SquareCap)
+        self._glyph = self.glyph()
         # Create item
         super(DataPointItem, self).__init__(node, parent=parent)
         # Set z-value
         self.setZValue(Z_DATA)
+        # Cache rendering, until the item changes or the view is zoomed
+        self.setCacheMode(
+            DataPointItem.CacheMode.DeviceCoordinateCache)
 
     def boundingRect(self):
         """
@@ -3720,13 +3209,28 @@ class DataPointItem(DraggableItem):
         x, y = self.scene().scene2norm(x, y)
         self.get_node().set_value(x=x, y=y)
 
+    @staticmethod
+    def glyph():
+        """
+        Returns a path with the symbol for an unselected point, centred on the
+        origin.
+        """
+        r2 = int(0.75 * DataPointItem.R)
+        r3 = int(0.75 * r2)
+        path = QtGui.QPainterPath()
+        path.addEllipse(-r3, -r3, 2 * r3, 2 * r3)
+        path.moveTo(-r2, 0)
+        path.lineTo(r2, 0)
+        path.moveTo(0, -r2)
+        path.lineTo(0, r2)
+        return path
+
     def handle_variable_added(self, node, variable):
         """
         Variable added to item's node
         """
         if node.has_value('x') and node.has_value('y'):
             self.set_npos(node.get_value('x'), node.get_value('y'))
-            self._parent.update_spline()
 
     def handle_variable_changed(self, node, variable):
         """
@@ -3735,7 +3239,6 @@ class DataPointItem(DraggableItem):
         node = self.get_node()
         if node.has_value('x'):
             self.set_npos(node.get_value('x'), node.get_value('y'))
-            self._parent.update_spline()
 
     def keyPressEvent(self, event):
         """
@@ -3751,22 +3254,20 @@ class DataPointItem(DraggableItem):
         Paints this reference point
         """
         painter.setPen(self._pen)   # TODO Get Pen from parent
-        r1 = self._r
-        d1 = self._d
-        r2 = 0.75 * r1
-        r3 = 0.75 * r2
-        d3 = 2 * r3
-        r2, r3, d3 = int(r2), int(r3), int(d3)
         if self.isSelected() or self.hasFocus():
-            painter.drawEllipse(-r1, -r1, d1, d1)
-        painter.drawEllipse(-r3, -r3, d3, d3)
-        painter.drawLine(-r2, 0, r2, 0)
-        painter.drawLine(0, -r2, 0, r2)
+            painter.drawEllipse(-self._r, -self._r, self._d, self._d)
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod * self._r < MIN_GLYPH_PIXELS:
+            painter.setPen(self._dot_pen)
+            painter.drawPoint(0, 0)
+        else:
+            painter.drawPath(self._glyph)
 
     def set_scene(self, scene):
         """
         Scene is set or replaced.
         """
+        super(DataPointItem, self).set_scene(scene)
         node = self.get_node()
         if node is not None:
             if node.has_value('x'):
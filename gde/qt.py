@@ -24,11 +24,19 @@ QtWidgets.QAction = QtGui.QAction
 # exec_ was renamed to exec
 QtWidgets.QApplication.exec_ = QtWidgets.QApplication.exec
 
-# Load Gnome theme on Wayland
-if sys.platform == 'linux':
-    icon = QtGui.QIcon.fromTheme('document-new')
-    if icon.isNull():
-        QtGui.QIcon.setThemeName('gnome')
+
+def load_icon_theme():
+    """
+    Selects an icon theme, if the platform's default theme doesn't provide
+    the icons used by GDE (e.g. on Wayland, where the Gnome theme is loaded
+    instead).
+
+    This should be called after creating a ``QApplication``.
+    """
+    if sys.platform == 'linux':
+        icon = QtGui.QIcon.fromTheme('document-new')
+        if icon.isNull():
+            QtGui.QIcon.setThemeName('gnome')
 
 
 # Stand alone applications
@@ -64,6 +72,7 @@ def run(app, *args):
 
     # Create Qt app
     a = QtWidgets.QApplication([])
+    load_icon_theme()
 
     # Apply custom styling if required
     #_style_application(a)